@@ -0,0 +1,194 @@
+"""Server-side aggregation for charts.
+
+By default, charts embed every session or turn they show and leave Vega-Lite to
+aggregate them in the browser, so specs grow with the number of debates. In
+aggregated mode, chart helpers instead compute their groupings, proportions,
+means and counts with the functions here and embed only the aggregated table.
+
+Confidence intervals are bootstrapped like Vega-Lite's `ci0`/`ci1` aggregates,
+but for all groups at once with batched NumPy resampling and a fixed seed, so
+they're reproducible. They're cached by the values they're computed from.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from typing import *
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+# Like Vega's `ci0`/`ci1`: 95% percentile intervals from 1000 resamples.
+bootstrap_resamples = 1000
+bootstrap_alpha = 0.05
+bootstrap_seed = 0
+# Resampled values held in memory at once.
+bootstrap_batch_values = 10_000_000
+# Number of (per-call) bootstrap results cached; cleared whenever the data is reloaded.
+bootstrap_cache_size = 512
+
+_bootstrap_cache: "OrderedDict[str, Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+_bootstrap_cache_lock = threading.Lock()
+
+
+def group_by(frame: pd.DataFrame, groups: Sequence[str]):
+    """Group `frame` by the `groups` columns (keeping missing values as a group), or as a whole if there are none."""
+    if len(groups) > 0:
+        # pandas drops missing values of categorical keys even with `dropna=False`, so group by their values
+        keys = [
+            frame[g].astype(object) if isinstance(frame[g].dtype, pd.CategoricalDtype) else frame[g]
+            for g in groups
+        ]
+        return frame.groupby(keys, dropna=False, sort=False)
+    else:
+        return frame.groupby(np.zeros(len(frame), dtype=int), sort=False)
+
+
+def ungroup(result: pd.DataFrame, groups: Sequence[str]) -> pd.DataFrame:
+    return result.reset_index(drop=len(groups) == 0)
+
+
+def bootstrap_mean_ci(
+    values: np.ndarray, group_ids: np.ndarray, num_groups: int, seed: int = bootstrap_seed
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Bootstrapped confidence intervals of the mean of `values` within each of `num_groups` groups.
+
+    `group_ids` gives the group (from 0 until `num_groups`) of each value; no value may be missing.
+    Every group is resampled in the same batches: each position in the (group-sorted) values draws a
+    random row of its own group. Returns the lower and upper bounds, which are NaN for empty groups.
+    """
+    lower = np.full(num_groups, np.nan)
+    upper = np.full(num_groups, np.nan)
+    if len(values) == 0:
+        return lower, upper
+    order = np.argsort(group_ids, kind="stable")
+    values = np.asarray(values, dtype=float)[order]
+    group_ids = group_ids[order]
+    counts = np.bincount(group_ids, minlength=num_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    present = counts > 0
+    draw_starts = starts[group_ids]
+    draw_counts = counts[group_ids]
+
+    rng = np.random.default_rng(seed)
+    means = np.empty((bootstrap_resamples, present.sum()))
+    batch_size = max(1, bootstrap_batch_values // len(values))
+    for batch_start in range(0, bootstrap_resamples, batch_size):
+        batch = min(batch_size, bootstrap_resamples - batch_start)
+        draws = draw_starts + (rng.random((batch, len(values)), dtype=np.float32) * draw_counts).astype(np.int64)
+        sums = np.add.reduceat(values[draws], starts[present], axis=1)
+        means[batch_start:batch_start + batch] = sums / counts[present]
+    lower[present], upper[present] = np.percentile(
+        means, [100 * bootstrap_alpha / 2, 100 * (1 - bootstrap_alpha / 2)], axis=0
+    )
+    return lower, upper
+
+
+def cached_bootstrap_mean_ci(values: np.ndarray, group_ids: np.ndarray, num_groups: int) -> Tuple[np.ndarray, np.ndarray]:
+    """`bootstrap_mean_ci`, reusing the result for the same values and groups."""
+    values = np.ascontiguousarray(values, dtype=float)
+    group_ids = np.ascontiguousarray(group_ids, dtype=np.int64)
+    digest = hashlib.sha1(values.tobytes() + group_ids.tobytes() + str(num_groups).encode()).hexdigest()
+    with _bootstrap_cache_lock:
+        if digest in _bootstrap_cache:
+            _bootstrap_cache.move_to_end(digest)
+            return _bootstrap_cache[digest]
+    result = bootstrap_mean_ci(values, group_ids, num_groups)
+    with _bootstrap_cache_lock:
+        _bootstrap_cache[digest] = result
+        while len(_bootstrap_cache) > bootstrap_cache_size:
+            _bootstrap_cache.popitem(last=False)
+    return result
+
+
+def clear_bootstrap_cache():
+    with _bootstrap_cache_lock:
+        _bootstrap_cache.clear()
+
+
+def mean_with_ci(frame: pd.DataFrame, field: str, groups: Sequence[str] = ()) -> pd.DataFrame:
+    """Per group: the count, mean and bootstrapped 95% confidence interval of `field`.
+
+    Returns columns `groups` + ["count", "mean", "ci0", "ci1"].
+    """
+    grouped = group_by(frame, groups)
+    stats = grouped[field].agg(["count", "mean"])
+    valid = frame[field].notna().values
+    group_ids = grouped.ngroup().values[valid]
+    stats["ci0"], stats["ci1"] = cached_bootstrap_mean_ci(frame[field].values[valid], group_ids, len(stats))
+    return ungroup(stats, groups)
+
+
+def outcome_value(prob) -> pd.Series:
+    """1 for a correct judgment, 0.5 for a tie, 0 otherwise; like `datum[...] > 0.5 ? 1 : ... == 0.5 ? 0.5 : 0`."""
+    # Vega expressions compare missing values as 0
+    prob = prob.fillna(0.0)
+    return pd.Series(np.select([prob > 0.5, prob == 0.5], [1.0, 0.5], default=0.0), index=prob.index)
+
+
+def accuracy_table(
+    source: pd.DataFrame,
+    groups: Sequence[str],
+    prob_correct_field: str,
+    prob_assigned_field: str,
+    invert: bool = False,
+    sort_fields: Sequence[str] = (),
+) -> pd.DataFrame:
+    """The aggregated data behind `accuracy_by_field`.
+
+    There is one row per group and distinct (probability correct, probability assigned)
+    pair, with its "count", the group's "total" and their "proportion", plus the group's
+    win rate ("mean", "ci0" and "ci1") and the group means of `sort_fields`.
+    """
+    groups = list(groups)
+    prob_fields = list(dict.fromkeys([prob_correct_field, prob_assigned_field]))
+    if invert:
+        # like `datum[...] <= 0.5 ? 1 : ...`, which is 1 for ties too
+        wins = (source[prob_correct_field].fillna(0.0) <= 0.5).astype(float)
+    else:
+        wins = outcome_value(source[prob_assigned_field])
+    win_rates = mean_with_ci(source.assign(win=wins.values), "win", groups).rename(columns={"count": "total"})
+    for field in sort_fields:
+        win_rates[field] = group_by(source, groups)[field].mean().values
+
+    segments = ungroup(group_by(source, groups + prob_fields).size().rename("count").to_frame(), groups + prob_fields)
+    if len(groups) > 0:
+        table = segments.merge(win_rates, how="left", on=groups)
+    else:
+        table = segments.assign(**{
+            c: win_rates[c].iloc[0] if len(win_rates) > 0 else np.nan for c in win_rates.columns
+        })
+    table["proportion"] = table["count"] / table["total"]
+    return table
+
+
+def density(values: pd.Series, steps: int = 200) -> pd.DataFrame:
+    """Gaussian kernel density estimate of `values`, as Vega's density transform computes it by default.
+
+    The bandwidth follows Scott's rule as in Vega, and the density is sampled at
+    `steps` evenly spaced points over the extent of the values.
+    """
+    values = values.dropna().values.astype(float)
+    if len(values) == 0:
+        return pd.DataFrame({"value": [], "density": []})
+    quartiles = np.percentile(values, [25, 75])
+    spread = min(np.std(values, ddof=1) if len(values) > 1 else 0.0, (quartiles[1] - quartiles[0]) / 1.34)
+    bandwidth = 1.06 * (spread if spread > 0 else 1.0) * len(values) ** -0.2
+    grid = np.linspace(values.min(), values.max(), steps)
+    z = (grid[:, None] - values[None, :]) / bandwidth
+    estimates = np.exp(-0.5 * z ** 2).sum(axis=1) / (len(values) * bandwidth * np.sqrt(2 * np.pi))
+    return pd.DataFrame({"value": grid, "density": estimates})
+
+
+def grouped_density(frame: pd.DataFrame, field: str, groups: Sequence[str]) -> pd.DataFrame:
+    """`density` of `field` for each group, with columns `groups` + [`field`, "density"]."""
+    parts = []
+    for key, group in group_by(frame, groups):
+        estimates = density(group[field]).rename(columns={"value": field})
+        if len(groups) > 0:
+            key = key if isinstance(key, tuple) else (key,)
+            estimates = estimates.assign(**dict(zip(groups, key)))
+        parts.append(estimates)
+    if len(parts) == 0:
+        return pd.DataFrame(columns=list(groups) + [field, "density"])
+    return pd.concat(parts, ignore_index=True)[list(groups) + [field, "density"]]
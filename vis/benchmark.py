@@ -0,0 +1,151 @@
+"""Benchmarks of the analytics server's data loading and graph rendering.
+
+Times a full and an incremental `read_data`, and the rendering (chart building
+and spec serialization) of every graph and personalized graph, and writes the
+results as JSON, which `--compare` lines up against an earlier run's, e.g.:
+
+    python vis/benchmark.py --rooms 3000 --output before.json
+    (change something)
+    python vis/benchmark.py --rooms 3000 --output after.json --compare before.json
+
+With `--rooms`, synthetic summaries (see `synthetic_data.py`) are generated
+first; otherwise the data in `--data-dir` is used.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from typing import *
+
+
+def best_of(repeat: int, run: Callable[[], Any]) -> float:
+    """The fastest of `repeat` runs in seconds, which is the least affected by noise."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(data_dir: str, repeat: int, num_users: int) -> Dict[str, Any]:
+    # the server loads the data from the environment when imported
+    os.environ["DATA_DIR"] = data_dir
+    os.environ["GRAPH_PRERENDER_WORKERS"] = "0"
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        import server
+        import_seconds = time.perf_counter() - start
+        results: Dict[str, Any] = {
+            "import": import_seconds,
+            "read_data (full)": best_of(repeat, lambda: server.read_data()),
+            "read_data (incremental)": best_of(repeat, lambda: server.read_data(incremental=True)),
+        }
+
+    def render(make_chart):
+        chart = make_chart()
+        return chart, chart.to_json(0)
+
+    graphs: Dict[str, Dict[str, float]] = {}
+    users = server.snapshot.sessions["Participant"].value_counts().index[:num_users]
+    cases = [(name, fn) for name, fn in server.all_graph_specifications.items()] + [
+        (f"{name}/{user}", (lambda fn, user: lambda: fn(user))(fn, user))
+        for name, fn in server.personalized_graph_specifications.items()
+        for user in users
+    ]
+    for name, make_chart in cases:
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                chart, spec = render(make_chart)
+                graphs[name] = {
+                    "render": best_of(repeat, make_chart),
+                    "serialize": best_of(repeat, lambda: chart.to_json(0)),
+                    "spec size": len(spec),
+                }
+            except Exception as e:
+                graphs[name] = {"error": f"{type(e).__name__}: {e}"}
+    results["graphs"] = graphs
+    return results
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any]) -> str:
+    """A table of each timing (and spec size) before and after, with their ratio."""
+    def rows(results):
+        yield from ((k, v) for k, v in results["results"].items() if k != "graphs")
+        for graph, stats in results["results"]["graphs"].items():
+            for stat, value in stats.items():
+                if stat != "error":
+                    yield f"{graph} ({stat})", value
+
+    old_rows = dict(rows(old))
+    lines = [f"{'':80} {old.get('commit') or 'old':>12} {new.get('commit') or 'new':>12} {'ratio':>8}"]
+    ratios = []
+    for name, value in rows(new):
+        if name not in old_rows:
+            continue
+        before = old_rows[name]
+        ratio = value / before if before else float("nan")
+        if before and not name.endswith("(spec size)"):
+            ratios.append(ratio)
+        lines.append(f"{name[:80]:80} {before:12.4g} {value:12.4g} {ratio:8.2f}")
+    if ratios:
+        lines.append(f"{'geometric mean of timing ratios':80} {'':12} {'':12} {statistics.geometric_mean(ratios):8.2f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time data loading and graph rendering of the analytics server.")
+    parser.add_argument("--data-dir", help="save directory with the summaries to load (default: $DATA_DIR or save)")
+    parser.add_argument("--rooms", type=int, help="benchmark on synthetic data with this many rooms instead")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic data")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each timing, of which the fastest is reported")
+    parser.add_argument("--users", type=int, default=3, help="number of users to render personalized graphs for")
+    parser.add_argument("--output", help="file to write the results to as JSON")
+    parser.add_argument("--compare", help="results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    if args.rooms is not None:
+        import synthetic_data
+        data_dir = tempfile.mkdtemp(prefix="debate-benchmark-")
+        synthetic_data.generate(data_dir, args.rooms, args.seed)
+    else:
+        data_dir = args.data_dir or os.environ.get("DATA_DIR", "save")
+
+    try:
+        results = {
+            "commit": commit(),
+            "data": {"rooms": args.rooms, "seed": args.seed} if args.rooms is not None else {"data dir": data_dir},
+            "repeat": args.repeat,
+            "results": run(data_dir, args.repeat, args.users),
+        }
+    finally:
+        if args.rooms is not None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(json.load(f), results))
+    else:
+        print(json.dumps(results, indent=2))
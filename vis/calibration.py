@@ -0,0 +1,143 @@
+"""Calibration tables for the analytics charts.
+
+All calibration charts bin the judges' confidence the same way and only group
+the bins differently, so `calibration_counts` bins every judgment once per
+(re)load, at all bin sizes at once, and counts them per participant, role,
+setting, bin and probability. Calibration charts, including the personal
+ones (given a participant's counts), then read the bins they need from those
+counts with `calibration_table` and `calibration_segments` instead of
+rescanning the sessions or turns.
+"""
+
+from typing import *
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+import aggregate
+import derived
+
+# Bin sizes for which judgments are counted.
+bin_sizes = derived.confidence_bin_sizes
+# Columns the counts are kept by, besides the bin; turns are also kept by round.
+key_columns = ["Participant", "Role", "Setting"]
+turn_key_columns = key_columns + ["Num previous debating rounds"]
+# Columns summed in the counts; all other columns identify the counted group.
+value_columns = ["count", "correct", "confidence"]
+
+
+def bin_indices(confidence: pd.Series, bin_size: float) -> np.ndarray:
+    """Index of the bin of width `bin_size` each confidence falls into, as `derived.confidence_bins` labels them."""
+    return np.floor(confidence.values.astype(float) / bin_size).astype(np.int64)
+
+
+def calibration_counts(
+    frame: pd.DataFrame, prob_correct_field: str, keys: Sequence[str] = key_columns, sizes: Sequence[float] = bin_sizes
+) -> pd.DataFrame:
+    """Number of judgments in `frame` per `keys`, bin size, "Bin" and probability correct.
+
+    Also sums their outcomes (1 if correct, 0.5 for a tie, 0 otherwise) as "correct", and their
+    confidence as "confidence". Judgments without a probability aren't counted.
+    """
+    keys = list(keys)
+    judged = frame[frame[prob_correct_field].notna()]
+    confidence = derived.prediction_confidence(judged[prob_correct_field])
+    outcomes = aggregate.outcome_value(judged[prob_correct_field])
+    binned = pd.concat([
+        judged[keys + [prob_correct_field]].assign(**{
+            "Bin size": bin_size,
+            "Bin": bin_indices(confidence, bin_size),
+            "correct": outcomes.values,
+            "confidence": confidence.values,
+        })
+        for bin_size in sizes
+    ], ignore_index=True)
+    groups = keys + ["Bin size", "Bin", prob_correct_field]
+    grouped = aggregate.group_by(binned, groups)
+    counts = grouped[["correct", "confidence"]].sum()
+    counts.insert(0, "count", grouped.size())
+    return aggregate.ungroup(counts, groups)
+
+
+def sorted_counts(counts: pd.DataFrame) -> pd.DataFrame:
+    """`counts` in the order of their groups, so the same counts are in the same order however they were combined."""
+    groups = [column for column in counts.columns if column not in value_columns]
+    by_value = {
+        column: counts[column].astype(object) if isinstance(counts[column].dtype, pd.CategoricalDtype) else counts[column]
+        for column in groups
+    }
+    order = pd.DataFrame(by_value).sort_values(groups, kind="stable", na_position="last").index
+    return counts.loc[order].reset_index(drop=True)
+
+
+def update_counts(counts: pd.DataFrame, removed: pd.DataFrame, added: pd.DataFrame) -> pd.DataFrame:
+    """`counts` without the `removed` counts and with the `added` ones (all with the same columns).
+
+    E.g., on a refresh, the counts of the changed rooms' old rows are removed and those of their new rows added.
+    """
+    if len(removed) == 0 and len(added) == 0:
+        return counts
+    groups = [column for column in counts.columns if column not in value_columns]
+    combined = pd.concat([
+        counts,
+        removed.assign(**{column: -removed[column] for column in value_columns}),
+        added,
+    ], ignore_index=True)
+    summed = aggregate.ungroup(aggregate.group_by(combined, groups)[value_columns].sum(), groups)
+    return sorted_counts(summed[summed["count"] > 0][list(counts.columns)])
+
+
+def bin_labels(bins: pd.Series, bin_size: float, percent: bool = False) -> pd.Series:
+    labels = {bot: derived.confidence_bin_label(int(bot), bin_size, percent) for bot in bins.unique()}
+    return bins.map(labels)
+
+
+def select_bins(counts: pd.DataFrame, bin_size: float) -> pd.DataFrame:
+    return counts[np.isclose(counts["Bin size"].values, bin_size)]
+
+
+def calibration_table(
+    counts: pd.DataFrame,
+    bin_size: float,
+    groups: Sequence[str] = (),
+    bin_field: str = "Confidence bin",
+    percent: bool = False,
+) -> pd.DataFrame:
+    """Per group and bin of `counts`: the "count" of judgments and their accuracy ("mean", "ci0" and "ci1").
+
+    The bin is labeled in `bin_field`; confidence intervals are bootstrapped as in `aggregate.mean_with_ci`.
+    """
+    selected = select_bins(counts, bin_size)
+    keys = list(groups) + ["Bin"]
+    # one row per judgment, but only of the columns needed, to bootstrap the accuracy
+    repeats = selected["count"].values
+    judgments = pd.DataFrame({
+        **{key: np.repeat(selected[key].values, repeats) for key in keys},
+        "correct": np.repeat((selected["correct"] / selected["count"]).values, repeats),
+    })
+    table = aggregate.mean_with_ci(judgments, "correct", keys)
+    table[bin_field] = bin_labels(table["Bin"], bin_size, percent)
+    return table.drop(columns=["Bin"])
+
+
+def calibration_segments(
+    counts: pd.DataFrame,
+    bin_size: float,
+    prob_correct_field: str,
+    groups: Sequence[str] = (),
+    bin_field: str = "Confidence bin",
+) -> pd.DataFrame:
+    """Like `aggregate.accuracy_table` with the confidence bin as the group, but from `counts`.
+
+    There is one row per group, bin and probability correct, with its "count", the bin's "total"
+    and their "proportion", plus the bin's accuracy ("mean", "ci0" and "ci1").
+    """
+    selected = select_bins(counts, bin_size)
+    keys = list(groups) + ["Bin"]
+    segments = aggregate.ungroup(
+        aggregate.group_by(selected, keys + [prob_correct_field])["count"].sum().to_frame(), keys + [prob_correct_field]
+    )
+    segments[bin_field] = bin_labels(segments["Bin"], bin_size)
+    accuracy = calibration_table(counts, bin_size, groups, bin_field).rename(columns={"count": "total"})
+    table = segments.drop(columns=["Bin"]).merge(accuracy, how="left", on=list(groups) + [bin_field])
+    table["proportion"] = table["count"] / table["total"]
+    return table
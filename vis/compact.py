@@ -0,0 +1,162 @@
+"""Compact column types for the analytics tables.
+
+Names of rooms, participants, roles, settings, etc. are repeated on every row
+of every table, and by default pandas stores each as a separate Python string.
+`compact_tables` encodes them as categoricals, with one dictionary per column
+name shared by all tables (so that joins and concatenations between them keep the
+encoding, while grouping by a column only considers its own values), and
+downcasts numeric columns where that loses nothing.
+"""
+
+from typing import *
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+# Object columns are encoded as categoricals if they have at most this many distinct values per row
+# (across all tables), which leaves out free text like speeches.
+max_distinct_ratio = 0.5
+
+
+def is_string_column(column: pd.Series) -> bool:
+    if column.dtype == object:
+        return pd.api.types.infer_dtype(column, skipna=True) in ("string", "empty")
+    return isinstance(column.dtype, pd.CategoricalDtype)
+
+
+def categorical_columns(tables: Dict[str, pd.DataFrame]) -> List[str]:
+    """Names of the string columns with few distinct values across `tables`."""
+    values: Dict[str, Set[str]] = {}
+    rows: Dict[str, int] = {}
+    for frame in tables.values():
+        for name in frame.columns:
+            if is_string_column(frame[name]):
+                values.setdefault(name, set()).update(frame[name].dropna().unique())
+                rows[name] = rows.get(name, 0) + len(frame)
+    return [name for name in values if len(values[name]) <= max_distinct_ratio * max(rows[name], 1)]
+
+
+def downcast(column: pd.Series) -> pd.Series:
+    """`column` with a smaller numeric type if all its values fit exactly."""
+    if not isinstance(column.dtype, np.dtype) or pd.api.types.is_bool_dtype(column.dtype):
+        return column
+    if pd.api.types.is_integer_dtype(column.dtype) and column.dtype.itemsize > 4:
+        # not below 32 bits, so that arithmetic on the values doesn't overflow
+        if len(column) == 0 or (column.min() >= np.iinfo(np.int32).min and column.max() <= np.iinfo(np.int32).max):
+            return column.astype(np.int32)
+    elif pd.api.types.is_float_dtype(column.dtype) and column.dtype.itemsize > 4:
+        smaller = column.astype(np.float32)
+        if np.array_equal(smaller.values.astype(column.dtype), column.values, equal_nan=True):
+            return smaller
+    return column
+
+
+def compact_tables(tables: Dict[str, pd.DataFrame], columns: Optional[Sequence[str]] = None) -> Dict[str, pd.DataFrame]:
+    """Copies of `tables` with categorical `columns` (by default, `categorical_columns(tables)`) and downcast numbers."""
+    if columns is None:
+        columns = categorical_columns(tables)
+    categories: Dict[str, Set[str]] = {name: set() for name in columns}
+    for frame in tables.values():
+        for name in columns:
+            if name in frame.columns:
+                categories[name].update(frame[name].dropna().unique())
+    dtypes = {name: pd.CategoricalDtype(sorted(values)) for name, values in categories.items()}
+
+    compacted = {}
+    for table_name, frame in tables.items():
+        frame = frame.copy(deep=False)
+        for name in frame.columns:
+            if name in columns:
+                frame[name] = frame[name].astype(object).astype(dtypes[name])
+            else:
+                frame[name] = downcast(frame[name])
+        compacted[table_name] = frame
+    return compacted
+
+
+def fits(column: pd.Series, dtype: np.dtype) -> bool:
+    """Whether all values of numeric `column` can be stored exactly as `dtype`."""
+    if pd.api.types.is_integer_dtype(dtype):
+        if not pd.api.types.is_integer_dtype(column.dtype):
+            return False
+        info = np.iinfo(dtype)
+        return len(column) == 0 or (column.min() >= info.min and column.max() <= info.max)
+    if pd.api.types.is_float_dtype(dtype) and pd.api.types.is_numeric_dtype(column.dtype):
+        if pd.api.types.is_bool_dtype(column.dtype):
+            return False
+        return np.array_equal(column.values.astype(dtype).astype(float), column.values.astype(float), equal_nan=True)
+    return False
+
+
+def conform(frame: pd.DataFrame, like: pd.DataFrame) -> pd.DataFrame:
+    """`frame` with the compact column types of `like`, e.g., new rows for a compacted table.
+
+    Categoricals get the dictionary of `like`'s column, extended with any new values (so the
+    dictionaries of `like`'s other tables then need extending as well; see `unify_dictionaries`),
+    and numbers are downcast like `like`'s where they fit.
+    """
+    dtypes = {}
+    for name in frame.columns:
+        if name not in like.columns:
+            continue
+        dtype = like[name].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            new_values = pd.Index(frame[name].dropna().unique()).difference(dtype.categories)
+            if len(new_values) > 0:
+                dtype = pd.CategoricalDtype(sorted(set(dtype.categories) | set(new_values)))
+            dtypes[name] = dtype
+        elif isinstance(dtype, np.dtype) and dtype != frame[name].dtype and fits(frame[name], dtype):
+            dtypes[name] = dtype
+    return frame.astype(dtypes) if len(dtypes) > 0 else frame
+
+
+def unify_dictionaries(tables: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """`tables` with each categorical column's dictionary extended to the values it has in any of them.
+
+    Only the columns whose dictionaries differ are recoded, which only remaps their integer codes.
+    """
+    categories: Dict[str, Set[str]] = {}
+    for frame in tables.values():
+        for name in frame.columns:
+            if isinstance(frame[name].dtype, pd.CategoricalDtype):
+                categories.setdefault(name, set()).update(frame[name].cat.categories)
+    dtypes = {name: pd.CategoricalDtype(sorted(values)) for name, values in categories.items()}
+    unified = {}
+    for table_name, frame in tables.items():
+        recode = [
+            name for name in frame.columns
+            if isinstance(frame[name].dtype, pd.CategoricalDtype) and frame[name].dtype != dtypes[name]
+        ]
+        if len(recode) > 0:
+            frame = frame.copy(deep=False)
+            for name in recode:
+                frame[name] = frame[name].cat.set_categories(dtypes[name].categories)
+        unified[table_name] = frame
+    return unified
+
+
+def memory_usage(frame: pd.DataFrame) -> int:
+    """Bytes used by `frame`, not counting the dictionaries of its categoricals, which are shared between tables."""
+    total = frame.index.memory_usage(deep=True)
+    for name in frame.columns:
+        column = frame[name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            total += column.cat.codes.values.nbytes
+        else:
+            total += column.memory_usage(index=False, deep=True)
+    return int(total)
+
+
+def memory_report(before: Dict[str, pd.DataFrame], after: Dict[str, pd.DataFrame]) -> str:
+    """A line per table with its memory use before and after compacting it, plus one for the shared dictionaries."""
+    lines = []
+    dictionaries = {}
+    for name in before:
+        old, new = memory_usage(before[name]), memory_usage(after[name])
+        lines.append(f"{name}: {old / 2**20:.1f} MB -> {new / 2**20:.1f} MB ({new / max(old, 1):.0%})")
+        for column in after[name].columns:
+            dtype = after[name][column].dtype
+            if isinstance(dtype, pd.CategoricalDtype):
+                dictionaries[id(dtype.categories)] = dtype.categories
+    dictionary_size = sum(c.memory_usage(deep=True) for c in dictionaries.values())
+    lines.append(f"(shared dictionaries: {dictionary_size / 2**20:.1f} MB)")
+    return "\n".join(lines)
@@ -0,0 +1,39 @@
+"""Fixtures shared by the analytics server's tests."""
+
+import contextlib
+import importlib
+import io
+import os
+import shutil
+
+import pytest  # type: ignore
+
+import synthetic_data
+
+
+@pytest.fixture(scope="session")
+def server(tmp_path_factory):
+    """The server module, loaded with 300 synthetic rooms."""
+    data_dir = str(tmp_path_factory.mktemp("save"))
+    synthetic_data.generate(data_dir, 300)
+    os.environ["DATA_DIR"] = data_dir
+    os.environ["GRAPH_PRERENDER_WORKERS"] = "0"
+    # the server loads the data when imported
+    with contextlib.redirect_stdout(io.StringIO()):
+        module = importlib.import_module("server")
+    return module
+
+
+@pytest.fixture
+def scratch_server(server, tmp_path, monkeypatch):
+    """The server, loaded from a copy of its data, whose summaries the test can rewrite."""
+    data_dir = str(tmp_path / "save")
+    shutil.copytree(server.data_dir, data_dir)
+    monkeypatch.setattr(server, "data_dir", data_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        server.read_data()
+    yield server
+    monkeypatch.undo()
+    # back to the shared data, for the other tests
+    with contextlib.redirect_stdout(io.StringIO()):
+        server.read_data()
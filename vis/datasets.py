@@ -0,0 +1,129 @@
+"""Serving chart datasets by URL.
+
+By default Altair inlines each chart's data in its spec, so rows shared between
+charts are sent again with every one of them. When enabled, datasets are instead
+stored under a hash of their content and specs reference them by URL
+(`<base url>/data/<hash>.json` or `.csv`), so browsers can cache them across
+charts and page loads, and unchanged datasets keep their URL across refreshes.
+
+Datasets are kept in memory and also written to a directory for each data
+version (see `use_directory`), from which they're read back once evicted from
+memory. In shared mode, that's the shared generation's directory, so every
+server process can serve the datasets of specs rendered by any of them.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+
+from typing import *
+import altair as alt  # type: ignore
+import pandas as pd  # type: ignore
+
+from spec_cache import SpecCache
+
+formats = {"json": "application/json", "csv": "text/csv"}
+name_pattern = re.compile(r"[0-9a-f]{32}\.(json|csv)")
+
+base_url: Optional[str] = None
+data_format = "json"
+store = SpecCache(max_entries=0)
+# Directories datasets are written to (the first) and read back from (both): that of the current data version,
+# and that of the previous one, whose specs may still be served while the current ones are being rendered.
+directories: List[str] = []
+
+_recording = threading.local()
+
+
+def enable(url: str, format: str = "json", max_bytes: Optional[int] = None):
+    """Reference datasets as `<url>/data/<hash>.<format>` in all charts rendered from now on."""
+    global base_url, data_format, store
+    if format not in formats:
+        raise ValueError(f"Unsupported dataset format: {format}")
+    base_url = url.rstrip("/")
+    data_format = format
+    store = SpecCache(max_entries=1000000, max_bytes=max_bytes)
+    alt.data_transformers.register("hashed_url", to_hashed_url)
+    alt.data_transformers.enable("hashed_url", max_rows=1000000)
+
+
+def serialize(data: pd.DataFrame) -> str:
+    if data_format == "csv":
+        return alt.utils.sanitize_dataframe(data).to_csv(index=False)
+    else:
+        return json.dumps(alt.to_values(data)["values"], separators=(",", ":"))
+
+
+def to_hashed_url(data, max_rows: int = 1000000):
+    """An Altair data transformer storing `data` in `store` and referencing it by URL."""
+    if not isinstance(data, pd.DataFrame):
+        return alt.to_values(data)
+    data = alt.limit_rows(data, max_rows=max_rows)
+    content = serialize(data)
+    name = f"{hashlib.sha256(content.encode()).hexdigest()[:32]}.{data_format}"
+    put(name, content)
+    recorded = getattr(_recording, "datasets", None)
+    if recorded is not None:
+        recorded[name] = content
+    return {"url": f"{base_url}/data/{name}", "format": {"type": data_format}}
+
+
+@contextlib.contextmanager
+def recording():
+    """Collect the datasets stored in this thread, e.g., to send them back from a worker process."""
+    recorded: Dict[str, str] = {}
+    _recording.datasets = recorded
+    try:
+        yield recorded
+    finally:
+        _recording.datasets = None
+
+
+def use_directory(path: str) -> Optional[str]:
+    """Write datasets to `path` from now on; returns the directory which is no longer read from, if any."""
+    global directories
+    os.makedirs(path, exist_ok=True)
+    if directories and directories[0] == path:
+        return None
+    directories, dropped = [path] + directories[:1], directories[1:]
+    return dropped[0] if dropped else None
+
+
+def put(name: str, content: str):
+    store.put(name, content)
+    if not directories or os.path.exists(os.path.join(directories[0], name)):
+        return
+    path = os.path.join(directories[0], name)
+    try:
+        # written under a temporary name first, so other processes never read part of a dataset
+        temp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+    except OSError as e:
+        # e.g., the directory was removed along with an old generation; it's still served from memory
+        print(f"Could not write dataset {name}: {e}")
+
+
+def add_all(datasets: Dict[str, str]):
+    for name, content in datasets.items():
+        put(name, content)
+
+
+def get(name: str) -> Optional[str]:
+    content = store.get(name)
+    if content is not None or not name_pattern.fullmatch(name):
+        return content
+    for directory in directories:
+        try:
+            with open(os.path.join(directory, name)) as f:
+                content = f.read()
+        except FileNotFoundError:
+            continue
+        store.put(name, content)
+        return content
+    return None
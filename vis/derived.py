@@ -0,0 +1,220 @@
+"""Derived columns for the analytics frames.
+
+These are computed once, with vectorized pandas/NumPy expressions, whenever the
+data is (re)loaded, so chart functions can just read them. Every derivation only
+looks at rows from the same room, so on incremental refreshes it can be run on
+the changed rooms alone.
+"""
+
+from typing import *
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+# Bin sizes for which confidence bin columns are precomputed.
+confidence_bin_sizes = [0.05, 0.1]
+# The webapp keeps judges' probabilities within these bounds; rewards clip to them so log scores stay finite.
+reward_probability_bounds = (0.01, 0.99)
+
+
+def judge_setting(role, is_offline, is_single_debater, has_honest_debater):
+    """The judge's role, annotated with the kind of debate they judged."""
+    suffix = np.select(
+        [is_offline, is_single_debater & has_honest_debater, is_single_debater],
+        [" (no live judge)", " (single honest debater)", " (single dishonest debater)"],
+        default="",
+    )
+    return role + suffix
+
+
+def judge_setting_honesty_hidden(role, is_offline, is_single_debater):
+    """Like `judge_setting`, but without revealing the honesty of single debaters."""
+    suffix = np.select(
+        [is_offline, is_single_debater],
+        [" (no live judge)", " (single debater)"],
+        default="",
+    )
+    return role + suffix
+
+
+def setting(honest_debater, dishonest_debater, is_single_debater):
+    """"Human Debate", "AI Consultancy", etc."""
+    has_ai = (honest_debater == "GPT-4") | (dishonest_debater == "GPT-4")
+    ai_or_human = np.where(has_ai, "AI", "Human")
+    consultancy_or_debate = np.where(is_single_debater, "Consultancy", "Debate")
+    return pd.Series(ai_or_human, index=honest_debater.index) + " " + consultancy_or_debate
+
+
+def consultancy_setting(honest_debater, dishonest_debater):
+    """Consultancy setting including the consultant's honesty; only meaningful for single-debater rooms."""
+    return pd.Series(
+        np.select(
+            [
+                honest_debater == "GPT-4",
+                dishonest_debater == "GPT-4",
+                honest_debater.notna(),
+            ],
+            [
+                "AI Consultancy (honest)",
+                "AI Consultancy (dishonest)",
+                "Human Consultancy (honest)",
+            ],
+            default="Human Consultancy (dishonest)",
+        ),
+        index=honest_debater.index,
+    )
+
+
+def bin_num_rounds(num_rounds):
+    return pd.Series(
+        np.select(
+            [num_rounds == 1, num_rounds == 2, num_rounds.isin([3, 4])],
+            ["1", "2", "3-4"],
+            default="5+",
+        ),
+        index=num_rounds.index,
+    )
+
+
+def outcome(prob_correct):
+    return pd.Series(
+        np.select(
+            [prob_correct.isna(), prob_correct == 0.5, prob_correct > 0.5],
+            ["incomplete", "tie", "correct"],
+            default="incorrect",
+        ),
+        index=prob_correct.index,
+    )
+
+
+def prediction_confidence(prob_correct):
+    return prob_correct.where(~(prob_correct < 0.5), 1 - prob_correct)
+
+
+def confidence_bin_label(bot: int, bin_size: float, percent: bool = False) -> str:
+    top = bot + 1
+    if percent:
+        return f'{bot * bin_size:.0%} – {top * bin_size:.0%}'
+    else:
+        return f'{bot * bin_size:.2f} – {top * bin_size:.2f}'
+
+
+def confidence_bin_column(bin_size: float) -> str:
+    return f'Confidence bin ({bin_size:.2f})'
+
+
+def confidence_bins(confidence, bin_size: float, percent: bool = False):
+    """Label each confidence with its bin; labels are only formatted once per distinct bin."""
+    bots = np.floor(confidence / bin_size)
+    labels = {
+        bot: confidence_bin_label(int(bot), bin_size, percent)
+        for bot in bots.dropna().unique()
+    }
+    return bots.map(labels)
+
+
+def identity_guesses(sessions, debaters_and_judge):
+    """Number of correct identity guesses; `debaters_and_judge` holds each room's actual participants."""
+    roles = ["Debater A", "Debater B", "Judge"]
+    return sum(
+        (debaters_and_judge[role].values == sessions["identity guesses." + role].values).astype(int)
+        for role in roles
+    )
+
+
+def end_weeks(end_time):
+    """Week number and "Mon01|Sun07"-style label of the week each end time falls into."""
+    week = end_time.dt.isocalendar().week.astype("float64")
+    # The Monday of week `week` of the calendar year, as strptime("%Y-%W-1") gives it.
+    new_years_day = pd.to_datetime(end_time.dt.year.astype("Int64").astype(str) + "-01-01", errors="coerce")
+    first_monday_offset = (7 - new_years_day.dt.weekday) % 7
+    start_date = new_years_day + pd.to_timedelta(first_monday_offset + 7 * (week - 1), unit="D")
+    end_date = start_date + pd.Timedelta(days=6)
+    label = start_date.dt.strftime("%b%d") + "|" + end_date.dt.strftime("%b%d")
+    return week.astype("Int64"), label
+
+
+# All columns added by `add_derived_columns`.
+derived_columns = [
+    "Final probability correct (live and mean of offline)",
+    "End week",
+    "End week label",
+    "Judge setting",
+    "Judge setting (honesty hidden)",
+    "Setting",
+    "Consultancy setting",
+    "Number of debate rounds (binned)",
+    "outcome",
+    "Final probability correct (with imputation)",
+    "Final probability correct (dist from half)",
+    "Log final probability correct",
+    "Guesses",
+    "Prediction confidence",
+] + [confidence_bin_column(bin_size) for bin_size in confidence_bin_sizes]
+
+
+def without_derived_columns(frame, keep: Sequence[str] = ()):
+    """Drop the derived columns not in `keep`, e.g., so that charts don't embed data they don't use."""
+    return frame.drop(columns=[c for c in derived_columns if c in frame.columns and c not in keep])
+
+
+def add_derived_columns(debates, sessions, turns):
+    """Return copies of the frames with all derived columns added."""
+    debates = debates.copy()
+    sessions = sessions.copy()
+    turns = turns.copy()
+
+    debates["Final probability correct (live and mean of offline)"] = debates["Final probability correct"].where(
+        debates["Is offline"] == False, debates["Average offline probability correct"]
+    )
+    debates["End week"], debates["End week label"] = end_weeks(debates["End time"])
+
+    room_attributes = debates.set_index("Room name")
+    def room_attribute(frame, column):
+        return frame["Room name"].map(room_attributes[column])
+
+    is_offline = room_attribute(sessions, "Is offline").astype(bool)
+    is_single_debater = room_attribute(sessions, "Is single debater").astype(bool)
+    has_honest_debater = room_attribute(sessions, "Has honest debater").astype(bool)
+    honest_debater = room_attribute(sessions, "Honest debater")
+    dishonest_debater = room_attribute(sessions, "Dishonest debater")
+
+    sessions["Judge setting"] = judge_setting(
+        sessions["Role"], is_offline, is_single_debater, has_honest_debater
+    )
+    sessions["Judge setting (honesty hidden)"] = judge_setting_honesty_hidden(
+        sessions["Role"], is_offline, is_single_debater
+    )
+    sessions["Setting"] = setting(honest_debater, dishonest_debater, is_single_debater)
+    turns["Setting"] = setting(
+        room_attribute(turns, "Honest debater"),
+        room_attribute(turns, "Dishonest debater"),
+        room_attribute(turns, "Is single debater").astype(bool)
+    )
+    sessions["Consultancy setting"] = consultancy_setting(honest_debater, dishonest_debater).where(is_single_debater)
+    sessions["Number of debate rounds (binned)"] = bin_num_rounds(room_attribute(sessions, "Number of debate rounds"))
+    sessions["outcome"] = outcome(sessions["Final probability correct"])
+    sessions["Final probability correct (with imputation)"] = sessions["Final probability correct"].fillna(0.5)
+    sessions["Final probability correct (dist from half)"] = (sessions["Final probability correct"] - 0.5).abs().fillna(0.0)
+    sessions["Log final probability correct"] = np.log(sessions["Final probability correct"])
+    if all(("identity guesses." + role) in sessions.columns for role in ["Debater A", "Debater B", "Judge"]):
+        sessions["Guesses"] = identity_guesses(
+            sessions,
+            {role: room_attribute(sessions, role) for role in ["Debater A", "Debater B", "Judge"]}
+        )
+
+    for frame, prob_correct_field in [(sessions, "Final probability correct"), (turns, "Probability correct")]:
+        frame["Prediction confidence"] = prediction_confidence(frame[prob_correct_field])
+        for bin_size in confidence_bin_sizes:
+            frame[confidence_bin_column(bin_size)] = confidence_bins(frame["Prediction confidence"], bin_size)
+
+    return debates, sessions, turns
+
+
+def rewards(leaderboard):
+    """Judge and debater rewards (log scores) of judged sessions."""
+    prob_correct = leaderboard["Final probability correct"].clip(*reward_probability_bounds)
+    return {
+        "Judge reward": np.log(prob_correct) - (0.05 * leaderboard["Number of judge continues"]),
+        "Honest debater reward": np.log(prob_correct),
+        "Dishonest debater reward": np.log(1 - prob_correct),
+    }
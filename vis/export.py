@@ -0,0 +1,68 @@
+"""Streaming exports of the analytics tables and of the data behind charts.
+
+Rows are selected by position and serialized a chunk at a time, as
+newline-delimited JSON or CSV, so an export never holds more than one chunk's
+text (or copy of its rows) in memory, however large the table is.
+"""
+
+from typing import *
+import altair as alt  # type: ignore
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+formats = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# Rows serialized at a time.
+chunk_rows = 10_000
+
+
+def matching_positions(frame: pd.DataFrame, filters: Dict[str, Sequence[Any]]) -> np.ndarray:
+    """Positions of the rows of `frame` that match all `filters`.
+
+    Each filter maps a column to the values allowed in it, and only applies if `frame` has the
+    column and some values are given.
+    """
+    mask = np.ones(len(frame), dtype=bool)
+    for column, values in filters.items():
+        if len(values) > 0 and column in frame.columns:
+            mask &= frame[column].isin(values).values
+    return np.flatnonzero(mask)
+
+
+def serialize_rows(
+    frame: pd.DataFrame, positions: np.ndarray, format: str, dataset: Optional[int] = None, header: bool = True
+) -> Iterator[str]:
+    """The rows of `frame` at `positions` as text in `format`, a chunk at a time.
+
+    With `dataset`, each row is labeled with it in a "dataset" column.
+    """
+    if format == "csv" and header and len(positions) == 0:
+        yield frame.iloc[:0].to_csv(index=False)
+    for start in range(0, len(positions), chunk_rows):
+        chunk = frame.iloc[positions[start:start + chunk_rows]]
+        if dataset is not None:
+            chunk = chunk.assign(dataset=dataset)
+        if format == "csv":
+            yield chunk.to_csv(index=False, header=header and start == 0)
+        else:
+            yield chunk.to_json(orient="records", lines=True, date_format="iso").rstrip("\n") + "\n"
+
+
+def chart_frames(chart) -> List[pd.DataFrame]:
+    """The distinct data frames of `chart` and of the charts layered, concatenated or faceted in it."""
+    frames: Dict[int, pd.DataFrame] = {}
+
+    def visit(part):
+        data = getattr(part, "data", alt.Undefined)
+        if isinstance(data, pd.DataFrame):
+            frames.setdefault(id(data), data)
+        for attribute in ("layer", "concat", "hconcat", "vconcat"):
+            children = getattr(part, attribute, alt.Undefined)
+            if isinstance(children, list):
+                for child in children:
+                    visit(child)
+        spec = getattr(part, "spec", alt.Undefined)
+        if spec is not alt.Undefined:
+            visit(spec)
+
+    visit(chart)
+    return list(frames.values())
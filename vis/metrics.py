@@ -0,0 +1,129 @@
+"""Instrumentation of data loading and graph rendering.
+
+`read_data` times each stage of a (re)load and records how much the process's
+memory grew over it, and every rendered graph records how long building the
+chart and serializing its spec took, how large the spec was, and whether it
+was served from the cache. `exposition` formats all of it for Prometheus.
+"""
+
+import contextlib
+import os
+import threading
+import time
+
+from typing import *
+
+_lock = threading.Lock()
+# stage -> (seconds, memory delta in bytes) of the latest load
+_load_stages: Dict[str, Tuple[float, Optional[int]]] = {}
+_loads: Dict[str, int] = {}
+# graph -> statistic -> value
+_graphs: Dict[str, Dict[str, float]] = {}
+
+
+def rss_bytes() -> Optional[int]:
+    """The resident memory of this process, where /proc is available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def start_load(kind: str):
+    """Forget the stages of the previous load, which may have had others."""
+    with _lock:
+        _load_stages.clear()
+        _loads[kind] = _loads.get(kind, 0) + 1
+
+
+@contextlib.contextmanager
+def load_stage(name: str):
+    memory_before = rss_bytes()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        memory_after = rss_bytes()
+        memory_delta = None if memory_before is None or memory_after is None else memory_after - memory_before
+        with _lock:
+            _load_stages[name] = (seconds, memory_delta)
+
+
+def record_render(graph: str, render_seconds: float, serialize_seconds: float, spec_size: int):
+    with _lock:
+        stats = _graphs.setdefault(graph, {})
+        stats["renders"] = stats.get("renders", 0) + 1
+        stats["render seconds"] = stats.get("render seconds", 0.0) + render_seconds
+        stats["serialize seconds"] = stats.get("serialize seconds", 0.0) + serialize_seconds
+        stats["spec size"] = spec_size
+
+
+def record_request(graph: str, hit: bool):
+    with _lock:
+        stats = _graphs.setdefault(graph, {})
+        key = "hits" if hit else "misses"
+        stats[key] = stats.get(key, 0) + 1
+
+
+def timed_render(graph: str, make_chart: Callable[[], Any]) -> Tuple[str, Tuple[float, float]]:
+    """Build and serialize a chart, recording its metrics; also returns the (render, serialize) seconds."""
+    start = time.perf_counter()
+    chart = make_chart()
+    rendered = time.perf_counter()
+    spec = chart.to_json(0)
+    serialized = time.perf_counter()
+    timings = (rendered - start, serialized - rendered)
+    record_render(graph, *timings, len(spec))
+    return spec, timings
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def exposition(gauges: Optional[Dict[str, float]] = None, counters: Optional[Dict[str, float]] = None) -> str:
+    """All metrics in the Prometheus text format, along with the given extra `gauges` and `counters`.
+
+    The names of `counters` must end in "_total".
+    """
+    lines = []
+
+    def family(name: str, kind: str, help: str, samples: Iterable[Tuple[Dict[str, str], float]]):
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+    with _lock:
+        family("analytics_loads_total", "counter", "Number of data (re)loads.", [
+            ({"kind": kind}, count) for kind, count in _loads.items()
+        ])
+        family("analytics_load_stage_seconds", "gauge", "Duration of each stage of the latest load.", [
+            ({"stage": stage}, seconds) for stage, (seconds, _) in _load_stages.items()
+        ])
+        family("analytics_load_stage_memory_bytes", "gauge", "Growth of resident memory over each stage of the latest load.", [
+            ({"stage": stage}, delta) for stage, (_, delta) in _load_stages.items() if delta is not None
+        ])
+        graphs = sorted(_graphs.items())
+        for name, stat, help in [
+            ("analytics_graph_render_seconds_total", "render seconds", "Total time spent building each graph's chart."),
+            ("analytics_graph_serialize_seconds_total", "serialize seconds", "Total time spent serializing each graph's spec."),
+            ("analytics_graph_renders_total", "renders", "Number of times each graph was rendered."),
+        ]:
+            family(name, "counter", help, [({"graph": graph}, stats[stat]) for graph, stats in graphs if stat in stats])
+        family("analytics_graph_spec_bytes", "gauge", "Size of each graph's latest spec.", [
+            ({"graph": graph}, stats["spec size"]) for graph, stats in graphs if "spec size" in stats
+        ])
+        family("analytics_graph_requests_total", "counter", "Requests for each graph, by whether its spec was cached.", [
+            ({"graph": graph, "cache": cache}, stats.get(stat, 0))
+            for graph, stats in graphs
+            for cache, stat in [("hit", "hits"), ("miss", "misses")]
+            if "hits" in stats or "misses" in stats
+        ])
+    for kind, values in [("gauge", gauges or {}), ("counter", counters or {})]:
+        for name, value in values.items():
+            family(name, kind, name.replace("_", " ").capitalize() + ".", [({}, value)])
+    return "\n".join(lines) + "\n"
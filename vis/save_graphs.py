@@ -0,0 +1,169 @@
+"""Saves every analytics graph to files, e.g., for reports and papers.
+
+Renders all graphs of the analytics server (and, with `--personalized`, every
+participant's personalized graphs) in parallel worker processes, and writes
+each as a Vega-Lite spec and/or an image, e.g.:
+
+    python vis/save_graphs.py --output-dir figures --formats json svg png
+
+SVG and PNG files are made with `altair_saver` (see requirements.txt), which
+needs a browser driver for Selenium or the Vega CLI. A manifest in the output
+directory records the summaries and code each file was made from: graphs are
+only rendered again if either changed (or with `--force`), and images are
+only redrawn if the graph's spec changed.
+"""
+
+import argparse
+import contextlib
+import glob
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from typing import *
+
+manifest_name = "manifest.json"
+
+# The server module, imported in `main` once the environment is set up; forked workers inherit it.
+server: Any = None
+
+
+def code_hash() -> str:
+    """Hash of the analytics server's code, which all graphs depend on."""
+    digest = hashlib.sha1()
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def data_stamp(window) -> str:
+    """Identifies the summaries and time window the graphs were rendered from, along with the code that rendered them."""
+    sources = json.dumps([server.summary_sources(), window], sort_keys=True)
+    return hashlib.sha1((sources + code_hash()).encode()).hexdigest()
+
+
+def output_path(output_dir: str, user: Optional[str], name: str, format: str) -> str:
+    if user is None:
+        return os.path.join(output_dir, f"{name}.{format}")
+    return os.path.join(output_dir, "personalized", user, f"{name}.{format}")
+
+
+def save_graph(
+    output_dir: str, user: Optional[str], name: str, formats: Sequence[str], window, previous_spec_hash: Optional[str]
+) -> str:
+    """Render a graph from the data in time `window` and write it in `formats`; returns its spec's hash.
+
+    Images are only redrawn if the spec's hash differs from `previous_spec_hash` or they're missing.
+    """
+    data = server.window_view(server.snapshot, window)
+    with contextlib.redirect_stdout(io.StringIO()), server.pinned_data(data):
+        if user is None:
+            chart = server.all_graph_specifications[name]()
+        else:
+            chart = server.personalized_graph_specifications[name](user)
+        spec = chart.to_json(0)
+    spec_hash = hashlib.sha1(spec.encode()).hexdigest()
+    os.makedirs(os.path.dirname(output_path(output_dir, user, name, "json")), exist_ok=True)
+    for format in formats:
+        path = output_path(output_dir, user, name, format)
+        if spec_hash == previous_spec_hash and os.path.exists(path):
+            continue
+        if format == "json":
+            with open(path, "w") as f:
+                f.write(spec)
+        else:
+            import altair_saver  # type: ignore
+            altair_saver.save(json.loads(spec), path)
+    return spec_hash
+
+
+def main(args):
+    global server
+    # the server loads the data from the environment when imported
+    if args.data_dir is not None:
+        os.environ["DATA_DIR"] = args.data_dir
+    os.environ["GRAPH_PRERENDER_WORKERS"] = "0"
+    # saved specs include their data rather than referencing the server's
+    os.environ.pop("ANALYTICS_DATA_URL", None)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    with contextlib.redirect_stdout(io.StringIO()):
+        import server as loaded_server
+    server = loaded_server
+    if args.window not in server.time_windows:
+        print(f"Unknown time window {args.window}; the windows are {', '.join(server.time_windows)}")
+        return 2
+    window = server.named_time_window(args.window)
+    # computed once here, so forked workers share its tables
+    data = server.window_view(server.snapshot, window)
+
+    graphs: List[Tuple[Optional[str], str]] = [(None, name) for name in server.all_graph_specifications]
+    if args.personalized or args.users:
+        users = args.users or sorted(data.sessions["Participant"].dropna().unique())
+        graphs += [(user, name) for user in users for name in server.personalized_graph_specifications]
+
+    manifest_path = os.path.join(args.output_dir, manifest_name)
+    manifest: Dict[str, Dict[str, str]] = {}
+    if os.path.exists(manifest_path) and not args.force:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    stamp = data_stamp(window)
+
+    def key(user, name):
+        return name if user is None else f"{user}/{name}"
+
+    def up_to_date(user, name):
+        entry = manifest.get(key(user, name))
+        return (
+            entry is not None and entry["stamp"] == stamp
+            and all(os.path.exists(output_path(args.output_dir, user, name, format)) for format in args.formats)
+        )
+
+    todo = [(user, name) for user, name in graphs if not up_to_date(user, name)]
+    print(f"Saving {len(todo)} of {len(graphs)} graphs ({len(graphs) - len(todo)} unchanged)")
+    os.makedirs(args.output_dir, exist_ok=True)
+    # forked workers share the loaded data with this process instead of reloading it
+    context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+    failures = 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as pool:
+            futures = {
+                pool.submit(
+                    save_graph, args.output_dir, user, name, args.formats, window, manifest.get(key(user, name), {}).get("spec")
+                ): (user, name)
+                for user, name in todo
+            }
+            for future in as_completed(futures):
+                user, name = futures[future]
+                try:
+                    manifest[key(user, name)] = {"stamp": stamp, "spec": future.result()}
+                    print(f"Saved {key(user, name)}")
+                except Exception as e:
+                    failures += 1
+                    print(f"Could not save {key(user, name)}: {type(e).__name__}: {e}")
+    finally:
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+    return 1 if failures > 0 else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Save every analytics graph as a Vega-Lite spec and/or image.")
+    parser.add_argument("--data-dir", help="save directory with the summaries to load (default: $DATA_DIR or save)")
+    parser.add_argument("--output-dir", default="figures", help="directory to write the graphs to")
+    parser.add_argument(
+        "--formats", nargs="+", default=["json"], choices=["json", "svg", "png"], help="file formats to write"
+    )
+    parser.add_argument(
+        "--window", default=os.environ.get("DEFAULT_TIME_WINDOW", "official"),
+        help="named time window of debates to graph (see TIME_WINDOWS in vis/server.py)"
+    )
+    parser.add_argument("--personalized", action="store_true", help="also save every participant's personalized graphs")
+    parser.add_argument("--users", nargs="+", help="save the personalized graphs of only these participants")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--force", action="store_true", help="save all graphs, even if they're unchanged")
+    sys.exit(main(parser.parse_args()))
@@ -2,9 +2,13 @@ import sys
 from flask import Flask
 from flask import abort
 from flask import Response
+from flask import request
 
 import datetime
+import gzip
+import hashlib
 import json
+import uuid
 
 from typing import *
 import numpy as np  # type: ignore
@@ -14,20 +18,112 @@ import pandas as pd  # type: ignore
 from functools import reduce
 from functools import lru_cache
 
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 
+import atexit
+import contextlib
 import os
+import shutil
+import tempfile
+import threading
 
 import math
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 
 from altair import datum
 
+import aggregate
+import calibration
+import compact
+import datasets
+import derived
+import export
+import metrics
+import standings
+import summaries
+try:
+    import brotli  # type: ignore
+    has_brotli = True
+except ImportError:
+    has_brotli = False
+from spec_cache import SpecCache
+from summaries import read_summary
+
 app = Flask(__name__)
 
 alt.data_transformers.enable("default", max_rows=1000000)
 
 data_dir = os.environ.get("DATA_DIR", default="save")
 
+# If set, chart data is served from `/data/<hash>` and specs reference it under this base URL
+# (which must be reachable from the browser) instead of inlining it.
+if os.environ.get("ANALYTICS_DATA_URL"):
+    datasets.enable(
+        os.environ["ANALYTICS_DATA_URL"],
+        format=os.environ.get("ANALYTICS_DATA_FORMAT", default="json"),
+        max_bytes=int(os.environ.get("DATASET_CACHE_MB", default="1024")) * 1024 * 1024,
+    )
+
+# Personalized graphs are cached per user, too, so they're also bounded by total size and age.
+personalized_graph_cache = SpecCache(
+    max_entries=int(os.environ.get("PERSONALIZED_GRAPH_CACHE_SIZE", default="256")),
+    max_bytes=int(os.environ.get("PERSONALIZED_GRAPH_CACHE_MB", default="256")) * 1024 * 1024,
+    ttl=float(os.environ.get("PERSONALIZED_GRAPH_CACHE_TTL", default="600")),
+)
+# With aggregated charts, helpers like `accuracy_by_field` embed only aggregated tables in their specs, instead
+# of all the sessions/turns for Vega-Lite to aggregate. Confidence bands of means are bootstrapped on the server
+# either way (see `aggregate.mean_with_ci`).
+aggregate_charts = os.environ.get("AGGREGATE_CHARTS", default="false") == "true"
+# Number of worker processes used to pre-render all graphs after each (re)load and to render the graphs of `/graphs`
+# batches that aren't cached; 0 disables pre-rendering, and batches are then rendered in this process.
+# They're started fresh rather than forked, and load (or in shared mode, map) the data themselves.
+prerender_workers = int(os.environ.get("GRAPH_PRERENDER_WORKERS", default="0"))
+# Number of threads serving the graphs requested together from `/graphs`. Rendering holds the GIL,
+# so unless there are worker processes to send them to, these only overlap cache hits with renders.
+batch_workers = int(os.environ.get("GRAPH_BATCH_WORKERS", default="4"))
+# If set, server processes (e.g., gunicorn workers) share the loaded tables through memory-mapped files
+# in this directory, and a refresh in any of them is picked up by all the others.
+shared_data_dir = os.environ.get("SHARED_DATA_DIR")
+# Datasets are also written to a directory per data version (see `use_dataset_directory`), which in shared mode
+# is in the shared generation's directory. Otherwise, it's in this temporary one (render workers send theirs here).
+dataset_dir: Optional[str] = None
+if datasets.base_url is not None and shared_data_dir is None and multiprocessing.parent_process() is None:
+    dataset_dir = tempfile.mkdtemp(prefix="debate-datasets-")
+    atexit.register(shutil.rmtree, dataset_dir, ignore_errors=True)
+# Repeated strings in the tables are stored as categoricals and numbers downcast where lossless, unless set to false.
+compact_tables = os.environ.get("COMPACT_TABLES", default="true") == "true"
+# Named windows (since, until) of debate creation times (either bound may be None), which requests can select with
+# `?window=<name>`. More can be given as JSON in `TIME_WINDOWS`, e.g., '{"spring": ["2023-02-10", "2023-05-26"]}'.
+time_windows = {
+    "all": [None, None],
+    "official": ["2023-02-10", None],
+    **json.loads(os.environ.get("TIME_WINDOWS", default="{}")),
+}
+# The window shown to requests that don't ask for one.
+default_time_window = os.environ.get("DEFAULT_TIME_WINDOW", default="official")
+# Number of time windows whose tables are kept besides those of all the data; see `window_view`.
+time_window_cache_size = int(os.environ.get("TIME_WINDOW_CACHE_SIZE", default="8"))
+# Named samples of judgments, each read from a summary listing its "Room name" and "Judge" pairs; see `sample_view`.
+# The paper's sample is kept in the snapshot's `filtered_*` tables. More can be given as JSON in `SAMPLE_VIEWS`,
+# e.g., '{"pilot": "pilot-rooms"}' for `pilot-rooms.csv` in the summaries directory.
+sample_summaries = {"paper": "sample-rooms", **json.loads(os.environ.get("SAMPLE_VIEWS", default="{}"))}
+
+# The columns of `turns.csv` used by the graphs, derived tables and exports, which are the only ones loaded, so that
+# columns added to the summaries (e.g., more free text) don't slow down every refresh until they're listed here.
+turn_columns = [
+    "Room name", "Speech time", "Participant", "Role", "Role (honest/dishonest)", "Round index",
+    "Num previous debating rounds", "Quote length (tok)", "Probability correct",
+]
+# The speeches and quotes take up most of the time and memory spent loading the turns, and no graph shows them,
+# so they're only read on demand; see `with_turn_text`.
+turn_text_columns = ["Participant text", "Participant quote", "Participant quote span"]
+# Identify a turn, for matching up its text.
+turn_key_columns = ["Room name", "Round index", "Role", "Participant", "Speech time"]
+if shared_data_dir is not None:
+    import shared_data
+
 # set graphic parameters
 correctColor = "green"
 incorrectColor = "crimson"
@@ -39,31 +135,7 @@ fullWidth = 850
 fullHeight = 400
 
 
-def read_data():
-    global debates
-    global sessions
-    global filtered_sessions
-    global filtered_turns
-    global turns
-    global leaderboard
-    debates = pd.read_csv(os.path.join(data_dir, "official/summaries/debates.csv"), keep_default_na=True)
-    debates["Creation time"] = pd.to_datetime(debates["Creation time"], unit="ms")
-    debates["End time"] = pd.to_datetime(debates["End time"], unit="ms")
-    # only include debates after the given time
-    debates = debates[
-        (debates["Creation time"] > pd.to_datetime("10/02/23", format="%d/%m/%y"))# &
-        #(debates["End time"] < pd.to_datetime("21/05/23", format="%d/%m/%y"))
-    ]
-    debates["Final probability incorrect"] = 1 - debates["Final probability correct"]
-    sessions = pd.read_csv(os.path.join(data_dir, "official/summaries/sessions.csv"), keep_default_na=True)
-    # filter sessions to only the included debates
-    sessions = sessions.merge(debates[["Room name"]], how="inner", on="Room name")
-
-    turns = pd.read_csv(os.path.join(data_dir, "official/summaries/turns.csv"), keep_default_na=True)
-    turns["Room start time"] = pd.to_datetime(turns["Room start time"], unit="ms")
-    # filter turns to only the included debates
-    turns = turns.merge(debates[["Room name"]], how="inner", on="Room name")
-
+def make_leaderboard(debates, sessions):
     leaderboard = sessions.merge(
         debates[
             [
@@ -77,27 +149,459 @@ def read_data():
     )
     # filter to sessions corresponding to a judge
     leaderboard = leaderboard[leaderboard['Final probability correct'].notna()]
-    from math import log
-    leaderboard['Judge reward'] = leaderboard.apply(
-        lambda row: log(row['Final probability correct']) - (0.05 * row['Number of judge continues']),
-        axis=1
-    )
-    leaderboard['Honest debater reward'] = leaderboard.apply(
-        lambda row: log(row['Final probability correct']),
-        axis=1
-    )
-    leaderboard['Dishonest debater reward'] = leaderboard.apply(
-        lambda row: log(1 - row['Final probability correct']),
-        axis=1
-    )
+    return leaderboard.assign(**derived.rewards(leaderboard))
+
+def join_debate_attributes(frame, debates):
+    """`frame` with all the attributes of each row's debate; clashing debate columns get a " (debate)" suffix."""
+    return frame.merge(debates, how="left", on="Room name", suffixes=("", " (debate)"))
+
+# Tables computed from the summaries. Each only depends on rows from the same room.
+def derive_tables(debates, sessions, turns):
+    with metrics.load_stage("derived columns"):
+        debates, sessions, turns = derived.add_derived_columns(debates, sessions, turns)
+    with metrics.load_stage("leaderboard"):
+        leaderboard = make_leaderboard(debates, sessions)
+    with metrics.load_stage("joins"):
+        sessions_with_debates = join_debate_attributes(sessions, debates)
+        turns_with_debates = join_debate_attributes(turns, debates)
+    return debates, sessions, turns, leaderboard, sessions_with_debates, turns_with_debates
+
+class SampleView(NamedTuple):
+    """The sessions and turns of a sample's judges, alone and with the attributes of their debates."""
+    sessions: pd.DataFrame
+    turns: pd.DataFrame
+    sessions_with_debates: pd.DataFrame
+    turns_with_debates: pd.DataFrame
+
+def key_index(frame: pd.DataFrame, columns: Sequence[str]) -> Dict[Any, np.ndarray]:
+    """Hash index from the values of `columns` (a tuple if there are several) to the positions of the rows with them."""
+    keys = [frame[column].values for column in columns]
+    return pd.Series(np.arange(len(frame))).groupby(keys if len(keys) > 1 else keys[0], sort=False, observed=True).indices
+
+def join_sample(sample: pd.DataFrame, sample_keys: Sequence[str], frame: pd.DataFrame, index: Dict[Any, np.ndarray], outer: bool):
+    """The rows of `frame` that `index` finds for the keys of each row of `sample`, after that row's columns.
+
+    Like merging `frame` onto `sample`: if `outer`, sample rows without any get one row of missing values.
+    Columns of `frame` named like those of `sample` get a " (debate)" suffix, besides "Room name".
+    """
+    keys = zip(*[sample[column].values for column in sample_keys]) if len(sample_keys) > 1 else sample[sample_keys[0]].values
+    missing = np.array([-1] if outer else [], dtype=np.int64)
+    matches = [index.get(key, missing) for key in keys]
+    positions = np.concatenate(matches) if matches else missing[:0]
+    sample_positions = np.repeat(np.arange(len(sample)), [len(match) for match in matches])
+    rows = frame.drop(columns=["Room name"]).reset_index(drop=True)
+    if (positions < 0).any():
+        rows = rows.reindex(positions)
+    else:
+        rows = rows.iloc[positions]
+    rows = rows.rename(columns={column: f"{column} (debate)" for column in rows.columns if column in sample.columns})
+    return pd.concat([sample.iloc[sample_positions].reset_index(drop=True), rows.reset_index(drop=True)], axis=1)
+
+def materialize_sample(sample, debates, sessions, turns, sessions_with_debates, turns_with_debates) -> SampleView:
+    """The view of `sample`: each listed judge's session, and the judge turns of their room.
+
+    Sessions are found by room and participant, and turns by room, with hash indices built once for
+    all the tables; sampled rooms missing from `debates` are left out.
+    """
+    sample = sample[sample["Room name"].isin(debates["Room name"])]
+    # the joined tables have the same rows, in the same order, as the sessions and turns
+    session_index = key_index(sessions, ["Room name", "Participant"])
+    judge_turns = np.flatnonzero((turns["Role"] == "Judge").values)
+    turn_index = {room: judge_turns[positions] for room, positions in key_index(turns.iloc[judge_turns], ["Room name"]).items()}
+    return SampleView(*[
+        join_sample(sample, keys, frame, index, outer)
+        for frame, keys, index, outer in [
+            (sessions, ["Room name", "Judge"], session_index, True),
+            (turns, ["Room name"], turn_index, False),
+            (sessions_with_debates, ["Room name", "Judge"], session_index, True),
+            (turns_with_debates, ["Room name"], turn_index, False),
+        ]
+    ])
 
-    sessions_to_keep = pd.read_csv(os.path.join(data_dir, "official/summaries/sample-rooms.csv"), keep_default_na=True)
-    filtered_sessions = sessions_to_keep.merge(sessions, how="left", left_on=["Room name", "Judge"], right_on=["Room name", "Participant"])
-    filtered_turns = sessions_to_keep.merge(
-        turns, how="inner", left_on=["Room name"], right_on=["Room name"]
-    )
-    filtered_turns = filtered_turns[filtered_turns['Role'] == 'Judge']
+class TimeWindow(NamedTuple):
+    """Debates created after `since` and before `until`, as ISO timestamps; None is unbounded.
+
+    `since` is exclusive, like the paper's filter of debates created after 2023-02-10.
+    """
+    since: Optional[str] = None
+    until: Optional[str] = None
+
+def time_window(since=None, until=None) -> TimeWindow:
+    """The window between bounds in any format `pd.Timestamp` accepts; raises ValueError for invalid ones."""
+    return TimeWindow(*[None if bound is None else pd.Timestamp(bound).isoformat() for bound in (since, until)])
+
+def named_time_window(name: str) -> TimeWindow:
+    return time_window(*time_windows[name])
+
+class DataSnapshot(NamedTuple):
+    """All of the analytics tables from one (re)load of the data. The tables must not be modified."""
+    # bumped on every (re)load so that specs rendered from older data are no longer served
+    version: int
+    debates: pd.DataFrame
+    sessions: pd.DataFrame
+    turns: pd.DataFrame
+    leaderboard: pd.DataFrame
+    sessions_with_debates: pd.DataFrame
+    turns_with_debates: pd.DataFrame
+    filtered_sessions: pd.DataFrame
+    filtered_turns: pd.DataFrame
+    filtered_sessions_with_debates: pd.DataFrame
+    filtered_turns_with_debates: pd.DataFrame
+    # judgments counted per confidence bin, of all sessions/turns and again of the paper's sample
+    session_calibration: pd.DataFrame
+    turn_calibration: pd.DataFrame
+    room_fingerprints: pd.DataFrame
+    # (table, column) -> participant -> positions of their rows; see `index_participants`
+    participant_index: Dict[Tuple[str, str], Dict[str, np.ndarray]]
+    # table -> creation time of each row's debate, for the tables with rooms, which are sorted by it
+    time_index: Dict[str, np.ndarray]
+    # the debates the tables are restricted to; see `window_view`
+    window: TimeWindow
+    # sums and counts of each participant's rewards in the leaderboard
+    standings: standings.Standings
+    # signatures of the summaries the tables were loaded from; see `summary_sources`
+    sources: Dict[str, Dict[str, int]]
+
+# Fields of `DataSnapshot` other than its tables.
+snapshot_metadata_fields = ("version", "participant_index", "time_index", "window", "standings", "sources")
+
+def calibration_tables(sessions, turns, filtered_sessions, filtered_turns) -> Dict[str, pd.DataFrame]:
+    """The judgments of all sessions and turns, and again of the paper's sample, counted per confidence bin."""
+    return {
+        name: calibration.sorted_counts(pd.concat([
+            calibration.calibration_counts(frame, prob_correct_field, keys).assign(**{"Paper sample": for_paper})
+            for frame, for_paper in [(all_frame, False), (paper_frame, True)]
+        ], ignore_index=True))
+        for name, all_frame, paper_frame, prob_correct_field, keys in [
+            ("session_calibration", sessions, filtered_sessions, "Final probability correct", calibration.key_columns),
+            ("turn_calibration", turns, filtered_turns, "Probability correct", calibration.turn_key_columns),
+        ]
+    }
+
+# The creation time given to rows of debates without one (or missing from the debates), which sorts them first
+# and keeps them out of every window with a bound, like comparisons with NaT do.
+undated = np.iinfo(np.int64).min
+
+def creation_times(tables: Dict[str, pd.DataFrame]) -> Dict[str, np.ndarray]:
+    """For each of `tables` with rooms, the creation time of each row's debate in nanoseconds (or `undated`)."""
+    debates = tables["debates"]
+    room_times = debates["Creation time"].values.astype("datetime64[ns]").astype(np.int64)
+    room_times = np.append(np.where(debates["Creation time"].isna().values, undated, room_times), undated)
+    rooms = pd.Index(np.asarray(debates["Room name"], dtype=object))
+    times = {}
+    for name, frame in tables.items():
+        if "Room name" in frame.columns:
+            # rooms that aren't found get -1, i.e., the time appended at the end
+            times[name] = room_times[rooms.get_indexer(np.asarray(frame["Room name"], dtype=object))]
+    return times
+
+def sort_by_creation_time(tables: Dict[str, pd.DataFrame]) -> Tuple[Dict[str, pd.DataFrame], Dict[str, np.ndarray]]:
+    """`tables` with the rows of those with rooms sorted by their debate's creation time (then room), and those times."""
+    times = creation_times(tables)
+    sorted_tables = dict(tables)
+    for name in times:
+        frame = tables[name]
+        rooms = pd.factorize(np.asarray(frame["Room name"], dtype=object), sort=True)[0]
+        order = np.lexsort((rooms, times[name]))
+        if np.any(order[1:] < order[:-1]):
+            sorted_tables[name] = frame.iloc[order].reset_index(drop=True)
+            times[name] = times[name][order]
+    return sorted_tables, times
+
+# Columns by which personalized graphs find a participant's rows in each table, one per role they can have in those rows.
+participant_columns = {
+    "sessions_with_debates": ["Participant", "Honest debater", "Dishonest debater"],
+    "turns_with_debates": ["Participant"],
+    "filtered_sessions_with_debates": ["Participant"],
+    "filtered_turns_with_debates": ["Participant"],
+    "session_calibration": ["Participant"],
+    "turn_calibration": ["Participant"],
+}
+
+def index_participants(tables: Dict[str, pd.DataFrame]) -> Dict[Tuple[str, str], Dict[str, np.ndarray]]:
+    """The row positions of each participant in each of the `participant_columns` of `tables`.
+
+    Built once per (re)load, so personalized graphs select a user's rows in time proportional to their
+    history instead of scanning whole tables.
+    """
+    index = {}
+    for table, columns in participant_columns.items():
+        frame = tables[table]
+        for column in columns:
+            # positions rather than labels, since the tables' indices needn't be unique
+            index[(table, column)] = pd.Series(np.arange(len(frame))).groupby(
+                frame[column].values, sort=False, observed=True
+            ).indices
+    return index
+
+def participant_rows(table: str, participant: str, column: str = "Participant") -> np.ndarray:
+    """Positions of the rows of `table` in the current snapshot that have `participant` in `column`."""
+    return current_data().participant_index[(table, column)].get(participant, np.array([], dtype=np.int64))
+
+# The latest snapshot. `read_data` builds a new one off to the side and then replaces this in one assignment,
+# so readers don't need a lock; renders pin the snapshot they started with (see `pinned_data`).
+snapshot: Optional[DataSnapshot] = None
+# Only one (re)load runs at a time, so each builds on the previous snapshot.
+read_data_lock = threading.Lock()
+_pinned = threading.local()
+
+def current_data() -> DataSnapshot:
+    """The snapshot pinned for the current thread, or else the default window of the latest one."""
+    pinned = getattr(_pinned, "data", None)
+    return pinned if pinned is not None else window_view(snapshot)
+
+_window_views: "OrderedDict[Tuple[int, TimeWindow], DataSnapshot]" = OrderedDict()
+_window_views_lock = threading.Lock()
+
+def window_view(data: DataSnapshot, window: Optional[TimeWindow] = None) -> DataSnapshot:
+    """`data` restricted to the debates created in `window` (by default, the default window).
+
+    The tables with rooms are sorted by creation time, so each is sliced where binary search finds the
+    window's bounds; the tables aggregated across rooms and the participant index are recomputed from
+    the slices, as are the leaderboard standings. Views are cached per data version and window.
+    """
+    if window is None:
+        window = named_time_window(default_time_window)
+    if window == data.window:
+        return data
+    key = (data.version, window)
+    with _window_views_lock:
+        if key in _window_views:
+            _window_views.move_to_end(key)
+            return _window_views[key]
+
+    tables = {}
+    time_index = {}
+    bounds = {}
+    for name, times in data.time_index.items():
+        if window.since is not None:
+            start = np.searchsorted(times, pd.Timestamp(window.since).value, side="right")
+        else:
+            start = 0 if window.until is None else np.searchsorted(times, undated, side="right")
+        end = len(times) if window.until is None else np.searchsorted(times, pd.Timestamp(window.until).value, side="left")
+        tables[name] = getattr(data, name).iloc[start:end]
+        time_index[name] = times[start:end]
+        bounds[name] = (start, end)
+    tables.update(calibration_tables(tables["sessions"], tables["turns"], tables["filtered_sessions"], tables["filtered_turns"]))
+    view = data._replace(
+        participant_index=index_participants({**data._asdict(), **tables}),
+        time_index=time_index,
+        window=window,
+        standings=window_standings(data, *bounds["leaderboard"]),
+        **tables
+    )
+    with _window_views_lock:
+        _window_views[key] = view
+        while len(_window_views) > time_window_cache_size:
+            _window_views.popitem(last=False)
+    return view
+
+_sample_views: "OrderedDict[Tuple[int, TimeWindow, str], SampleView]" = OrderedDict()
+
+def sample_view(name: str, data: Optional[DataSnapshot] = None) -> SampleView:
+    """The sessions and turns of the `sample_summaries` sample `name` in `data` (by default, the current data).
+
+    The paper's sample is materialized at load; others are materialized the first time they're used
+    for each data version and time window.
+    """
+    data = current_data() if data is None else data
+    if name == "paper":
+        return SampleView(
+            data.filtered_sessions, data.filtered_turns, data.filtered_sessions_with_debates, data.filtered_turns_with_debates
+        )
+    key = (data.version, data.window, name)
+    with _window_views_lock:
+        if key in _sample_views:
+            _sample_views.move_to_end(key)
+            return _sample_views[key]
+    view = materialize_sample(
+        read_summary(data_dir, sample_summaries[name]),
+        data.debates, data.sessions, data.turns, data.sessions_with_debates, data.turns_with_debates
+    )
+    with _window_views_lock:
+        _sample_views[key] = view
+        while len(_sample_views) > time_window_cache_size * max(len(sample_summaries) - 1, 1):
+            _sample_views.popitem(last=False)
+    return view
+
+def window_standings(data: DataSnapshot, start: int, end: int) -> standings.Standings:
+    """The standings of the rows of `data`'s leaderboard from `start` until `end`.
+
+    They're derived from `data`'s (running) standings by taking out the rows outside that range,
+    unless there are fewer rows inside it to add up from scratch.
+    """
+    leaderboard = data.leaderboard
+    if end - start < len(leaderboard) - (end - start):
+        return standings.Standings.from_leaderboard(leaderboard.iloc[start:end])
+    outside = pd.concat([leaderboard.iloc[:start], leaderboard.iloc[end:]])
+    return data.standings.updated(removed=outside, added=leaderboard.iloc[:0])
+
+def clear_window_views():
+    with _window_views_lock:
+        _window_views.clear()
+        _sample_views.clear()
+
+@contextlib.contextmanager
+def pinned_data(data: DataSnapshot):
+    """Make charts rendered in this thread use `data`, even if a new snapshot is published meanwhile."""
+    previous = getattr(_pinned, "data", None)
+    _pinned.data = data
+    try:
+        yield data
+    finally:
+        _pinned.data = previous
+
+# With `incremental`, derived tables are only recomputed for rooms that changed since the last load,
+# and if none did, the previous snapshot is kept. Returns whether a new snapshot was published, which
+# gets `version` (by default, the one after the previous snapshot's).
+def read_data(incremental: bool = False, version: Optional[int] = None) -> bool:
+    global snapshot
+    with read_data_lock:
+        previous = snapshot
+        if version is None:
+            version = 1 if previous is None else previous.version + 1
+        incremental = incremental and previous is not None
+        metrics.start_load("incremental" if incremental else "full")
+        sources = summary_sources()
+        if incremental and sources == previous.sources:
+            print("No summaries changed")
+            return False
+        with metrics.load_stage("read debates"):
+            debates = read_summary(data_dir, "debates", time_columns=["Creation time", "End time"])
+            debates["Final probability incorrect"] = 1 - debates["Final probability correct"]
+        with metrics.load_stage("read sessions"):
+            sessions = read_summary(data_dir, "sessions")
+            # filter sessions to only the included debates
+            sessions = sessions.merge(debates[["Room name"]], how="inner", on="Room name")
+
+        with metrics.load_stage("read turns"):
+            turns = read_summary(data_dir, "turns", columns=turn_columns)
+            # filter turns to only the included debates
+            turns = turns.merge(debates[["Room name"]], how="inner", on="Room name")
+
+        with metrics.load_stage("room fingerprints"):
+            room_fingerprints = summaries.room_fingerprints(debates, sessions)
+        sample_file = sample_summaries["paper"]
+        sample_changed = not incremental or sources[sample_file] != previous.sources.get(sample_file)
+        if incremental:
+            rooms = summaries.changed_rooms(previous.room_fingerprints, room_fingerprints)
+            if len(rooms) == 0 and not sample_changed:
+                # the summaries were rewritten without changes
+                print("No rooms changed")
+                snapshot = previous._replace(sources=sources)
+                return False
+            print(f"Refreshing {len(rooms)} changed rooms")
+
+            def previous_rows(frame):
+                return frame[frame["Room name"].isin(rooms)]
+
+            def conform(frame, like):
+                return compact.conform(frame, like) if compact_tables else frame
+
+            previous_tables = (
+                previous.debates, previous.sessions, previous.turns, previous.leaderboard,
+                previous.sessions_with_debates, previous.turns_with_debates
+            )
+            updated_tables = derive_tables(*[previous_rows(frame) for frame in (debates, sessions, turns)])
+            with metrics.load_stage("standings"):
+                leaderboard_standings = previous.standings.updated(
+                    removed=previous_rows(previous.leaderboard), added=updated_tables[3]
+                )
+            with metrics.load_stage("replace rooms"):
+                debates, sessions, turns, leaderboard, sessions_with_debates, turns_with_debates = [
+                    summaries.replace_rooms(previous_table, conform(updated, previous_table), rooms)
+                    for previous_table, updated in zip(previous_tables, updated_tables)
+                ]
+        else:
+            (
+                debates, sessions, turns, leaderboard, sessions_with_debates, turns_with_debates
+            ) = derive_tables(debates, sessions, turns)
+            with metrics.load_stage("standings"):
+                leaderboard_standings = standings.Standings.from_leaderboard(leaderboard)
+
+        with metrics.load_stage("paper sample"):
+            sample = read_summary(data_dir, sample_file)
+            if sample_changed:
+                filtered_tables = materialize_sample(
+                    sample, debates, sessions, turns, sessions_with_debates, turns_with_debates
+                )
+            else:
+                # only the changed rooms' sampled sessions and turns are materialized
+                previous_filtered = sample_view("paper", previous)
+                filtered_tables = SampleView(*[
+                    summaries.replace_rooms(previous_table, conform(updated, previous_table), rooms)
+                    for previous_table, updated in zip(
+                        previous_filtered,
+                        materialize_sample(
+                            sample[sample["Room name"].isin(rooms)], *updated_tables[:3], *updated_tables[4:]
+                        )
+                    )
+                ])
+            filtered_sessions, filtered_turns, filtered_sessions_with_debates, filtered_turns_with_debates = filtered_tables
+        with metrics.load_stage("calibration"):
+            if sample_changed:
+                calibration_counts = calibration_tables(sessions, turns, filtered_sessions, filtered_turns)
+            else:
+                # the counts of the changed rooms' old rows are taken out and those of their new rows put in
+                removed = calibration_tables(*[
+                    previous_rows(frame) for frame in (
+                        previous.sessions, previous.turns, previous_filtered.sessions, previous_filtered.turns
+                    )
+                ])
+                added = calibration_tables(
+                    updated_tables[1], updated_tables[2],
+                    *[previous_rows(frame) for frame in (filtered_sessions, filtered_turns)]
+                )
+                calibration_counts = {
+                    name: conform(
+                        calibration.update_counts(getattr(previous, name), removed[name], added[name]),
+                        getattr(previous, name)
+                    )
+                    for name in removed
+                }
+        tables = dict(
+            debates=debates,
+            sessions=sessions,
+            turns=turns,
+            leaderboard=leaderboard,
+            sessions_with_debates=sessions_with_debates,
+            turns_with_debates=turns_with_debates,
+            filtered_sessions=filtered_sessions,
+            filtered_turns=filtered_turns,
+            filtered_sessions_with_debates=filtered_sessions_with_debates,
+            filtered_turns_with_debates=filtered_turns_with_debates,
+            **calibration_counts,
+        )
+        with metrics.load_stage("time index"):
+            tables, time_index = sort_by_creation_time(tables)
+        if compact_tables:
+            with metrics.load_stage("compact"):
+                if incremental:
+                    # the changed rows were already converted to the previous tables' types
+                    compacted = compact.unify_dictionaries(tables)
+                else:
+                    compacted = compact.compact_tables(tables)
+            if not incremental:
+                print("Memory use:")
+                print(compact.memory_report(tables, compacted))
+            tables = compacted
+        with metrics.load_stage("participant index"):
+            participant_index = index_participants(tables)
+        snapshot = DataSnapshot(
+            version=version, room_fingerprints=room_fingerprints, participant_index=participant_index,
+            time_index=time_index, window=TimeWindow(), standings=leaderboard_standings, sources=sources, **tables
+        )
+        aggregate.clear_bootstrap_cache()
+        clear_window_views()
+        if dataset_dir is not None:
+            use_dataset_directory(os.path.join(dataset_dir, f"v{version}"))
+
+    if not incremental:
+        with metrics.load_stage("describe"):
+            describe_tables(debates, sessions, turns, leaderboard, filtered_sessions, filtered_turns)
+    return True
 
+def describe_tables(debates, sessions, turns, leaderboard, filtered_sessions, filtered_turns):
     print("Debates:")
     print(debates.dtypes)
     print(debates.describe())
@@ -120,30 +624,147 @@ def read_data():
     print(leaderboard.dtypes)
     print(leaderboard.describe())
 
-read_data()
+# The generation of the shared tables this process has mapped, and the pointer stamp it was found under.
+shared_generation: Optional[str] = None
+shared_stamp = None
+shared_sync_lock = threading.Lock()
+
+# Identifies the source summaries, so we can tell whether shared tables are up to date.
+def summary_sources():
+    return {
+        name: summaries.source_signature(os.path.join(summaries.summaries_dir(data_dir), f"{name}.csv"))
+        for name in ["debates", "sessions", "turns", *sorted(set(sample_summaries.values()))]
+    }
+
+def map_shared_data(meta):
+    global snapshot, shared_generation, server_instance
+    tables = shared_data.load(shared_data_dir, meta)
+    leaderboard_standings = standings.Standings.from_table(tables.pop("standings"))
+    with read_data_lock:
+        snapshot = DataSnapshot(
+            version=meta["version"], participant_index=index_participants(tables), time_index=creation_times(tables),
+            window=TimeWindow(), standings=leaderboard_standings, sources=meta["sources"], **tables
+        )
+        clear_window_views()
+        shared_generation = meta["generation"]
+        server_instance = meta["instance"]
+        use_dataset_directory(os.path.join(shared_data_dir, shared_generation, "datasets"))
+
+def publish_shared_data():
+    global shared_generation, server_instance
+    data = snapshot
+    tables = {name: getattr(data, name) for name in DataSnapshot._fields if name not in snapshot_metadata_fields}
+    # the running standings are shared as they are, rather than recomputed by each process
+    tables["standings"] = data.standings.table()
+    meta = shared_data.publish(shared_data_dir, data.version, tables, data.sources)
+    shared_generation = meta["generation"]
+    server_instance = meta["instance"]
+    use_dataset_directory(os.path.join(shared_data_dir, shared_generation, "datasets"))
+
+def use_dataset_directory(path: str):
+    """Write the datasets of charts rendered from now on to `path`, for this data version."""
+    if datasets.base_url is None:
+        return
+    dropped = datasets.use_directory(path)
+    # shared generations' directories are removed along with them
+    if dropped is not None and shared_data_dir is None:
+        shutil.rmtree(dropped, ignore_errors=True)
+
+def sync_shared_data(wait: bool = False) -> bool:
+    """Map the latest shared tables if another process published them; returns whether it did.
+
+    Unless `wait`, this returns right away if another thread is already mapping them.
+    """
+    global shared_stamp
+    stamp = shared_data.pointer_stamp(shared_data_dir)
+    if stamp == shared_stamp or not shared_sync_lock.acquire(blocking=wait):
+        return False
+    try:
+        meta = shared_data.current(shared_data_dir)
+        mapped = meta is not None and meta["generation"] != shared_generation
+        if mapped:
+            map_shared_data(meta)
+        shared_stamp = stamp
+        return mapped
+    finally:
+        shared_sync_lock.release()
+
+def load_data():
+    """Load the data at startup, or map the shared tables if they're up to date."""
+    if shared_data_dir is None:
+        read_data()
+        return
+    with shared_data.exclusive(shared_data_dir):
+        meta = shared_data.current(shared_data_dir)
+        if meta is not None and meta["sources"] == summary_sources():
+            try:
+                map_shared_data(meta)
+                print(f"Mapped shared data version {meta['version']}")
+                return
+            except Exception as e:
+                print(f"Could not map shared data, reloading it: {e}")
+        read_data(version=None if meta is None else meta["version"] + 1)
+        publish_shared_data()
+
+def reload_data(incremental: bool):
+    if shared_data_dir is None:
+        read_data(incremental=incremental)
+        return
+    with shared_data.exclusive(shared_data_dir):
+        # build on the latest tables, which may have been refreshed by another process
+        sync_shared_data(wait=True)
+        if read_data(incremental=incremental):
+            publish_shared_data()
+
+load_data()
+
+def with_turn_text(frame: pd.DataFrame, columns: Sequence[str] = turn_text_columns) -> pd.DataFrame:
+    """`frame` (of turns) with the given free-text columns, which are read from the summaries on demand.
+
+    Turns missing from the summaries (e.g., if they were rewritten since the last refresh) get no text.
+    """
+    text = read_summary(data_dir, "turns", columns=turn_key_columns + list(columns))
+    text = text.drop_duplicates(subset=turn_key_columns).set_index(turn_key_columns)
+    keys = pd.MultiIndex.from_arrays([np.asarray(frame[c], dtype=text.index.levels[i].dtype) for i, c in enumerate(turn_key_columns)])
+    matched = text.reindex(keys)
+    return frame.assign(**{c: matched[c].values for c in columns})
+
+def with_debate_attributes(
+    columns: Optional[Sequence[str]] = None,
+    keep: Sequence[str] = (),
+    by_turn: bool = False,
+    for_paper: bool = False,
+    participant: Optional[str] = None,
+    participant_column: str = "Participant",
+    sample: Optional[str] = None
+):
+    """Sessions (or turns) with the given attributes of their debates, or all of them if `columns` is None.
+
+    This projects the tables pre-joined in `read_data` instead of merging with `debates` again.
+    Derived columns not in `keep` are dropped. With `participant`, only the rows with them in
+    `participant_column` are kept, which are looked up in the snapshot's participant index.
+    `for_paper` restricts them to the paper's sample, and `sample` to another one of `sample_summaries`.
+    """
+    data = current_data()
+    if sample is not None and sample != "paper":
+        view = sample_view(sample, data)
+        frame, joined = (view.turns, view.turns_with_debates) if by_turn else (view.sessions, view.sessions_with_debates)
+        if participant is not None:
+            joined = joined[(joined[participant_column] == participant).values]
+    else:
+        table = ("filtered_" if for_paper or sample == "paper" else "") + ("turns" if by_turn else "sessions")
+        frame, joined = getattr(data, table), getattr(data, table + "_with_debates")
+        if participant is not None:
+            joined = joined.iloc[participant_rows(table + "_with_debates", participant, participant_column)]
+    if columns is None:
+        columns = list(joined.columns)
+    else:
+        columns = list(frame.columns) + [c for c in columns if c not in frame.columns]
+    return derived.without_derived_columns(joined[columns], keep=keep)
 
+# expects the derived outcome columns of sessions
 def outcomes_by_field(source, rowEncoding = None):
 
-    source['outcome'] = source.apply(
-        lambda row: "incomplete" if math.isnan(row['Final probability correct'])
-        else "tie" if row['Final probability correct'] == 0.5
-        else "correct" if row['Final probability correct'] > 0.5
-        else "incorrect",
-        axis=1
-    )
-
-    source['Final probability correct (with imputation)'] = source.apply(
-        lambda row: 0.5 if math.isnan(row['Final probability correct'])
-        else row['Final probability correct'],
-        axis=1
-    )
-
-    source['Final probability correct (dist from half)'] = source.apply(
-        lambda row: 0.0 if math.isnan(row['Final probability correct'])
-        else abs(row['Final probability correct'] - 0.5),
-        axis=1
-    )
-
     if rowEncoding is None:
         groups = ['outcome']
     else:
@@ -182,7 +803,9 @@ def outcomes_by_field(source, rowEncoding = None):
 
     return main_bar
 
-def accuracy_by_field(source, by_turn: bool = False, yEncoding = None, invert = False):
+# `facet_fields` are the fields the chart is going to be faceted by, which aggregated charts need to group by.
+# With `precomputed`, `source` is already an `aggregate.accuracy_table` (or `calibration.calibration_segments`).
+def accuracy_by_field(source, by_turn: bool = False, yEncoding = None, invert = False, facet_fields: Sequence[str] = (), precomputed: bool = False):
 
     if by_turn:
         prob_correct_field = 'Probability correct'
@@ -199,16 +822,38 @@ def accuracy_by_field(source, by_turn: bool = False, yEncoding = None, invert =
     else:
         groups = [yEncoding.field]
 
-    base = alt.Chart(source).transform_joinaggregate(
-        total = "count()",
-        groupby = groups
-    ).transform_calculate(
-        proportion = '1 / datum.total'
-    ).transform_calculate(
-        is_correct = f'datum["{prob_correct_field}"] > 0.5 ? 1 : datum["{prob_correct_field}"] == 0.5 ? 0.5 : 0',
-        is_win = f'datum["{prob_assigned_field}"] > 0.5 ? 1 : datum["{prob_assigned_field}"] == 0.5 ? 0.5 : 0',
-        is_not_correct = f'datum["{prob_correct_field}"] <= 0.5 ? 1 : datum["{prob_correct_field}"] == 0.5 ? 0.5 : 0'
-    )
+    if precomputed:
+        base = alt.Chart(source)
+    elif aggregate_charts:
+        sort = None if yEncoding is None else yEncoding.sort
+        base = alt.Chart(aggregate.accuracy_table(
+            source,
+            groups + list(facet_fields),
+            prob_correct_field,
+            prob_assigned_field,
+            invert = invert,
+            sort_fields = [sort.field] if isinstance(sort, alt.EncodingSortField) else []
+        ))
+    if precomputed or aggregate_charts:
+        mean_field = 'mean'
+        count_tooltip = alt.Tooltip('sum(count):Q', title='count')
+        ci_fields = ('min(ci0):Q', 'max(ci1):Q')
+        row_tooltips = []
+    else:
+        base = alt.Chart(source).transform_joinaggregate(
+            total = "count()",
+            groupby = groups
+        ).transform_calculate(
+            proportion = '1 / datum.total'
+        ).transform_calculate(
+            is_correct = f'datum["{prob_correct_field}"] > 0.5 ? 1 : datum["{prob_correct_field}"] == 0.5 ? 0.5 : 0',
+            is_win = f'datum["{prob_assigned_field}"] > 0.5 ? 1 : datum["{prob_assigned_field}"] == 0.5 ? 0.5 : 0',
+            is_not_correct = f'datum["{prob_correct_field}"] <= 0.5 ? 1 : datum["{prob_correct_field}"] == 0.5 ? 0.5 : 0'
+        )
+        mean_field = 'is_win' if not invert else 'is_not_correct'
+        count_tooltip = 'count():Q'
+        ci_fields = (f'ci0({mean_field}):Q', f'ci1({mean_field}):Q')
+        row_tooltips = ['Room name:N', 'Participant:N']
 
     if yEncoding is not None:
         base = base.encode(y=yEncoding)
@@ -232,28 +877,25 @@ def accuracy_by_field(source, by_turn: bool = False, yEncoding = None, invert =
             sort='descending' if not invert else 'ascending'
         ),
         tooltip = [
-            'count():Q',
+            count_tooltip,
             'total:Q',
             'sum(proportion):Q',
             f'{prob_correct_field}:Q',
-            'Room name:N',
-            'Participant:N'
-        ]
+        ] + row_tooltips
     ).properties(width=fullWidth - 200)
 
     prop_color = aggColor
     # rule_thickness = 1.0
     # err_thickness = 1.0
     point_size = 25.0
-    mean_field = 'is_win' if not invert else 'is_not_correct'
 
     gold_err = (base
     ).mark_rule(
         # extent='ci',
         color=prop_color,
     ).encode(
-        x=f'ci0({mean_field}):Q',
-        x2=f'ci1({mean_field}):Q',
+        x=ci_fields[0],
+        x2=ci_fields[1],
         # scale=alt.Scale(zero=False)
         tooltip=[]
     )
@@ -305,32 +947,52 @@ def prob_correct_by_field(source, by_turn: bool = False, yEncoding = None, inver
     point_size = 25.0
 
 
-    mean_base = alt.Chart(source).encode(
-        # x=alt.X(f'mean({prob_assigned_field}):Q'), 
-        color=yEncoding,
-        y=yEncoding
-    )
-
     if transform == 'log':
-        mean_base = mean_base.transform_calculate(
-            log_prob = alt.expr.log(datum[prob_assigned_field])
-        )
         mean_field = 'log_prob'
         mean_field_name = 'Log probability'
     elif transform == 'reward':
-        mean_base = mean_base.transform_calculate(
-            reward = f'log(datum["{prob_assigned_field}"]) - (0.02 * datum["Number of judge continues"])'
-        )
         mean_field = 'reward'
         mean_field_name = 'Reward'
     else:
         mean_field = prob_assigned_field
         mean_field_name = 'Probability correct'
 
-    density = alt.Chart(source).transform_density(
-        mean_field, as_=[mean_field, 'density'], groupby=[yEncoding.field],
-        # extent = [-7.0, 0.0],
-    ).mark_area(opacity = 0.5).encode(
+    if aggregate_charts:
+        if transform == 'log':
+            source = source.assign(log_prob = np.log(source[prob_assigned_field]))
+        elif transform == 'reward':
+            source = source.assign(
+                reward = np.log(source[prob_assigned_field]) - (0.02 * source["Number of judge continues"])
+            )
+        mean_base = alt.Chart(aggregate.mean_with_ci(source, mean_field, groups)).encode(
+            color=yEncoding,
+            y=yEncoding
+        )
+        mean_x = 'mean'
+        ci_fields = ('ci0:Q', 'ci1:Q')
+        density_base = alt.Chart(aggregate.grouped_density(source, mean_field, groups))
+    else:
+        mean_base = alt.Chart(source).encode(
+            # x=alt.X(f'mean({prob_assigned_field}):Q'), 
+            color=yEncoding,
+            y=yEncoding
+        )
+        if transform == 'log':
+            mean_base = mean_base.transform_calculate(
+                log_prob = alt.expr.log(datum[prob_assigned_field])
+            )
+        elif transform == 'reward':
+            mean_base = mean_base.transform_calculate(
+                reward = f'log(datum["{prob_assigned_field}"]) - (0.02 * datum["Number of judge continues"])'
+            )
+        mean_x = f'mean({mean_field})'
+        ci_fields = (f'ci0({mean_field}):Q', f'ci1({mean_field}):Q')
+        density_base = alt.Chart(source).transform_density(
+            mean_field, as_=[mean_field, 'density'], groupby=[yEncoding.field],
+            # extent = [-7.0, 0.0],
+        )
+
+    density = density_base.mark_area(opacity = 0.5).encode(
         x=alt.X(f"{mean_field}:Q"),
         # x=alt.X(f"{mean_field}:Q", scale=alt.Scale(domain = [-7.0, 0.0])),
         y=alt.Y('density:Q'),
@@ -341,15 +1003,15 @@ def prob_correct_by_field(source, by_turn: bool = False, yEncoding = None, inver
         # thickness=2.0
         color=prop_color, size=point_size, filled=True
     ).encode(
-        x=alt.X(f'mean({mean_field}):Q', scale=alt.Scale(zero=False), axis=alt.Axis(title=mean_field_name)),
+        x=alt.X(f'{mean_x}:Q', scale=alt.Scale(zero=False), axis=alt.Axis(title=mean_field_name)),
     )
 
     mean_err = mean_base.mark_rule(
         # extent='ci',
         color=prop_color,
     ).encode(
-        x=f'ci0({mean_field}):Q',
-        x2=f'ci1({mean_field}):Q',
+        x=ci_fields[0],
+        x2=ci_fields[1],
         # scale=alt.Scale(zero=False)
         tooltip=[]
     )
@@ -362,43 +1024,33 @@ def prob_correct_by_field(source, by_turn: bool = False, yEncoding = None, inver
         dx=4,
         dy=-4
     ).encode(
-        text=alt.Text(f'mean({mean_field}):Q', format='.0%'),
-        x=alt.X(f'mean({mean_field}):Q',
+        text=alt.Text(f'{mean_x}:Q', format='.0%'),
+        x=alt.X(f'{mean_x}:Q',
             scale=alt.Scale(zero=False)),
     )
 
     return alt.vconcat(density, mean + mean_err + mean_num)
 
 def accuracy_by_judge_setting():
-    source = sessions.merge(
-        debates[
-            [
-                "Room name",
-                "Is offline",
-                "Is single debater",
-                "Has honest debater",
-                # "Has dishonest debater",
-            ]
+    source = with_debate_attributes(
+        [
+            "Is offline",
+            "Is single debater",
+            "Has honest debater",
+            # "Has dishonest debater",
         ],
-        how="left",
-        on="Room name",
+        keep=[
+            'Judge setting',
+            'outcome',
+            'Final probability correct (with imputation)',
+            'Final probability correct (dist from half)'
+        ]
     )
 
     source = source[source['Role'].isin(['Judge', 'Offline Judge'])]
-    def get_setting(row):
-        if row['Is offline']:
-            return row['Role'] + ' (no live judge)'
-        elif row['Is single debater']:
-            if row['Has honest debater']:
-                return row['Role'] + ' (single honest debater)'
-            else:
-                return row['Role'] + ' (single dishonest debater)'
-        else:
-            return row['Role']
-    source['roleWithOffline'] = source.apply(get_setting, axis=1)
 
-    rowEncoding = alt.Row(field ='roleWithOffline', type='N', title='Role')
-    yEncoding = alt.Y(field ='roleWithOffline', type='N', title='Role')
+    rowEncoding = alt.Row(field ='Judge setting', type='N', title='Role')
+    yEncoding = alt.Y(field ='Judge setting', type='N', title='Role')
 
     outcomes_source = source
     accuracy_source = source[source['Final probability correct'].notna()]
@@ -422,99 +1074,57 @@ def accuracy_by_judge_setting():
 
 
 def accuracy_by_session_setting(for_paper: bool = False):
-    base_source = filtered_sessions if for_paper else sessions
-    source = base_source.merge(
-        debates[
-            [
-                "Room name",
-                "Is offline",
-                "Is single debater",
-                "Honest debater",
-                "Dishonest debater",
-                "Untimed annotator context (rounded)",
-                "Number of debate rounds"
-            ]
+    source = with_debate_attributes(
+        [
+            "Is offline",
+            "Is single debater",
+            "Honest debater",
+            "Dishonest debater",
+            "Untimed annotator context (rounded)",
+            "Number of debate rounds"
         ],
-        how="left",
-        on="Room name",
+        keep=['Setting'],
+        for_paper=for_paper
     )
 
     source = source[source['Role'].isin(['Judge', 'Offline Judge'])]
-    def get_setting(row):
-        ai_or_human = "Human"
-        consultancy_or_debate = "Debate"
-        if row['Honest debater'] == 'GPT-4' or row['Dishonest debater'] == 'GPT-4':
-            ai_or_human = "AI"
-        if row['Is single debater']:
-            consultancy_or_debate = "Consultancy"
-
-        return " ".join([ai_or_human, consultancy_or_debate])
-    source['Setting'] = source.apply(get_setting, axis=1)
     yEncoding = alt.Y(field ='Setting', type='nominal', title='Setting')
     accuracy_source = source[source['Final probability correct'].notna()]
 
     return accuracy_by_field(
         accuracy_source,
-        yEncoding = yEncoding
+        yEncoding = yEncoding,
+        facet_fields = ["Untimed annotator context (rounded)"]
     ).properties(title="Judge Accuracy").facet(
         row = "Untimed annotator context (rounded):N",
     )
 
 def accuracy_by_consultancy_split(for_paper: bool = False, with_context_requirement=False):
-    base_source = filtered_sessions if for_paper else sessions
-    source = base_source.merge(
-        debates[
-            [
-                "Room name",
-                "Is offline",
-                "Is single debater",
-                "Honest debater",
-                "Dishonest debater",
-                "Untimed annotator context (rounded)",
-                "Number of debate rounds"
-            ]
+    source = with_debate_attributes(
+        [
+            "Is offline",
+            "Is single debater",
+            "Honest debater",
+            "Dishonest debater",
+            "Untimed annotator context (rounded)",
+            "Number of debate rounds"
         ],
-        how="left",
-        on="Room name",
+        keep=[
+            'Consultancy setting',
+            'Number of debate rounds (binned)'
+        ],
+        for_paper=for_paper
     )
 
     source = source[source['Role'].isin(['Judge', 'Offline Judge'])]
     source = source[source['Is single debater']]
-    def get_setting(row):
-        ai_or_human = "Human"
-        # if row['Is single debater']:
-        if row['Honest debater'] == 'GPT-4':
-            return "AI Consultancy (honest)"
-        elif row['Dishonest debater'] == 'GPT-4':
-            return "AI Consultancy (dishonest)"
-        elif str(row['Honest debater']) != 'nan':
-            return "Human Consultancy (honest)"
-        else:
-            return "Human Consultancy (dishonest)"
-        # else:
-        #     if row['Honest debater'] == 'GPT-4' or row['Dishonest debater'] == 'GPT-4':
-        #         return "AI Debate"
-        #     else:
-        #         return "Human Debate"
-
-    def bin_num_rounds(row):
-        num_rounds = row['Number of debate rounds']
-        if num_rounds == 1:
-            return '1'
-        elif num_rounds == 2:
-            return '2'
-        elif num_rounds in [3, 4]:
-            return '3-4'
-        else:
-            return '5+'
-    source['Number of debate rounds (binned)'] = source.apply(bin_num_rounds, axis=1)
-    source['Setting'] = source.apply(get_setting, axis=1)
-    yEncoding = alt.Y(field ='Setting', type='N', title=None)
+    yEncoding = alt.Y(field ='Consultancy setting', type='N', title=None)
     accuracy_source = source[source['Final probability correct'].notna()]
 
     chart = accuracy_by_field(
         accuracy_source,
-        yEncoding = yEncoding
+        yEncoding = yEncoding,
+        facet_fields = ["Untimed annotator context (rounded)"] if with_context_requirement else []
     ).properties(title="Judge Accuracy")
 
     if with_context_requirement:
@@ -588,31 +1198,17 @@ def accuracy_by_consultancy_split(for_paper: bool = False, with_context_requirem
 #     else: return chart
 
 def judge_distribution_by_setting():
-    source = sessions.merge(
-        debates[
-            [
-                "Room name",
-                "Is offline",
-                "Is single debater",
-                "Honest debater",
-                "Dishonest debater",
-            ]
+    source = with_debate_attributes(
+        [
+            "Is offline",
+            "Is single debater",
+            "Honest debater",
+            "Dishonest debater",
         ],
-        how="left",
-        on="Room name",
+        keep=['Setting']
     )
 
     source = source[source['Role'].isin(['Judge', 'Offline Judge'])]
-    def get_setting(row):
-        ai_or_human = "Human"
-        consultancy_or_debate = "Debate"
-        if row['Honest debater'] == 'GPT-4' or row['Dishonest debater'] == 'GPT-4':
-            ai_or_human = "AI"
-        if row['Is single debater']:
-            consultancy_or_debate = "Consultancy"
-
-        return " ".join([ai_or_human, consultancy_or_debate])
-    source['Setting'] = source.apply(get_setting, axis=1)
     settingEncoding = alt.Y(field ='Setting', type='N', title='Setting')
     accuracy_source = source[source['Final probability correct'].notna()]
 
@@ -626,23 +1222,15 @@ def judge_distribution_by_setting():
 
 def win_rates_by_participant():
 
-    source = sessions.merge(
-        debates[
-            [
-                "Room name",
-                "Honest debater",
-                "Dishonest debater",
-            ]
+    source = with_debate_attributes(
+        [
+            "Honest debater",
+            "Dishonest debater",
         ],
-        how="left",
-        on="Room name",
+        keep=['Log final probability correct']
     )
 
     source = source[source['Role'].isin(['Judge', 'Offline Judge'])]
-    source['Log final probability correct'] = source.apply(
-        lambda row: np.log(row['Final probability correct']),
-        axis=1
-    )
 
     judgeY = alt.Y(field ='Participant', type='N', title='Participant',
         sort=alt.EncodingSortField(field='Log final probability correct', op='mean', order='descending')
@@ -675,37 +1263,25 @@ def win_rates_by_participant():
         ).properties(title="Win Rate by Dishonest Debater (sorted by mean log prob)"),
     ).resolve_scale(x = 'independent')
 
-def calibration_plot(bin_size, by_turn: bool = False, participant: Optional[str] = None):
-    def get_confidence(x: float):
-        if x < 0.5:
-            return 1 - x
-        else:  
-            return x
+def calibration_counts(by_turn: bool = False, for_paper: bool = False, participant: Optional[str] = None):
+    """The judgments of all sessions (or turns) counted per confidence bin in `read_data` (see `calibration.py`)."""
+    table = 'turn_calibration' if by_turn else 'session_calibration'
+    counts = getattr(current_data(), table)
+    if participant is not None:
+        counts = counts.iloc[participant_rows(table, participant)]
+    return counts[counts['Paper sample'] == for_paper]
 
+def calibration_plot(bin_size, by_turn: bool = False, participant: Optional[str] = None, facet_fields: Sequence[str] = ()):
     def make_bin(x: float):
-        bot = math.floor(x / bin_size)
-        top = bot + 1
-        return f'{bot * bin_size:.2f} – {top * bin_size:.2f}'
+        return derived.confidence_bin_label(math.floor(x / bin_size), bin_size)
 
     if by_turn:
         prob_correct_field = 'Probability correct'
-        source = turns
     else:
         prob_correct_field = 'Final probability correct'
-        source = sessions
-
-    if participant is not None:
-        source = source[source['Participant'] == participant]
 
-    source = source[source[prob_correct_field].notna()].copy()
-    source['Prediction confidence'] = source.apply(
-        lambda row: get_confidence(row[prob_correct_field]),
-        axis=1
-    )
-
-    source['Confidence bin'] = source.apply(
-        lambda row: make_bin(row['Prediction confidence']),
-        axis=1
+    source = calibration.calibration_segments(
+        calibration_counts(by_turn, participant=participant), bin_size, prob_correct_field, groups=facet_fields
     )
 
     binY = alt.Y(field ='Confidence bin', type='O'
@@ -729,10 +1305,13 @@ def calibration_plot(bin_size, by_turn: bool = False, participant: Optional[str]
     return accuracy_by_field(
         source,
         by_turn = by_turn,
-        yEncoding = binY
+        yEncoding = binY,
+        facet_fields = facet_fields,
+        precomputed = True
     ) + calibration_reference_graph
 
-def simple_accuracy_by_field(source, by_turn: bool = False, xEncoding = None, invert = False, width=fullWidth - 200, height = None, include_text=True, yAxisTitle=None, yDomain=[0.0, 1.0]):
+# With `precomputed`, `source` is a `calibration.calibration_table` of the accuracy per value of `xEncoding`.
+def simple_accuracy_by_field(source, by_turn: bool = False, xEncoding = None, invert = False, width=fullWidth - 200, height = None, include_text=True, yAxisTitle=None, yDomain=[0.0, 1.0], precomputed: bool = False):
 
     if by_turn:
         prob_correct_field = 'Probability correct'
@@ -744,15 +1323,24 @@ def simple_accuracy_by_field(source, by_turn: bool = False, xEncoding = None, in
     else:
         groups = [xEncoding.field]
 
-    base = alt.Chart(source).transform_joinaggregate(
-        total = "count()",
-        groupby = groups
-    ).transform_calculate(
-        proportion = '1 / datum.total'
-    ).transform_calculate(
-        is_correct = f'datum["{prob_correct_field}"] > 0.5 ? 1 : datum["{prob_correct_field}"] == 0.5 ? 0.5 : 0',
-        is_not_correct = f'datum["{prob_correct_field}"] <= 0.5 ? 1 : datum["{prob_correct_field}"] == 0.5 ? 0.5 : 0'
-    )
+    if precomputed:
+        base = alt.Chart(source)
+        mean_field = 'mean'
+        count_tooltip = alt.Tooltip('sum(count):Q', title='count')
+        ci_fields = ('min(ci0):Q', 'max(ci1):Q')
+    else:
+        base = alt.Chart(source).transform_joinaggregate(
+            total = "count()",
+            groupby = groups
+        ).transform_calculate(
+            proportion = '1 / datum.total'
+        ).transform_calculate(
+            is_correct = f'datum["{prob_correct_field}"] > 0.5 ? 1 : datum["{prob_correct_field}"] == 0.5 ? 0.5 : 0',
+            is_not_correct = f'datum["{prob_correct_field}"] <= 0.5 ? 1 : datum["{prob_correct_field}"] == 0.5 ? 0.5 : 0'
+        )
+        mean_field = 'is_correct' if not invert else 'is_not_correct'
+        count_tooltip = 'count():Q'
+        ci_fields = (f'ci0({mean_field}):Q', f'ci1({mean_field}):Q')
 
     if xEncoding is not None:
         base = base.encode(x=xEncoding)
@@ -761,7 +1349,6 @@ def simple_accuracy_by_field(source, by_turn: bool = False, xEncoding = None, in
     # rule_thickness = 1.0
     # err_thickness = 1.0
     point_size = 25.0
-    mean_field = 'is_correct' if not invert else 'is_not_correct'
 
     main_bar = base.mark_line().encode(
         y=alt.Y(f'mean({mean_field}):Q',
@@ -773,7 +1360,7 @@ def simple_accuracy_by_field(source, by_turn: bool = False, xEncoding = None, in
             scale=alt.Scale(domain=yDomain, clamp=True)
         ),
         tooltip = [
-            'count():Q',
+            count_tooltip,
             f'mean({mean_field}):Q'
         ],
     ).properties(width=width)
@@ -785,8 +1372,8 @@ def simple_accuracy_by_field(source, by_turn: bool = False, xEncoding = None, in
         # extent='ci',
         color=prop_color,
     ).encode(
-        y=f'ci0({mean_field}):Q',
-        y2=f'ci1({mean_field}):Q',
+        y=ci_fields[0],
+        y2=ci_fields[1],
         # scale=alt.Scale(zero=False)
         tooltip=[]
     )
@@ -818,37 +1405,17 @@ def simple_accuracy_by_field(source, by_turn: bool = False, xEncoding = None, in
     else:
         return main_bar + gold_err + gold_mean
 
-def simple_calibration_plot(bin_size, by_turn: bool = False, participant: Optional[str] = None):
-    def get_confidence(x: float):
-        if x < 0.5:
-            return 1 - x
-        else:  
-            return x
-
+def simple_calibration_plot(bin_size, by_turn: bool = False, participant: Optional[str] = None, facet_fields: Sequence[str] = ()):
     def make_bin(x: float):
-        bot = math.floor(x / bin_size)
-        top = bot + 1
-        return f'{bot * bin_size:.2f} – {top * bin_size:.2f}'
+        return derived.confidence_bin_label(math.floor(x / bin_size), bin_size)
 
     if by_turn:
-        source = turns
         prob_correct_field = 'Probability correct'
     else:
-        source = sessions
         prob_correct_field = 'Final probability correct'
 
-    if participant is not None:
-        source = source[source["Participant"] == participant]
-
-    source = source[source[prob_correct_field].notna()].copy()
-    source['Prediction confidence'] = source.apply(
-        lambda row: get_confidence(row[prob_correct_field]),
-        axis=1
-    )
-
-    source['Confidence bin'] = source.apply(
-        lambda row: make_bin(row['Prediction confidence']),
-        axis=1
+    source = calibration.calibration_table(
+        calibration_counts(by_turn, participant=participant), bin_size, groups=facet_fields
     )
 
     binX = alt.X(field ='Confidence bin', type='O'
@@ -872,82 +1439,44 @@ def simple_calibration_plot(bin_size, by_turn: bool = False, participant: Option
     return simple_accuracy_by_field(
         source,
         by_turn = by_turn,
-        xEncoding = binX
+        xEncoding = binX,
+        precomputed = True
     ) + calibration_reference_graph
 
 def simple_calibration_plots():
 
     return alt.vconcat(
         simple_calibration_plot(bin_size = 0.05).properties(title="Calibration (Aggregate)"),
-        simple_calibration_plot(bin_size = 0.05, by_turn = True).facet(row='Num previous debating rounds:O').properties(title="Calibration by Turn"),
+        simple_calibration_plot(bin_size = 0.05, by_turn = True, facet_fields = ['Num previous debating rounds']).facet(row='Num previous debating rounds:O').properties(title="Calibration by Turn"),
     )
 
 def calibration_plots():
 
     return alt.vconcat(
         calibration_plot(bin_size = 0.05).properties(title="Calibration (Aggregate)"),
-        calibration_plot(bin_size = 0.1).facet(row='Participant:N').properties(title="Calibration by Judge"),
-        calibration_plot(bin_size = 0.05, by_turn = True).facet(row='Num previous debating rounds:O').properties(title="Calibration by Turn"),
+        calibration_plot(bin_size = 0.1, facet_fields = ['Participant']).facet(row='Participant:N').properties(title="Calibration by Judge"),
+        calibration_plot(bin_size = 0.05, by_turn = True, facet_fields = ['Num previous debating rounds']).facet(row='Num previous debating rounds:O').properties(title="Calibration by Turn"),
     )
 
 def final_simple_calibration_plot(all_turns: bool = False):
     bin_size = 0.1
 
-    def get_confidence(x: float):
-        if x < 0.5:
-            return 1 - x
-        else:  
-            return x
-
     def make_bin(x: float):
-        bot = math.floor(x / bin_size)
-        top = bot + 1
-        return f'{bot * bin_size:.0%} – {top * bin_size:.0%}'
+        return derived.confidence_bin_label(math.floor(x / bin_size), bin_size, percent=True)
 
     if all_turns:
-        source = filtered_turns
         prob_correct_field = 'Probability correct'
     else:
-        source = filtered_sessions
         prob_correct_field = 'Final probability correct'
 
-    source = source[source[prob_correct_field].notna()].copy()
-
-    source = source.merge(
-        debates[
-            [
-                "Room name",
-                "Is offline",
-                "Is single debater",
-                "Honest debater",
-                "Dishonest debater",
-            ]
-        ],
-        how="left",
-        on="Room name",
-    )
-
-    source['Prediction confidence'] = source.apply(
-        lambda row: get_confidence(row[prob_correct_field]),
-        axis=1
+    source = calibration.calibration_table(
+        calibration_counts(by_turn=all_turns, for_paper=True),
+        bin_size,
+        groups=['Setting'],
+        bin_field='Confidence',
+        percent=True
     )
 
-    source['Confidence'] = source.apply(
-        lambda row: make_bin(row['Prediction confidence']),
-        axis=1
-    )
-
-    def get_setting(row):
-        ai_or_human = "Human"
-        consultancy_or_debate = "Debate"
-        if row['Honest debater'] == 'GPT-4' or row['Dishonest debater'] == 'GPT-4':
-            ai_or_human = "AI"
-        if row['Is single debater']:
-            consultancy_or_debate = "Consultancy"
-
-        return " ".join([ai_or_human, consultancy_or_debate])
-    source['Setting'] = source.apply(get_setting, axis=1)
-
     binX = alt.X(field ='Confidence', type='O'
         # sort=alt.EncodingSortField(field='Log final probability correct', op='mean', order='ascending')
     )
@@ -974,7 +1503,8 @@ def final_simple_calibration_plot(all_turns: bool = False):
         height = 200,
         include_text = False,
         yAxisTitle = "Accuracy",
-        yDomain = [0.4, 1.0]
+        yDomain = [0.4, 1.0],
+        precomputed = True
     ) + calibration_reference_graph).facet(
         column=alt.Column('Setting:N', title=None), title="Calibration (all turns)"
     ).configure_title(anchor='middle')
@@ -983,14 +1513,9 @@ def final_simple_calibration_plot(all_turns: bool = False):
 
 # RESULTS
 def final_probability_correct_distribution_live_vs_offline_debates():  # TODO: un-average offline
-    debates["Final probability correct (live and mean of offline)"] = debates.apply(
-        lambda row: row["Final probability correct"]
-        if row["Is offline"] == False
-        else row["Average offline probability correct"],
-        axis=1,
-    )
+    data = current_data()
     bars = (
-        alt.Chart(debates)
+        alt.Chart(data.debates)
         .mark_bar(opacity=0.75, binSpacing=0.5)
         .encode(
             x=alt.X(
@@ -1028,27 +1553,42 @@ def final_probability_correct_distribution_live_vs_offline_debates():  # TODO: u
 
 
 def evidence_by_rounds():
-    evidence_average = (
-        alt.Chart(turns)
-        .transform_filter(
-            datum["Role (honest/dishonest)"] == "Honest debater"
-            or datum["Role (honest/dishonest)"] == "Dishonest debater"
+    data = current_data()
+    rounds_field = "Num previous debating rounds"
+    role_field = "Role (honest/dishonest)"
+    debater_turns = data.turns[data.turns[role_field].isin(["Honest debater", "Dishonest debater"])]
+    average_table = aggregate.mean_with_ci(debater_turns, "Quote length (tok)", [rounds_field])
+    honest_dishonest_table = aggregate.mean_with_ci(debater_turns, "Quote length (tok)", [rounds_field, role_field])
+    if aggregate_charts:
+        average_chart = alt.Chart(average_table)
+        honest_dishonest_chart = alt.Chart(honest_dishonest_table)
+        mean_y = alt.Y("mean:Q", title="Mean quote length (tok)")
+    else:
+        average_chart = alt.Chart(derived.without_derived_columns(data.turns)).transform_filter(
+            (datum[role_field] == "Honest debater")
+            | (datum[role_field] == "Dishonest debater")
         )
+        honest_dishonest_chart = alt.Chart(derived.without_derived_columns(data.turns))
+        mean_y = "mean(Quote length (tok))"
+    band_y = {"y": alt.Y("ci0:Q", title="Mean quote length (tok)"), "y2": "ci1:Q"}
+
+    evidence_average = (
+        average_chart
         .mark_line(color=aggColor)
-        .encode(x="Num previous debating rounds:O", y="mean(Quote length)")
+        .encode(x=f"{rounds_field}:O", y=mean_y)
     ).properties(width=fullWidth / 3, height=fullHeight - 100)
 
-    evidence_average_band = evidence_average.mark_errorband(extent="ci").encode(
-        y=alt.Y("Quote length")
+    evidence_average_band = (
+        alt.Chart(average_table).mark_errorband(color=aggColor).encode(x=f"{rounds_field}:O", **band_y)
     )
     evidence_honest_dishonest = (
-        alt.Chart(turns)
+        honest_dishonest_chart
         .mark_line()
         .encode(
-            x="Num previous debating rounds:O",
-            y="mean(Quote length)",
+            x=f"{rounds_field}:O",
+            y=mean_y,
             color=alt.Color(
-                "Role (honest/dishonest):N",
+                f"{role_field}:N",
                 scale=alt.Scale(
                     domain=["Honest debater", "Dishonest debater"],
                     range=[correctColor, incorrectColor],
@@ -1057,9 +1597,11 @@ def evidence_by_rounds():
         )
     ).properties(width=fullWidth / 3, height=fullHeight - 100)
 
-    evidence_honest_dishonest_band = evidence_honest_dishonest.mark_errorband(
-        extent="ci"
-    ).encode(y=alt.Y("Quote length"))
+    evidence_honest_dishonest_band = (
+        alt.Chart(honest_dishonest_table)
+        .mark_errorband()
+        .encode(x=f"{rounds_field}:O", color=evidence_honest_dishonest.encoding.color, **band_y)
+    )
 
     return (
         (evidence_average + evidence_average_band)
@@ -1068,12 +1610,13 @@ def evidence_by_rounds():
 
 
 def evidence_by_rounds_and_participant(): #TO maybe DO add error bars
+    data = current_data()
     evidence_line = (
-        alt.Chart(turns)
+        alt.Chart(derived.without_derived_columns(data.turns))
         .mark_line()
         .encode(
             x="Num previous debating rounds:O",
-            y="mean(Quote length)",
+            y="mean(Quote length (tok)):Q",
             color="Participant:N",
         )
     )
@@ -1085,7 +1628,7 @@ def evidence_by_rounds_and_participant(): #TO maybe DO add error bars
         empty="none",
     )
     selectors = (
-        alt.Chart(turns)
+        alt.Chart(derived.without_derived_columns(data.turns))
         .mark_point()
         .encode(
             x="Num previous debating rounds:O",
@@ -1096,7 +1639,7 @@ def evidence_by_rounds_and_participant(): #TO maybe DO add error bars
     text = evidence_line.mark_text(align="left", dx=3, dy=-3).encode(
         text=alt.condition(nearest, "Participant:N", alt.value(" "))
     )
-    return alt.layer(evidence_line, selectors, text, data=turns).properties(
+    return alt.layer(evidence_line, selectors, text, data=data.turns).properties(
         width=fullWidth, height=fullHeight
     )
 
@@ -1120,8 +1663,9 @@ def evidence_by_rounds_and_participant(): #TO maybe DO add error bars
 
 
 def final_probability_by_debaters():  # I feel like there should be a shorter way to do this... oh well for now
+    data = current_data()
     honest_avg = (
-        alt.Chart(debates)
+        alt.Chart(data.debates)
         .mark_circle(color=correctColor)
         .encode(
             x=alt.X(
@@ -1138,7 +1682,7 @@ def final_probability_by_debaters():  # I feel like there should be a shorter wa
         )
     )
     honest_err = (
-        alt.Chart(debates)
+        alt.Chart(data.debates)
         .mark_rule()
         .encode(
             x=alt.X(
@@ -1152,7 +1696,7 @@ def final_probability_by_debaters():  # I feel like there should be a shorter wa
         )
     )
     dishonest_avg = (
-        alt.Chart(debates)
+        alt.Chart(data.debates)
         .mark_circle(color=incorrectColor)
         .encode(
             x=alt.X(
@@ -1171,7 +1715,7 @@ def final_probability_by_debaters():  # I feel like there should be a shorter wa
         )
     )
     dishonest_err = (
-        alt.Chart(debates)
+        alt.Chart(data.debates)
         .mark_rule()
         .encode(
             x=alt.X(
@@ -1194,8 +1738,9 @@ def final_probability_by_debaters():  # I feel like there should be a shorter wa
 
 
 def final_probability_correct_by_judge(): # TODO remove null
+    data = current_data()
     judge_avg = (
-        alt.Chart(debates)
+        alt.Chart(data.debates)
         .mark_circle(color=nullColor)
         .encode(
             x=alt.X(
@@ -1212,7 +1757,7 @@ def final_probability_correct_by_judge(): # TODO remove null
         )
     )
     judge_err = (
-        alt.Chart(debates)
+        alt.Chart(data.debates)
         .mark_rule()
         .encode(
             x=alt.X(
@@ -1229,12 +1774,13 @@ def final_probability_correct_by_judge(): # TODO remove null
 
 
 def final_probability_correct_by_judge_experience():  # TODO: add other judge setups
-    debates.sort_values(by=["End time"], inplace=True)
-    debates["Judge experience"] = debates.groupby("Judge")["End time"].transform(
+    # sorted copy, since the snapshot's tables are shared
+    source = current_data().debates.sort_values(by=["End time"])
+    source["Judge experience"] = source.groupby("Judge", observed=True)["End time"].transform(
         "cumcount"
     )
     judge_ex_agg = (
-        alt.Chart(debates)
+        alt.Chart(source)
         .transform_filter(datum["Final probability correct"] != None)
         .transform_aggregate(
             mean="mean(Final probability correct)",
@@ -1256,11 +1802,15 @@ def final_probability_correct_by_judge_experience():  # TODO: add other judge se
         )
     )
     # Add error bars
+    intervals = aggregate.mean_with_ci(source, "Final probability correct", ["Judge experience"])
     err = (
-        alt.Chart(debates)
-        .transform_filter(datum["Final probability correct"] != None)
-        .mark_errorband(extent="ci")
-        .encode(x=alt.X("Judge experience:Q"), y=alt.Y("Final probability correct:Q"))
+        alt.Chart(intervals[intervals["count"] > 0])
+        .mark_errorband()
+        .encode(
+            x=alt.X("Judge experience:Q"),
+            y=alt.Y("ci0:Q", title="Final probability correct"),
+            y2="ci1:Q",
+        )
     )
     return (judge_ex_agg + err).properties(
         width=fullWidth,
@@ -1270,12 +1820,13 @@ def final_probability_correct_by_judge_experience():  # TODO: add other judge se
 
 
 def final_probability_correct_by_judge_experience_and_participant():  # TODO: add other judge setups # TO maybe DO categorize judge patterns # TODO fix "tooltip"
-    debates.sort_values(by=["End time"], inplace=True)
-    debates["Judge experience"] = debates.groupby("Judge")["End time"].transform(
+    # sorted copy, since the snapshot's tables are shared
+    source = current_data().debates.sort_values(by=["End time"])
+    source["Judge experience"] = source.groupby("Judge", observed=True)["End time"].transform(
         "cumcount"
     )
     judge_ex = (
-        alt.Chart(debates)
+        alt.Chart(source)
         .mark_line()
         .encode(
             x=alt.X("Judge experience:Q", title="Number of debates judged"),
@@ -1302,16 +1853,18 @@ def final_probability_correct_by_judge_experience_and_participant():  # TODO: ad
     text = judge_ex.mark_text(align="left", dx=3, dy=-3).encode(
         text=alt.condition(nearest, "Judge:N", alt.value(" "))
     )
-    return alt.layer(judge_ex, selectors, text, data=debates).properties(
+    return alt.layer(judge_ex, selectors, text, data=source).properties(
         width=fullWidth, height=fullHeight
     )
 
+# `source` holds the rows shown by `base_chart`, from which the confidence bands are computed.
 def make_mean_lines_with_scatter(
         base_chart,
         x,
         y,
         series,
-        tooltip
+        tooltip,
+        source,
 ):
     points = (
         base_chart
@@ -1337,27 +1890,30 @@ def make_mean_lines_with_scatter(
             y=f"mean({y}):Q",
         )
     )
+    intervals = aggregate.mean_with_ci(source, y, [x, series] if series is not None else [x])
     err = (
-        base_chart
-        .transform_joinaggregate(
-            count_at_num="count()", groupby=([x, series] if series is not None else [x])
-        )
-        .transform_filter(
-            datum['count_at_num'] > 1
-        )
-        .mark_errorband(extent="ci", opacity=0.2)
+        alt.Chart(intervals[intervals["count"] > 1])
+        .mark_errorband(opacity=0.2)
         .encode(
-            y=f"{y}:Q",
+            x=f"{x}:Q",
+            y=alt.Y("ci0:Q", title=y),
+            y2="ci1:Q",
+            **({"color": f"{series}:N"} if series is not None else {}),
         )
     )
     return (points + err + mean)
 
+def judges_with_offline_role(source):
+    """The judges' rows of `source`, with their role marked if there was no live judge as `roleWithOffline`."""
+    source = source[source["Role"].isin(["Judge", "Offline Judge"])]
+    return source.assign(
+        roleWithOffline=source["Role"].astype(object) + " " + np.where(source["Is offline"] == True, "(no live judge)", "")
+    )
+
 def final_probability_correct_by_num_judge_continues():
-    source = sessions.merge(debates[["Room name", "Is offline"]], how="left", on="Room name")
+    source = judges_with_offline_role(with_debate_attributes(["Is offline"]))
     base = (
         alt.Chart(source)
-        .transform_filter((datum['Role'] == 'Judge') | (datum['Role'] == 'Offline Judge'))
-        .transform_calculate(roleWithOffline = "datum['Role'] + ' ' + (datum['Is offline'] ? '(no live judge)' : '')")
         .encode(
             x=alt.X("Number of judge continues:Q", axis = alt.Axis(tickMinStep=1), title="Number of judge continues"),
             color=alt.Color('roleWithOffline:N', legend=alt.Legend(title="Role", orient="bottom")),
@@ -1369,24 +1925,14 @@ def final_probability_correct_by_num_judge_continues():
         x = "Number of judge continues",
         y = "Final probability correct",
         series = 'roleWithOffline',
-        tooltip = ["Room name", 'Participant']
+        tooltip = ["Room name", 'Participant'],
+        source = source,
     )
 
 def intermediate_probability_correct_by_num_debate_rounds():
-    source = turns.merge(
-        debates[
-            [
-                "Room name",
-                "Is offline"
-            ]
-        ],
-        how="left",
-        on="Room name",
-    )
+    source = judges_with_offline_role(with_debate_attributes(["Is offline"], by_turn=True))
     base = (
         alt.Chart(source)
-        .transform_filter((datum['Role'] == 'Judge') | (datum['Role'] == 'Offline Judge'))
-        .transform_calculate(roleWithOffline = "datum['Role'] + ' ' + (datum['Is offline'] ? '(no live judge)' : '')")
         .encode(
             x=alt.X("Num previous debating rounds:Q", axis = alt.Axis(tickMinStep=1), title="Num previous debating rounds"),
             color=alt.Color('roleWithOffline:N', legend=alt.Legend(title="Role", orient="bottom")),
@@ -1398,12 +1944,15 @@ def intermediate_probability_correct_by_num_debate_rounds():
         x = "Num previous debating rounds",
         y = "Probability correct",
         series = 'roleWithOffline',
-        tooltip = ["Room name", 'Participant']
+        tooltip = ["Room name", 'Participant'],
+        source = source,
     )
 
 def final_probability_correct_by_information_progress():
+    data = current_data()
+    source = derived.without_derived_columns(data.sessions)
     base = (
-        alt.Chart(sessions)
+        alt.Chart(source)
         .encode(
             x=alt.X("factual informativeness (total):Q", axis = alt.Axis(tickMinStep=1), title="Factual informativeness"),
         )
@@ -1415,19 +1964,21 @@ def final_probability_correct_by_information_progress():
         x = "factual informativeness (total)",
         y = "Final probability correct",
         series = None,
-        tooltip = ["Room name", 'Participant']
+        tooltip = ["Room name", 'Participant'],
+        source = source,
     )
 
 
 def final_probability_correct_by_question_subjectivity():
-    source = sessions
+    data = current_data()
+    source = derived.without_derived_columns(data.sessions)
+    source = source.assign(
+        avg_subjective_correctness=source.groupby("Room name", observed=True)["subjective correctness"].transform("mean")
+    )
+    source = source[source["Role"].isin(["Judge", "Offline Judge"])]
 
     base = (
         alt.Chart(source)
-        .transform_joinaggregate(
-            avg_subjective_correctness="mean(subjective correctness)", groupby=["Room name"]
-        )
-        .transform_filter((datum['Role'] == 'Judge') | (datum['Role'] == 'Offline Judge'))
         .encode(
             x=alt.X("avg_subjective_correctness:Q", axis = alt.Axis(tickMinStep=1), title="Subjective correctness"),
         )
@@ -1439,7 +1990,8 @@ def final_probability_correct_by_question_subjectivity():
         x = "avg_subjective_correctness",
         y = "Final probability correct",
         series = None,
-        tooltip = ["Room name", "Participant"]
+        tooltip = ["Room name", "Participant"],
+        source = source,
     )
 
 
@@ -1449,10 +2001,11 @@ def final_probability_correct_by_speed_annotator_accuracy():
     #     bins=[0, 0.1, 0.2, 0.3, 0.4],
     #     labels=["0-10%", "10-20%", "20-30%", "30-40%"],
     # )
-    print(debates["Speed annotator accuracy"].isnull().sum())
+    data = current_data()
+    print(data.debates["Speed annotator accuracy"].isnull().sum())
     # print(source["Speed annotator accuracy"].isnull().sum())
     speed = (
-        alt.Chart(debates)
+        alt.Chart(data.debates)
         .transform_density(
             "Final probability correct",
             as_=["Final probability correct", "density"],
@@ -1531,8 +2084,9 @@ def final_probability_correct_by_speed_annotator_accuracy():
 
 
 def num_rounds_per_debate():
+    data = current_data()
     base = (
-        alt.Chart(debates)
+        alt.Chart(data.debates)
         .transform_filter('datum["Is over"] == true')
         .transform_joinaggregate(
             groupby=["Is offline"],
@@ -1554,20 +2108,8 @@ def num_rounds_per_debate():
 
 
 def anonymity():
-    source = sessions.merge(
-        debates[["Room name", "Debater A", "Debater B", "Judge"]],
-        how="left",
-        on="Room name",
-    )
-    source["Guesses"] = source.apply(
-        lambda row: sum(
-            [
-                row[col] == row["identity guesses." + col]
-                for col in ["Debater A", "Debater B", "Judge"]
-            ]
-        ),
-        axis=1,
-    )
+    data = current_data()
+    source = derived.without_derived_columns(data.sessions, keep=['Guesses'])
     print(source["Guesses"].value_counts)
     return (
         alt.Chart(source)
@@ -1584,7 +2126,7 @@ def anonymity():
 
 
 def turns_to_complete_by_participant():
-    source = sessions.merge(debates, how="left", on="Room name")
+    source = with_debate_attributes()
     source["Role"] = source["Role"].map(
         lambda x: "Debater" if x.startswith("Debater") else x
     )
@@ -1608,8 +2150,9 @@ def turns_to_complete_by_participant():
 
 
 def debater_pairings_by_role():
+    data = current_data()
     return (
-        alt.Chart(debates)
+        alt.Chart(data.debates)
         .mark_rect()
         .encode(
             x="Honest debater:O",
@@ -1621,7 +2164,7 @@ def debater_pairings_by_role():
 
 def participant_by_current_workload():
     # debates.set_index('Room name')
-    source = sessions.merge(debates, how="left", on="Room name")
+    source = with_debate_attributes()
     source["Role"] = source["Role"].map(
         lambda x: "Debater" if x.startswith("Debater") else x
     )
@@ -1639,15 +2182,16 @@ def participant_by_current_workload():
             column=alt.Column("Role:O"),
             tooltip=["count()"],
         )
-        .transform_filter(datum["Is over_x"] == False)
+        .transform_filter(datum["Is over"] == False)
         .properties(width=200)
     )
 
 
 def judge_pairings():
+    data = current_data()
     return (
         alt.Chart(
-            debates.melt(
+            data.debates.melt(
                 id_vars="Judge",
                 value_vars=("Honest debater", "Dishonest debater"),
                 value_name="Debater",
@@ -1663,29 +2207,10 @@ def judge_pairings():
 
 
 def debates_completed_per_week():
+    data = current_data()
 
-    source = debates[debates['End time'].notna()]
-    # debates['End date'] = debates['End time'] - pd.to_timedelta(6, unit='d')
-
-    source["End week"] = source["End time"].apply(
-        lambda x: x.week
-        # lambda x: f'{(x.dt.week).strftime("%b %d")} - {x.strftime("%B %d")}'
-    )
-
-    def convert_time(x):
-        start_date = datetime.datetime.strptime(f"{x.year}-{x.week}-1", "%Y-%W-%w")
-        end_date = start_date + pd.Timedelta(days=6)
-        return f'{start_date.strftime("%b%d")}|{end_date.strftime("%b%d")}'
-
-    source["End week label"] = source["End time"].apply(
-        convert_time
-        # lambda x: datetime.datetime.strptime(
-        #     f'{x.year}-{x.week}-1', "%Y-%W-%w"
-        # ).strftime("%b %d") + ' - ' + datetime.datetime.strptime(
-        #     f'{(x + pd.Timedelta(days=6)).year}-{(x + pd.Timedelta(days=6)).week}-0', "%Y-%W-%w"
-        # ).strftime("%B %d")
-        # lambda x: f'{x.year}- {(x.week).strftime("%b %d")} - {x.strftime("%B %d")}'
-    )
+    # "End week" and "End week label" are derived at load time
+    source = data.debates[data.debates['End time'].notna()]
     # add a column to debates with a human-readable date range from End week (week number) using pandas
     # source['End week label'] = source['End time'].apply(
     #     lambda x: f'{(x - pd.to_timedelta(6, unit="d")).strftime("%b %d")} - {x.strftime("%b %d")}'
@@ -1714,33 +2239,21 @@ def debates_completed_per_week():
     return all_bar  # + all_line
 
 def personal_accuracy(user: str):
-    source = sessions.merge(
-        debates[
-            [
-                "Room name",
-                "Is offline",
-                "Is single debater"
-            ]
+    source = with_debate_attributes(
+        [
+            "Is offline",
+            "Is single debater"
         ],
-        how="left",
-        on="Room name",
+        keep=['Judge setting (honesty hidden)'],
+        participant=user
     )
 
     source = source[source['Role'].isin(['Judge', 'Offline Judge'])]
-    def get_setting(row):
-        if row['Is offline']:
-            return row['Role'] + ' (no live judge)'
-        elif row['Is single debater']:
-            return row['Role'] + ' (single debater)'
-        else:
-            return row['Role']
-    source['roleWithOffline'] = source.apply(get_setting, axis=1)
 
-    rowEncoding = alt.Row(field ='roleWithOffline', type='N', title='Role')
-    yEncoding = alt.Y(field ='roleWithOffline', type='N', title='Role')
+    rowEncoding = alt.Row(field ='Judge setting (honesty hidden)', type='N', title='Role')
+    yEncoding = alt.Y(field ='Judge setting (honesty hidden)', type='N', title='Role')
 
     source = source[source['Final probability correct'].notna()]
-    source = source[source['Participant'] == user]
 
     return alt.vconcat(
         accuracy_by_field(
@@ -1754,34 +2267,21 @@ def personal_accuracy(user: str):
 
 def personal_win_rates(user):
 
-    source = sessions.merge(
-        debates[
+    # the judges' sessions of the user's debates, in the first of these roles the user had in each
+    source = pd.concat([
+        with_debate_attributes(
             [
-                "Room name",
                 "Honest debater",
                 "Dishonest debater",
-            ]
-        ],
-        how="left",
-        on="Room name",
-    )
-
+            ],
+            keep=['Log final probability correct'],
+            participant=user,
+            participant_column=column
+        ).assign(**{'Your Role': role})
+        for column, role in [('Participant', 'Judge'), ('Honest debater', 'Honest debater'), ('Dishonest debater', 'Dishonest debater')]
+    ])
+    source = source[~source.index.duplicated()].sort_index()
     source = source[source['Role'].isin(['Judge', 'Offline Judge'])]
-    source['Log final probability correct'] = source.apply(
-        lambda row: np.log(row['Final probability correct']),
-        axis=1
-    )
-    def get_role(row):
-        if row['Participant'] == user:
-            return 'Judge'
-        elif row['Honest debater'] == user:
-            return 'Honest debater'
-        elif row['Dishonest debater'] == user:
-            return 'Dishonest debater'
-        else:
-            return 'None'
-    source['Your Role'] = source.apply(get_role, axis = 1)
-    source = source[source['Your Role'] != 'None']
 
     yourRoleY = alt.Y(field ='Your Role', type='N', title='Your Role')
     # dishonestY = alt.Y(field ='Dishonest debater', type='N', title='Dishonest debater',
@@ -1789,10 +2289,9 @@ def personal_win_rates(user):
     # )
 
     accuracy_source = source[source['Final probability correct'].notna()]
-    accuracy_source['Final probability assigned'] = source.apply(
-        lambda row: 1 - row['Final probability correct'] if row['Your Role'] == 'Dishonest debater' else row['Final probability correct'],
-        axis = 1
-    )
+    accuracy_source = accuracy_source.assign(**{'Final probability assigned': accuracy_source['Final probability correct'].where(
+        accuracy_source['Your Role'] != 'Dishonest debater', 1 - accuracy_source['Final probability correct']
+    )})
 
     return accuracy_by_field(
         accuracy_source,
@@ -1931,34 +2430,427 @@ personalized_graph_specifications = {
 }
 
 
+# Rendered graph specs are cached per data version and time window; set to 0 to disable. By default, there's room for
+# every graph of two versions, since the previous version's specs are served while the current one's are pre-rendered.
+graph_cache = SpecCache(max_entries=int(os.environ.get("GRAPH_CACHE_SIZE", default=str(2 * len(all_graph_specifications)))))
+
+batch_pool = ThreadPoolExecutor(max_workers=max(batch_workers, 1), thread_name_prefix="graph-batch")
+
+# While graphs are being pre-rendered for the current data version, those not done yet
+# are served from this older version's cached specs.
+stale_version: Optional[int] = None
+
+# Worker processes rendering graphs (see `render_in_worker`), started on first use. They're spawned rather than
+# forked, since a process forked while other threads hold locks (e.g., of the caches) could wait on them forever.
+render_pool: Optional[ProcessPoolExecutor] = None
+render_pool_lock = threading.Lock()
+
+class StaleWorkerData(Exception):
+    """A worker process couldn't load the data it was asked to render from, since the summaries changed since."""
+
+def sync_worker_data(sources: Dict[str, Any]):
+    """Bring a worker process's data up to date with the summaries described by `sources`."""
+    if snapshot.sources != sources:
+        if shared_data_dir is None:
+            read_data(incremental=True)
+        else:
+            sync_shared_data(wait=True)
+    if snapshot.sources != sources:
+        raise StaleWorkerData()
+
+def graph_metrics_name(name: str, user: Optional[str]) -> str:
+    return name if user is None else f"personalized/{name}"
+
+# Runs in a worker process. Returns the spec along with the datasets it references,
+# which the calling process needs to serve, and the render and serialization times.
+def render_in_worker(
+    sources: Dict[str, Any], window: TimeWindow, name: str, user: Optional[str] = None
+) -> Tuple[str, Dict[str, str], Tuple[float, float]]:
+    sync_worker_data(sources)
+    if user is None:
+        chart_fn = all_graph_specifications[name]
+    else:
+        chart_fn = lambda: personalized_graph_specifications[name](user)
+    with pinned_data(window_view(snapshot, window)), datasets.recording() as recorded:
+        spec, timings = metrics.timed_render(graph_metrics_name(name, user), chart_fn)
+    return spec, recorded, timings
+
+def submit_render(data: DataSnapshot, name: str, user: Optional[str] = None) -> Future:
+    """Render graph `name` (personalized for `user`, if given) for `data` in a worker process."""
+    global render_pool
+    with render_pool_lock:
+        if render_pool is None:
+            render_pool = ProcessPoolExecutor(max_workers=prerender_workers, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            return render_pool.submit(render_in_worker, data.sources, data.window, name, user)
+        except BrokenProcessPool:
+            # a worker died (e.g., killed for running out of memory), so start over with new ones
+            render_pool = ProcessPoolExecutor(max_workers=prerender_workers, mp_context=multiprocessing.get_context("spawn"))
+            return render_pool.submit(render_in_worker, data.sources, data.window, name, user)
+
+def rendered_by_worker(future: Future, name: str, user: Optional[str] = None) -> str:
+    """The spec rendered by a worker process, whose metrics and datasets are recorded in this one."""
+    spec, recorded, timings = future.result()
+    metrics.record_render(graph_metrics_name(name, user), *timings, len(spec))
+    datasets.add_all(recorded)
+    return spec
+
+def prerender_graphs(version: int):
+    """Render every graph for data version `version` in worker processes and cache the results."""
+    global stale_version
+    data = window_view(snapshot)
+    if data.version != version:
+        return
+    futures = {submit_render(data, name): name for name in all_graph_specifications}
+    for future in as_completed(futures):
+        if snapshot.version != version:
+            # the data was reloaded in the meantime, and a newer pre-rendering has taken over
+            for f in futures:
+                f.cancel()
+            return
+        name = futures[future]
+        try:
+            graph_cache.put((name, version, data.window), rendered_by_worker(future, name))
+        except Exception as e:
+            print(f"Could not pre-render {name}: {e}")
+    if snapshot.version == version:
+        stale_version = None
+        print(f"Pre-rendered all graphs for data version {version}")
+
+def start_prerendering(previous_version: Optional[int]):
+    global stale_version
+    if prerender_workers <= 0:
+        return
+    # if the last pre-rendering didn't finish, keep serving the version from before it
+    if stale_version is None:
+        stale_version = previous_version
+    threading.Thread(target=prerender_graphs, args=(snapshot.version,), daemon=True).start()
+
+# Distinguishes ETags from different runs of the server, since data versions restart from 1.
+# With shared data, all processes use the one stored with the shared tables.
+if shared_data_dir is None:
+    server_instance = uuid.uuid4().hex
+
+def compress(body: str, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body.encode(), quality=5)
+    else:
+        return gzip.compress(body.encode(), compresslevel=6)
+
+def cached_response(
+    body: str, *etag_parts, mimetype="application/json", cache: Optional[SpecCache] = None, cache_key: Hashable = None
+):
+    """A compressed response with an ETag derived from `etag_parts`, or 304 Not Modified if the client has it.
+
+    Each encoding of the body gets its own ETag, so caches never mix them up. If `body` is cached in `cache`
+    under `cache_key`, it's only compressed once and kept with it.
+    """
+    encoding = request.accept_encodings.best_match(["br", "gzip"] if has_brotli else ["gzip"])
+    if len(body) <= 1024:
+        encoding = None
+    etag = hashlib.sha1(json.dumps([server_instance, *etag_parts]).encode()).hexdigest()[:24]
+    etag = f"{etag}-{encoding or 'identity'}"
+    # this also matches `If-None-Match: *`
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(mimetype=mimetype)
+        if encoding is not None:
+            compressed = None if cache is None else cache.encoded(cache_key, encoding, lambda body: compress(body, encoding))
+            response.set_data(compressed if compressed is not None else compress(body, encoding))
+            response.headers["Content-Encoding"] = encoding
+        else:
+            response.set_data(body)
+    response.set_etag(etag)
+    # on 304s too, so caches revalidate each encoding separately
+    response.vary.add("Accept-Encoding")
+    return response
+
 @app.get("/all_graphs")
 def all_graphs():
     result = sorted(list(all_graph_specifications.keys()))
-    return Response(json.dumps(result), mimetype="application/json")
+    return cached_response(json.dumps(result), "all graphs")
+
+def render_for_batch(data: DataSnapshot, name: str, user: Optional[str], chart_fn: Callable[[], Any]) -> str:
+    """Render a graph in a worker process if there are any, or else in this one (and thread)."""
+    if prerender_workers > 0:
+        try:
+            return rendered_by_worker(submit_render(data, name, user), name, user)
+        except StaleWorkerData:
+            # the workers have moved on to newer summaries than `data`'s
+            pass
+    return metrics.timed_render(graph_metrics_name(name, user), chart_fn)[0]
+
+def cached_graph(name: str, data: DataSnapshot, in_worker: bool = False) -> Tuple[Hashable, str]:
+    """The cache key and spec of graph `name` for `data`, rendering it if it isn't cached.
+
+    With `in_worker`, it's rendered by a worker process (if there are any), so other renders can run meanwhile.
+    """
+    chart_fn = all_graph_specifications[name]
+    rendered = []
+    def render():
+        rendered.append(name)
+        if in_worker:
+            return render_for_batch(data, name, None, chart_fn)
+        return metrics.timed_render(name, chart_fn)[0]
+    with pinned_data(data):
+        key, spec = graph_cache.get_or_render(
+            (name, data.version, data.window),
+            render,
+            fallback_key=None if stale_version is None else (name, stale_version, data.window)
+        )
+    metrics.record_request(name, hit=len(rendered) == 0)
+    return key, spec
+
+def cached_personalized_graph(user: str, name: str, data: DataSnapshot, in_worker: bool = False) -> Tuple[Hashable, str]:
+    """Like `cached_graph`, for personalized graph `name` of `user`."""
+    chart_fn = personalized_graph_specifications[name]
+    rendered = []
+    def render():
+        rendered.append(name)
+        if in_worker:
+            return render_for_batch(data, name, user, lambda: chart_fn(user))
+        return metrics.timed_render(f"personalized/{name}", lambda: chart_fn(user))[0]
+    with pinned_data(data):
+        key, spec = personalized_graph_cache.get_or_render((user, name, data.version, data.window), render)
+    metrics.record_request(f"personalized/{name}", hit=len(rendered) == 0)
+    return key, spec
+
+def request_data() -> DataSnapshot:
+    """The latest data in the time window the request asks for.
+
+    `?window=<name>` selects one of the `time_windows` (by default, `default_time_window`),
+    and `since` and/or `until` override its bounds.
+    """
+    name = request.args.get("window", default=default_time_window)
+    if name not in time_windows:
+        abort(404, description=f"Unknown time window: {name}")
+    since, until = time_windows[name]
+    try:
+        window = time_window(request.args.get("since", since), request.args.get("until", until))
+    except ValueError as e:
+        abort(400, description=str(e))
+    return window_view(snapshot, window)
+
+@app.get("/time_windows")
+def list_time_windows():
+    result = {"default": default_time_window, "windows": {name: named_time_window(name) for name in time_windows}}
+    return cached_response(json.dumps(result), "time windows")
 
 @app.get("/graph/<name>")
 def graph(name: str):
-    chart_fn = all_graph_specifications.get(name)
-    if chart_fn is None:
+    if name not in all_graph_specifications:
         abort(404)
     else:
-        return chart_fn().to_json(0)
+        key, spec = cached_graph(name, request_data())
+        return cached_response(spec, *key, cache=graph_cache, cache_key=key)
 
 @app.get("/personalized_graphs")
 def personalized_graphs():
     result = sorted(list(personalized_graph_specifications.keys()))
-    return Response(json.dumps(result), mimetype="application/json")
+    return cached_response(json.dumps(result), "personalized graphs")
 
 @app.get("/personalized_graph/<user>/<name>")
 def personalized_graph(user: str, name: str):
-    chart_fn = personalized_graph_specifications.get(name)
-    if chart_fn is None:
+    if name not in personalized_graph_specifications:
         abort(404)
     else:
-        return chart_fn(user.replace("_", " ")).to_json(0)
+        key, spec = cached_personalized_graph(user.replace("_", " "), name, request_data())
+        return cached_response(spec, *key, cache=personalized_graph_cache, cache_key=key)
+
+def standing_json(standing: standings.Standing) -> Dict[str, Any]:
+    return {"total": standing.total, "count": standing.count, "mean": standing.mean if standing.count > 0 else None}
+
+@app.get("/standings")
+def all_standings():
+    """Every participant's sum, count and mean of each reward, in the request's time window."""
+    data = request_data()
+    result = {
+        reward: {participant: standing_json(standing) for participant, standing in sorted(by_participant.items())}
+        for reward, by_participant in data.standings.by_reward.items()
+    }
+    return cached_response(json.dumps(result), "standings", data.version, data.window)
+
+@app.get("/standings/<user>")
+def participant_standings(user: str):
+    data = request_data()
+    user = user.replace("_", " ")
+    result = {reward: standing_json(standing) for reward, standing in data.standings.participant(user).items()}
+    return cached_response(json.dumps(result), "standings", user, data.version, data.window)
+
+@app.post("/graphs")
+def graph_batch():
+    """Render several graphs at once, in the worker processes if there are any.
+
+    The JSON body lists graph names under "graphs" and [user, name] pairs of personalized graphs
+    (with the user's actual name) under "personalized". The response lists an object per graph, with
+    its "name", "user" for personalized graphs, and "spec" (or "error" if it couldn't be rendered).
+    With `?stream=true`, the objects are sent as newline-delimited JSON as soon as each is done.
+    """
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        abort(400, description="Expected a JSON object.")
+    graphs, personalized = body.get("graphs", []), body.get("personalized", [])
+    if not (isinstance(graphs, list) and all(isinstance(name, str) for name in graphs)):
+        abort(400, description='"graphs" must be a list of graph names.')
+    if not (isinstance(personalized, list) and all(
+        isinstance(pair, list) and len(pair) == 2 and all(isinstance(part, str) for part in pair) for pair in personalized
+    )):
+        abort(400, description='"personalized" must be a list of [user, name] pairs.')
+    requested = [(None, name) for name in graphs] + [(user, name) for user, name in personalized]
+    for user, name in requested:
+        if name not in (all_graph_specifications if user is None else personalized_graph_specifications):
+            abort(404)
+    # all graphs of a batch are rendered from the same data
+    data = request_data()
+    def render(user, name):
+        if user is None:
+            return cached_graph(name, data, in_worker=True)
+        else:
+            return cached_personalized_graph(user, name, data, in_worker=True)
+    futures = {batch_pool.submit(render, user, name): (user, name) for user, name in requested}
+
+    def result(future) -> Tuple[str, Optional[Hashable]]:
+        """The JSON object of a finished graph, along with its cache key."""
+        user, name = futures[future]
+        fields = json.dumps({"name": name} if user is None else {"name": name, "user": user})[:-1]
+        try:
+            key, spec = future.result()
+        except Exception as e:
+            return f'{fields}, "error": {json.dumps(f"{type(e).__name__}: {e}")}}}', None
+        # the spec is already JSON, so it's spliced in rather than parsed and serialized again
+        return f'{fields}, "spec": {spec}}}', key
+
+    if request.args.get("stream") == "true":
+        def stream():
+            for future in as_completed(futures):
+                # specs are indented; JSON strings can't contain raw newlines, so they're only whitespace
+                yield result(future)[0].replace("\n", "") + "\n"
+        return Response(stream(), mimetype="application/x-ndjson")
+    results = [result(future) for future in futures]
+    if any(key is None for _, key in results):
+        return Response("[" + ", ".join(text for text, _ in results) + "]", mimetype="application/json")
+    return cached_response("[" + ", ".join(text for text, _ in results) + "]", "batch", *[key for _, key in results])
+
+# Tables that can be exported from `/export/<table>`.
+exportable_tables = [
+    "debates", "sessions", "turns", "leaderboard", "sessions_with_debates", "turns_with_debates",
+    "filtered_sessions", "filtered_turns",
+]
+# Query parameters of exports that select rows by the values (any number of them) of a column.
+export_filters = {"room": "Room name", "participant": "Participant", "role": "Role", "setting": "Setting"}
+
+def export_response(frames: List[pd.DataFrame], filename: str, label_datasets: bool = False):
+    """Stream the rows of `frames` matching the request's `export_filters`, in the requested format.
+
+    Each filter only applies to frames with its column. (The frames come from the request's time window.)
+    """
+    format = request.args.get("format", default="ndjson")
+    if format not in export.formats:
+        abort(400, description=f"Unknown format: {format}")
+    if format == "csv" and len(frames) > 1:
+        abort(400, description=f"This graph has {len(frames)} datasets; choose one with `dataset` to export CSV.")
+    filters = {column: request.args.getlist(param) for param, column in export_filters.items()}
+
+    def stream():
+        for i, frame in enumerate(frames):
+            positions = export.matching_positions(frame, filters)
+            yield from export.serialize_rows(frame, positions, format, dataset=i if label_datasets else None)
+
+    response = Response(stream(), mimetype=export.formats[format])
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}.{format}"'
+    return response
+
+@app.get("/export/<table>")
+def export_table(table: str):
+    """Rows of one of the `exportable_tables`, filtered as in `export_response`.
+
+    With `?text=true`, tables of turns include the speeches and quotes (see `with_turn_text`).
+    """
+    if table not in exportable_tables:
+        abort(404)
+    frame = getattr(request_data(), table)
+    if request.args.get("text") == "true" and all(c in frame.columns for c in turn_key_columns):
+        frame = with_turn_text(frame)
+    return export_response([frame], table)
+
+def export_chart(chart_fn: Callable[[], Any], filename: str):
+    """The datasets of the chart `chart_fn` builds, filtered as in `export_response`.
+
+    With `?dataset=<i>`, only its `i`th dataset is exported; otherwise each row is labeled with its dataset.
+    """
+    with pinned_data(request_data()):
+        frames = export.chart_frames(chart_fn())
+    dataset = request.args.get("dataset")
+    if dataset is None:
+        return export_response(frames, filename, label_datasets=True)
+    if not dataset.isdigit() or int(dataset) >= len(frames):
+        abort(404)
+    return export_response([frames[int(dataset)]], f"{filename}-{dataset}")
 
+@app.get("/export/graph/<name>")
+def export_graph(name: str):
+    chart_fn = all_graph_specifications.get(name)
+    if chart_fn is None:
+        abort(404)
+    return export_chart(chart_fn, name)
 
+@app.get("/export/personalized_graph/<user>/<name>")
+def export_personalized_graph(user: str, name: str):
+    chart_fn = personalized_graph_specifications.get(name)
+    if chart_fn is None:
+        abort(404)
+    user = user.replace("_", " ")
+    return export_chart(lambda: chart_fn(user), f"{name}-{user}")
+
+@app.get("/data/<name>")
+def dataset(name: str):
+    content = datasets.get(name)
+    if content is None:
+        abort(404)
+    response = cached_response(
+        content, name, mimetype=datasets.formats[name.rsplit(".", 1)[-1]], cache=datasets.store, cache_key=name
+    )
+    # the name is a hash of the content, so it never changes
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    # specs are rendered in the browser, which loads the analytics page from the webapp's origin
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    return response
+
+@app.get("/graph_cache")
+def graph_cache_stats():
+    return {
+        "data version": snapshot.version,
+        **graph_cache.stats(),
+        "personalized": personalized_graph_cache.stats(),
+    }
+
+if shared_data_dir is not None:
+    @app.before_request
+    def remap_shared_data():
+        previous_version = snapshot.version
+        if sync_shared_data():
+            start_prerendering(previous_version)
+
+@app.get("/metrics")
+def metrics_exposition():
+    gauges = {"analytics_data_version": snapshot.version}
+    counters = {}
+    for prefix, cache in [("analytics_graph_cache", graph_cache), ("analytics_personalized_graph_cache", personalized_graph_cache)]:
+        stats = cache.stats()
+        gauges.update({f"{prefix}_entries": stats["entries"], f"{prefix}_size_bytes": stats["size"]})
+        counters.update({f"{prefix}_hits_total": stats["hits"], f"{prefix}_misses_total": stats["misses"]})
+    return Response(metrics.exposition(gauges, counters), mimetype="text/plain; version=0.0.4")
+
+# Refreshes are incremental unless `?full=true` is passed.
 @app.post("/refresh")
 def refresh():
-    read_data()
+    previous_version = snapshot.version
+    reload_data(incremental=request.args.get("full") != "true")
+    if snapshot.version != previous_version:
+        start_prerendering(previous_version)
     return {}
+
+# render workers import this module too, but only render what they're sent
+if multiprocessing.parent_process() is None:
+    start_prerendering(None)
@@ -0,0 +1,118 @@
+"""Sharing the loaded analytics tables between server processes.
+
+Each server process normally loads and derives all of the tables itself, so
+running several workers (e.g., with gunicorn) multiplies both the memory used
+and the work done on every refresh. In shared mode, one process writes the
+tables to uncompressed Arrow IPC files in a shared directory, and every process
+memory-maps them: numeric and time columns without missing values are used in
+place, so the operating system keeps a single copy of them in its page cache.
+
+Each write goes to a new generation directory and is then published by
+replacing the `current.json` pointer file, which processes check before
+handling each request to pick up refreshes done by any other process.
+"""
+
+import contextlib
+import fcntl
+import json
+import os
+import shutil
+import uuid
+
+from typing import *
+import pandas as pd  # type: ignore
+import pyarrow as pa  # type: ignore
+
+from summaries import restore_missing_strings
+
+pointer_name = "current.json"
+
+
+def pointer_path(directory: str) -> str:
+    return os.path.join(directory, pointer_name)
+
+
+@contextlib.contextmanager
+def exclusive(directory: str):
+    """Hold the directory's lock, so only one process (re)loads the data at a time."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def pointer_stamp(directory: str) -> Optional[Tuple[int, int]]:
+    """Changes whenever a new generation is published; cheaper to check than reading the pointer."""
+    try:
+        stat = os.stat(pointer_path(directory))
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def current(directory: str) -> Optional[Dict[str, Any]]:
+    """The published generation's metadata ("generation", "version", "instance" and "sources"), if any."""
+    try:
+        with open(pointer_path(directory)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def publish(
+    directory: str, version: int, tables: Dict[str, pd.DataFrame], sources: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Write `tables` as a new generation and point to it; call within `exclusive`.
+
+    `sources` describes the data the tables were loaded from, for telling whether
+    they're still up to date. Returns the new generation's metadata.
+    """
+    previous = current(directory)
+    generation = f"v{version}-{uuid.uuid4().hex[:8]}"
+    path = os.path.join(directory, generation)
+    os.makedirs(path)
+    for name, frame in tables.items():
+        table = pa.Table.from_pandas(frame)
+        with pa.OSFile(os.path.join(path, f"{name}.arrow"), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    meta = {
+        "generation": generation,
+        "version": version,
+        # ETags stay valid across processes and restarts for as long as the shared directory does
+        "instance": uuid.uuid4().hex if previous is None else previous["instance"],
+        "sources": sources,
+    }
+    with open(pointer_path(directory) + ".tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(pointer_path(directory) + ".tmp", pointer_path(directory))
+    remove_old_generations(directory, keep={generation, None if previous is None else previous["generation"]})
+    return meta
+
+
+def remove_old_generations(directory: str, keep: Set[Optional[str]]):
+    # processes which mapped these keep their mappings even after the files are removed
+    for entry in os.listdir(directory):
+        path = os.path.join(directory, entry)
+        if entry not in keep and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def read_table(path: str) -> pd.DataFrame:
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    # one block per column, so that columns aren't copied to consolidate them
+    return restore_missing_strings(table.to_pandas(split_blocks=True))
+
+
+def load(directory: str, meta: Dict[str, Any]) -> Dict[str, pd.DataFrame]:
+    """Map all tables of the generation described by `meta`."""
+    path = os.path.join(directory, meta["generation"])
+    return {
+        entry[: -len(".arrow")]: read_table(os.path.join(path, entry))
+        for entry in os.listdir(path)
+        if entry.endswith(".arrow")
+    }
@@ -0,0 +1,171 @@
+"""A cache for rendered graph specs.
+
+Rendering a graph (building the Altair chart and serializing it to JSON) takes
+far longer than serving it, and the result only changes when the data does. So
+rendered specs are cached under a key including the data version, which
+`read_data` bumps on every load; entries for older versions just age out.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from typing import *
+
+
+class _Entry(NamedTuple):
+    spec: str
+    expires_at: float
+    # the spec's encodings (e.g., compressed for responses) by name, added as they're asked for
+    encoded: Dict[str, bytes]
+
+    def size(self) -> int:
+        return len(self.spec) + sum(len(data) for data in self.encoded.values())
+
+
+class _PendingRender:
+    def __init__(self):
+        self.done = threading.Event()
+        self.spec: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+
+class SpecCache:
+    """A thread-safe LRU cache of rendered specs.
+
+    It holds at most `max_entries` specs, totalling at most `max_bytes` characters
+    (if given, including their encodings' bytes), each for at most `ttl` seconds (if given). Concurrent renders of the
+    same missing spec are coalesced: one request renders it and the rest wait for it.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: Optional[int] = None, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._size = 0
+        self._pending: Dict[Hashable, _PendingRender] = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: Hashable) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry.spec
+
+    def _remove(self, key: Hashable):
+        self._size -= self._entries.pop(key).size()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self._size > self.max_bytes
+        ):
+            self._remove(next(iter(self._entries)))
+
+    def get(self, key: Hashable, fallback_key: Optional[Hashable] = None) -> Optional[str]:
+        """The spec cached for `key`, or else the one for `fallback_key` (if given)."""
+        found = self.get_with_key(key, fallback_key)
+        return None if found is None else found[1]
+
+    def get_with_key(
+        self, key: Hashable, fallback_key: Optional[Hashable] = None
+    ) -> Optional[Tuple[Hashable, str]]:
+        """Like `get`, but also returns which of the keys the spec was cached for."""
+        with self._lock:
+            for k in (key, fallback_key):
+                if k is None:
+                    continue
+                spec = self._lookup(k)
+                if spec is not None:
+                    self.hits += 1
+                    return k, spec
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, spec: str):
+        if self.max_entries <= 0 or (self.max_bytes is not None and len(spec) > self.max_bytes):
+            return
+        expires_at = float("inf") if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(spec, expires_at, {})
+            self._size += len(spec)
+            self._evict()
+
+    def encoded(self, key: Hashable, encoding: str, encode: Callable[[str], bytes]) -> Optional[bytes]:
+        """The spec cached for `key` encoded by `encode`, which is kept with it under the name `encoding`.
+
+        Returns None if no spec is cached for `key`.
+        """
+        with self._lock:
+            if self._lookup(key) is None:
+                return None
+            entry = self._entries[key]
+            data = entry.encoded.get(encoding)
+        if data is not None:
+            return data
+        data = encode(entry.spec)
+        with self._lock:
+            # unless the entry was replaced or evicted meanwhile
+            if self._entries.get(key) is entry and encoding not in entry.encoded:
+                entry.encoded[encoding] = data
+                self._size += len(data)
+                self._evict()
+        return data
+
+    def get_or_render(
+        self, key: Hashable, render: Callable[[], str], fallback_key: Optional[Hashable] = None
+    ) -> Tuple[Hashable, str]:
+        """The cached or newly rendered spec, along with the key it's for (`key` or `fallback_key`)."""
+        found = self.get_with_key(key, fallback_key)
+        if found is not None:
+            return found
+        with self._lock:
+            pending = self._pending.get(key)
+            is_renderer = pending is None
+            if is_renderer:
+                pending = self._pending[key] = _PendingRender()
+            else:
+                self.coalesced += 1
+        if not is_renderer:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return key, cast(str, pending.spec)
+        try:
+            pending.spec = render()
+            self.put(key, pending.spec)
+            return key, pending.spec
+        except BaseException as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max entries": self.max_entries,
+                "size": self._size,
+                "max size": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+            }
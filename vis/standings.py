@@ -0,0 +1,95 @@
+"""Running leaderboard standings.
+
+Every judged session earns rewards (log scores; see `derived.rewards`) for its
+judge and for its room's honest and dishonest debaters. `Standings` keeps the
+sum and count of each kind of reward per participant, so a participant's
+standing is a dictionary lookup rather than a scan of the leaderboard. On
+incremental refreshes, it's updated from the leaderboard rows of the changed
+rooms alone: their old rows are subtracted and their new rows added. The
+standings of a time window are derived from them the same way, by subtracting
+the rows outside it (see `window_view` in server.py).
+"""
+
+from typing import *
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+# Reward column of the leaderboard -> column naming the participant who earns it.
+reward_participants = {
+    "Judge reward": "Participant",
+    "Honest debater reward": "Honest debater",
+    "Dishonest debater reward": "Dishonest debater",
+}
+
+
+class Standing(NamedTuple):
+    total: float = 0.0
+    count: int = 0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count > 0 else float("nan")
+
+
+def reward_sums(leaderboard: pd.DataFrame, reward: str) -> Dict[str, Standing]:
+    """Sum and count of the (non-missing) `reward`s of each participant in `leaderboard`."""
+    earned = pd.DataFrame({
+        "participant": np.asarray(leaderboard[reward_participants[reward]], dtype=object),
+        "reward": leaderboard[reward].values.astype(float),
+    }).dropna()
+    sums = earned.groupby("participant", sort=False)["reward"].agg(["sum", "count"])
+    return {participant: Standing(total, int(count)) for participant, total, count in sums.itertuples()}
+
+
+class Standings:
+    """Sums and counts of each reward per participant.
+
+    Instances aren't modified once built, so snapshots can share them; `updated` returns a new one,
+    which only copies the (small) dictionaries of standings and recomputes those of changed rows.
+    """
+
+    def __init__(self, by_reward: Dict[str, Dict[str, Standing]]):
+        self.by_reward = by_reward
+
+    @classmethod
+    def from_leaderboard(cls, leaderboard: pd.DataFrame) -> "Standings":
+        return cls({reward: reward_sums(leaderboard, reward) for reward in reward_participants})
+
+    @classmethod
+    def from_table(cls, table: pd.DataFrame) -> "Standings":
+        """The standings listed in `table`, as made by `table()`."""
+        by_reward: Dict[str, Dict[str, Standing]] = {reward: {} for reward in reward_participants}
+        for participant, reward, total, count in zip(table["Participant"], table["Reward"], table["total"], table["count"]):
+            by_reward[reward][participant] = Standing(float(total), int(count))
+        return cls(by_reward)
+
+    def updated(self, removed: pd.DataFrame, added: pd.DataFrame) -> "Standings":
+        """These standings without the rewards of the `removed` leaderboard rows and with those of the `added` ones."""
+        by_reward = {}
+        for reward, standings in self.by_reward.items():
+            standings = dict(standings)
+            for rows, sign in [(removed, -1), (added, 1)]:
+                for participant, change in reward_sums(rows, reward).items():
+                    total, count = standings.get(participant, Standing())
+                    standings[participant] = Standing(total + sign * change.total, count + sign * change.count)
+            # dropping emptied standings also drops any rounding error left in their totals
+            by_reward[reward] = {participant: standing for participant, standing in standings.items() if standing.count > 0}
+        return Standings(by_reward)
+
+    def standing(self, participant: str, reward: str) -> Standing:
+        return self.by_reward[reward].get(participant, Standing())
+
+    def participant(self, participant: str) -> Dict[str, Standing]:
+        """The standing of `participant` for each reward."""
+        return {reward: self.standing(participant, reward) for reward in self.by_reward}
+
+    def table(self) -> pd.DataFrame:
+        """One row per participant and reward, with the "total", "count" and "mean" of their rewards."""
+        return pd.DataFrame(
+            [
+                (participant, reward, standing.total, standing.count, standing.mean)
+                for reward, standings in self.by_reward.items()
+                for participant, standing in sorted(standings.items())
+            ],
+            columns=["Participant", "Reward", "total", "count", "mean"],
+        )
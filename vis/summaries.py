@@ -0,0 +1,172 @@
+"""Loading the CSV summaries written by the Scala `DataSummarizer`.
+
+Parsing the summaries (especially `turns.csv`, which holds the full speech and
+quote text) dominates the time it takes to (re)load the analytics data. So each
+summary is cached in columnar (Feather) form next to the CSVs, with its time
+columns already converted. A cached table is reused as long as the size and
+modification time of its source CSV haven't changed.
+
+Summaries can also be read with only some of their columns (e.g., leaving out
+the free text of the turns), in which case the other columns are never
+converted or cached, and each such projection is cached separately.
+"""
+
+import hashlib
+import json
+import os
+
+from typing import *
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+try:
+    import pyarrow  # type: ignore # noqa: F401
+    has_pyarrow = True
+except ImportError:
+    has_pyarrow = False
+
+# Bump this when changing how the cached tables are produced.
+cache_format_version = 2
+
+
+def summaries_dir(data_dir: str) -> str:
+    return os.path.join(data_dir, "official/summaries")
+
+
+def cache_dir(data_dir: str) -> str:
+    return os.path.join(summaries_dir(data_dir), "cache")
+
+
+def source_signature(path: str) -> Dict[str, int]:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def parse_summary(
+    path: str,
+    time_columns: Sequence[str] = (),
+    columns: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    frame = pd.read_csv(
+        path, keep_default_na=True, usecols=None if columns is None else lambda column: column in columns
+    )
+    for column in time_columns:
+        if column in frame.columns:
+            frame[column] = pd.to_datetime(frame[column], unit="ms")
+    return frame
+
+
+def read_summary(
+    data_dir: str,
+    name: str,
+    time_columns: Sequence[str] = (),
+    columns: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """Read `<name>.csv` from the summaries directory, using the columnar cache when it's fresh.
+
+    Only `columns` (by default, all) are read; those missing from the summary are left out.
+    `time_columns` hold millisecond timestamps and are converted to datetimes.
+    Without pyarrow installed, this just parses the CSV.
+    """
+    source_path = os.path.join(summaries_dir(data_dir), f"{name}.csv")
+    if not has_pyarrow:
+        return parse_summary(source_path, time_columns, columns)
+
+    projection = {"columns": None if columns is None else sorted(columns)}
+    cache_name = name
+    if columns is not None:
+        cache_name += "." + hashlib.sha1(json.dumps(projection).encode()).hexdigest()[:8]
+    cache_path = os.path.join(cache_dir(data_dir), f"{cache_name}.feather")
+    meta_path = os.path.join(cache_dir(data_dir), f"{cache_name}.json")
+    meta = {
+        "format": cache_format_version,
+        "source": source_signature(source_path),
+        "time columns": list(time_columns),
+        **projection,
+    }
+
+    if os.path.exists(cache_path) and os.path.exists(meta_path):
+        try:
+            with open(meta_path) as f:
+                cached_meta = json.load(f)
+            if cached_meta == meta:
+                return read_cached_table(cache_path)
+        except Exception as e:
+            print(f"Ignoring unreadable cache for {name}: {e}")
+
+    frame = parse_summary(source_path, time_columns, columns)
+    try:
+        write_cached_table(frame, cache_path, meta_path, meta)
+        print(f"Rebuilt summary cache for {name}")
+    except Exception as e:
+        print(f"Could not write summary cache for {name}: {e}")
+    return frame
+
+
+def read_cached_table(path: str) -> pd.DataFrame:
+    return restore_missing_strings(pd.read_feather(path))
+
+
+def restore_missing_strings(frame: pd.DataFrame) -> pd.DataFrame:
+    # Arrow gives back missing strings as None, whereas read_csv gives NaN.
+    # (Column by column, so the other columns aren't consolidated into copies.)
+    for column in frame.select_dtypes("object").columns:
+        frame[column] = frame[column].fillna(np.nan)
+    return frame
+
+
+def write_cached_table(frame: pd.DataFrame, path: str, meta_path: str, meta: Dict[str, Any]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # write to temporary files first so a concurrent reader never sees a partial table
+    frame.to_feather(path + ".tmp")
+    os.replace(path + ".tmp", path)
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def room_fingerprints(debates: pd.DataFrame, sessions: pd.DataFrame) -> pd.DataFrame:
+    """Per-room change markers: the "Last modified time" of each debate and a hash of its summary rows.
+
+    The last modified time only moves when rounds are added, so the hash catches
+    other changes (e.g., feedback surveys or offline judge assignments).
+    """
+    rooms = debates["Room name"].values
+    session_hashes = pd.util.hash_pandas_object(sessions, index=False).groupby(
+        sessions["Room name"].values
+    ).sum()
+    return pd.DataFrame(
+        {
+            "Last modified time": debates["Last modified time"].fillna(-1).values,
+            "Debate hash": pd.util.hash_pandas_object(debates, index=False).values,
+            "Sessions hash": session_hashes.reindex(rooms, fill_value=0).values,
+        },
+        index=rooms,
+    )
+
+
+def changed_rooms(old: pd.DataFrame, new: pd.DataFrame) -> Set[str]:
+    """Rooms that were added, removed, or modified between two `room_fingerprints` tables."""
+    removed = old.index.difference(new.index)
+    previous = old.reindex(new.index)
+    modified = new.index[(previous != new).any(axis=1)]
+    return set(removed) | set(modified)
+
+
+def replace_rooms(frame: pd.DataFrame, updated_rows: pd.DataFrame, rooms: Set[str]) -> pd.DataFrame:
+    """Replace all rows of `frame` belonging to `rooms` with `updated_rows`.
+
+    Categorical columns of `frame` are recoded to the (extended) dictionaries of `updated_rows`,
+    so that they stay categorical.
+    """
+    if len(rooms) == 0:
+        return frame
+    kept = frame[~frame["Room name"].isin(rooms)]
+    recode = {
+        name: updated_rows[name].dtype for name in kept.columns
+        if name in updated_rows.columns and isinstance(kept[name].dtype, pd.CategoricalDtype)
+        and isinstance(updated_rows[name].dtype, pd.CategoricalDtype) and kept[name].dtype != updated_rows[name].dtype
+    }
+    if len(recode) > 0:
+        kept = kept.assign(**{name: kept[name].cat.set_categories(dtype.categories) for name, dtype in recode.items()})
+    return pd.concat([kept, updated_rows], ignore_index=True)
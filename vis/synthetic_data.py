@@ -0,0 +1,271 @@
+"""Synthetic summaries for benchmarking the analytics server.
+
+Writes `debates.csv`, `sessions.csv`, `turns.csv` and `sample-rooms.csv` with
+the columns the Scala `DataSummarizer` writes, for any number of rooms, so
+the server can be run (and timed; see `benchmark.py`) at larger scales than
+the real data. For example:
+
+    python vis/synthetic_data.py --data-dir scratch/synthetic --rooms 30000
+
+writes the summaries to `scratch/synthetic/official/summaries`, which the
+server reads with `DATA_DIR=scratch/synthetic`.
+"""
+
+import argparse
+import csv
+import os
+import random
+
+from typing import *
+
+import summaries
+
+debate_columns = [
+    "Creation time", "Start time", "Room name", "Is offline", "Is single debater", "Has honest debater",
+    "Has dishonest debater", "Article ID", "Story length (tok)", "Story length (char)", "Question",
+    "Speed annotator accuracy", "Untimed annotator answerability", "Untimed annotator context",
+    "Untimed annotator context (rounded)", "Correct answer", "Wrong answer", "Honest debater",
+    "Dishonest debater", "Debater A", "Debater B", "Judge", "Num offline judges", "Final probability correct",
+    "Average offline probability correct", "Number of debate rounds", "Number of continues", "Status",
+    "Is over", "End time", "Last modified time",
+]
+
+turn_columns = [
+    "Room name", "Room start time", "Speech time", "Participant", "Role", "Role (honest/dishonest)",
+    "Round index", "Num previous judging rounds", "Num previous debating rounds", "Participant text",
+    "Participant quote", "Participant quote span", "Text length", "Quote length (tok)", "Probability correct",
+]
+
+comparative_likert_questions = [
+    "clarity", "clash", "evidence in debate", "evidence in story", "evidence use", "facts versus semantics",
+    "factual accuracy", "factual informativeness (comparative)", "judge adaptation",
+]
+likert_questions = [
+    "clarity (single)", "evidence in debate (single)", "evidence use (single)", "facts versus semantics (single)",
+    "factual accuracy (single)", "factual informativeness (total)", "judge adaptation (single)", "judge reasoning",
+    "subjective correctness",
+]
+free_text_questions = ["interface", "judge strategies", "other", "other factors", "protocol", "reason for outcome"]
+identity_guess_roles = ["Debater A", "Debater B", "Judge"]
+
+session_columns = [
+    "Room name", "Room start time", "Participant", "Role", "Is turn", "Is over", "Number of judge continues",
+    "Final probability correct", "Offline judging start time", "Offline judging end time",
+] + [f"{q}.{i}" for q in comparative_likert_questions for i in (1, 2)] + likert_questions + free_text_questions + [
+    f"identity guesses.{role}" for role in identity_guess_roles
+]
+
+words = "the story says that he went to the station before it was too late and never came back".split()
+
+
+def text(rng: random.Random, num_words: int) -> str:
+    return " ".join(rng.choice(words) for _ in range(num_words))
+
+
+def flag(value: bool) -> str:
+    return "true" if value else "false"
+
+
+def probability(rng: random.Random) -> float:
+    return round(rng.betavariate(3, 2), 2)
+
+
+def generate_room(rng: random.Random, index: int, people: List[str], start_time: int):
+    """The debate, session, turn and sample rows of one synthetic room."""
+    room = f"synthetic-{index}"
+    created = start_time + index * 600_000
+    is_offline = rng.random() < 0.15
+    is_single = rng.random() < 0.3
+    has_ai = rng.random() < 0.2
+    honest, dishonest = rng.sample(people, 2)
+    if has_ai:
+        if rng.random() < 0.5:
+            honest = "GPT-4"
+        else:
+            dishonest = "GPT-4"
+    if is_single:
+        if rng.random() < 0.5:
+            honest = ""
+        else:
+            dishonest = ""
+    honest_is_a = rng.random() < 0.5
+    debater_a, debater_b = (honest, dishonest) if honest_is_a else (dishonest, honest)
+    others = [p for p in people if p not in (honest, dishonest)]
+    judge = "" if is_offline else rng.choice(others)
+    offline_judges = rng.sample([p for p in others if p != judge], rng.choice([0, 0, 1, 2]))
+    if is_offline and len(offline_judges) == 0:
+        offline_judges = [rng.choice(others)]
+    num_rounds = rng.randint(1, 8)
+    is_over = rng.random() < 0.9
+    end_time = created + num_rounds * 3_600_000 if is_over else None
+    final_probability = probability(rng) if is_over and not is_offline else None
+    offline_probabilities = {p: probability(rng) for p in offline_judges if is_over}
+
+    debate = {
+        "Creation time": created,
+        "Start time": created + 60_000,
+        "Room name": room,
+        "Is offline": flag(is_offline),
+        "Is single debater": flag(is_single),
+        "Has honest debater": flag(honest != ""),
+        "Has dishonest debater": flag(dishonest != ""),
+        "Article ID": f"article-{index % 97}",
+        "Story length (tok)": 5000 + index % 2000,
+        "Story length (char)": 25000 + index % 10000,
+        "Question": f"Question {index % 211}?",
+        "Speed annotator accuracy": rng.choice(["0.0", "0.2", "0.4", "0.6", ""]),
+        "Untimed annotator answerability": rng.choice(["1.0", "0.5", ""]),
+        "Untimed annotator context": rng.choice([1.0, 1.5, 2.0, 2.5, 3.0, 4.0]),
+        "Untimed annotator context (rounded)": rng.choice([1, 2, 3, 4]),
+        "Correct answer": "the correct answer",
+        "Wrong answer": "the wrong answer",
+        "Honest debater": honest,
+        "Dishonest debater": dishonest,
+        "Debater A": debater_a,
+        "Debater B": debater_b,
+        "Judge": judge,
+        "Num offline judges": len(offline_judges),
+        "Final probability correct": final_probability if final_probability is not None else "",
+        "Average offline probability correct": (
+            round(sum(offline_probabilities.values()) / len(offline_probabilities), 4) if offline_probabilities else ""
+        ),
+        "Number of debate rounds": num_rounds,
+        "Number of continues": num_rounds - 1,
+        "Status": "complete" if is_over else "in progress",
+        "Is over": flag(is_over),
+        "End time": end_time if end_time is not None else "",
+        "Last modified time": end_time if end_time is not None else created + num_rounds * 1_800_000,
+    }
+
+    roles = [(role, p) for role, p in [("Debater A", debater_a), ("Debater B", debater_b), ("Judge", judge)] if p != ""]
+    roles += [("Offline Judge", p) for p in offline_judges]
+    sessions = []
+    for role, participant in roles:
+        is_judge = role in ("Judge", "Offline Judge")
+        if role == "Judge":
+            prob_correct = final_probability
+        elif role == "Offline Judge":
+            prob_correct = offline_probabilities.get(participant)
+        else:
+            prob_correct = None
+        session = {
+            "Room name": room,
+            "Room start time": created,
+            "Participant": participant,
+            "Role": role,
+            "Is turn": flag(not is_over and rng.random() < 0.3),
+            "Is over": flag(is_over),
+            "Number of judge continues": num_rounds - 1 if is_judge else "",
+            "Final probability correct": prob_correct if prob_correct is not None else "",
+            "Offline judging start time": created + 86_400_000 if role == "Offline Judge" else "",
+            "Offline judging end time": created + 90_000_000 if role == "Offline Judge" and is_over else "",
+        }
+        answered = is_over and rng.random() < 0.7
+        for question in comparative_likert_questions:
+            for i in (1, 2):
+                session[f"{question}.{i}"] = rng.randint(0, 4) if answered and not is_single else ""
+        for question in likert_questions:
+            session[question] = rng.randint(0, 4) if answered else ""
+        for question in free_text_questions:
+            session[question] = text(rng, rng.randint(5, 40)) if answered and rng.random() < 0.5 else ""
+        for guessed_role in identity_guess_roles:
+            session[f"identity guesses.{guessed_role}"] = (
+                rng.choice(people) if answered and guessed_role != role and rng.random() < 0.5 else ""
+            )
+        sessions.append(session)
+
+    turns = []
+    judging_rounds = 0
+    for round_index in range(num_rounds):
+        speech_time = created + round_index * 3_600_000
+        for role, participant in roles:
+            if role == "Offline Judge":
+                continue
+            is_judge = role == "Judge"
+            if is_judge:
+                role_honesty = role
+            else:
+                role_honesty = "Honest debater" if participant == honest else "Dishonest debater"
+            num_quotes = 0 if is_judge else rng.randint(0, 4)
+            speech = text(rng, rng.randint(20, 200))
+            turns.append({
+                "Room name": room,
+                "Room start time": created,
+                "Speech time": speech_time + (1000 if is_judge else 0),
+                "Participant": participant,
+                "Role": role,
+                "Role (honest/dishonest)": role_honesty,
+                "Round index": round_index,
+                "Num previous judging rounds": judging_rounds,
+                "Num previous debating rounds": round_index,
+                "Participant text": speech,
+                "Participant quote": " [[input text]] ".join(text(rng, rng.randint(5, 30)) for _ in range(num_quotes)),
+                "Participant quote span": " ".join(f"<<{i * 100}-{i * 100 + 40}>>" for i in range(num_quotes)),
+                "Text length": len(speech),
+                "Quote length (tok)": num_quotes * 20,
+                "Probability correct": probability(rng) if is_judge else "",
+            })
+        if judge != "":
+            judging_rounds += 1
+    for participant, prob_correct in offline_probabilities.items():
+        turns.append({
+            **{c: "" for c in turn_columns},
+            "Room name": room,
+            "Room start time": created,
+            "Speech time": created + 86_400_000,
+            "Participant": participant,
+            "Role": "Offline Judge",
+            "Role (honest/dishonest)": "Offline Judge",
+            "Round index": num_rounds,
+            "Num previous judging rounds": judging_rounds,
+            "Num previous debating rounds": num_rounds,
+            "Participant text": text(rng, rng.randint(5, 50)),
+            "Text length": 0,
+            "Quote length (tok)": 0,
+            "Probability correct": prob_correct,
+        })
+
+    sample = [{"Room name": room, "Judge": judge}] if judge != "" and is_over and rng.random() < 0.5 else []
+    return debate, sessions, turns, sample
+
+
+def generate(data_dir: str, num_rooms: int, seed: int = 0, start_time: int = 1_680_000_000_000):
+    """Write synthetic summaries for `num_rooms` rooms to the summaries directory of `data_dir`."""
+    rng = random.Random(seed)
+    people = [f"Participant {i}" for i in range(max(12, num_rooms // 20))]
+    out_dir = summaries.summaries_dir(data_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    files = {
+        name: open(os.path.join(out_dir, f"{name}.csv"), "w", newline="")
+        for name in ["debates", "sessions", "turns", "sample-rooms"]
+    }
+    try:
+        writers = {
+            name: csv.DictWriter(files[name], fieldnames=columns)
+            for name, columns in [
+                ("debates", debate_columns),
+                ("sessions", session_columns),
+                ("turns", turn_columns),
+                ("sample-rooms", ["Room name", "Judge"]),
+            ]
+        }
+        for writer in writers.values():
+            writer.writeheader()
+        for index in range(num_rooms):
+            debate, sessions, turns, sample = generate_room(rng, index, people, start_time)
+            writers["debates"].writerow(debate)
+            writers["sessions"].writerows(sessions)
+            writers["turns"].writerows(turns)
+            writers["sample-rooms"].writerows(sample)
+    finally:
+        for f in files.values():
+            f.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic debate summaries for benchmarking the analytics server.")
+    parser.add_argument("--data-dir", required=True, help="save directory to write `official/summaries` under")
+    parser.add_argument("--rooms", type=int, default=1000, help="number of debate rooms")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate(args.data_dir, args.rooms, args.seed)
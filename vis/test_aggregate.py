@@ -0,0 +1,115 @@
+"""Checks the server-side aggregation against hand-computed tables and per-group computations."""
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+import aggregate
+
+
+def sessions():
+    return pd.DataFrame({
+        "Setting": ["A", "A", "A", "A", "B", "B"],
+        "Final probability correct": [0.9, 0.9, 0.5, 0.2, 0.7, np.nan],
+        "Rounds": [1, 3, 2, 2, 4, np.nan],
+    })
+
+
+def by_segment(table):
+    return table.set_index(["Setting", "Final probability correct"]).sort_index()
+
+
+def test_accuracy_table_matches_hand_computed():
+    table = by_segment(aggregate.accuracy_table(
+        sessions(), ["Setting"], "Final probability correct", "Final probability correct", sort_fields=["Rounds"]
+    ))
+    expected = pd.DataFrame({
+        "Setting": ["A", "A", "A", "B", "B"],
+        "Final probability correct": [0.2, 0.5, 0.9, 0.7, np.nan],
+        "count": [1, 1, 2, 1, 1],
+        "total": [4, 4, 4, 2, 2],
+        # A: wins 1, 1, 0.5 (a tie) and 0; B: 1 and 0 (missing counts as 0)
+        "mean": [0.625, 0.625, 0.625, 0.5, 0.5],
+        "Rounds": [2.0, 2.0, 2.0, 4.0, 4.0],
+        "proportion": [0.25, 0.25, 0.5, 0.5, 0.5],
+    })
+    pd.testing.assert_frame_equal(table[["count", "total", "mean", "Rounds", "proportion"]], by_segment(expected), check_dtype=False)
+    assert (table["ci0"] <= table["mean"]).all() and (table["mean"] <= table["ci1"]).all()
+
+
+def test_inverted_accuracy_table():
+    table = by_segment(aggregate.accuracy_table(
+        sessions(), ["Setting"], "Final probability correct", "Final probability correct", invert=True
+    ))
+    # wins when the judge's probability is at most 0.5, ties and missing ones included
+    assert table.loc["A", "mean"].tolist() == [0.5, 0.5, 0.5]
+    assert table.loc["B", "mean"].tolist() == [0.5, 0.5]
+
+
+def test_accuracy_table_matches_per_group_computation():
+    rng = np.random.default_rng(0)
+    source = pd.DataFrame({
+        "Setting": rng.choice(["A", "B", "C", None], size=400),
+        "Role": pd.Categorical(rng.choice(["Judge", "Offline Judge"], size=400)),
+        "Final probability correct": rng.choice([0.0, 0.1, 0.5, 0.8, 1.0, np.nan], size=400),
+    })
+    groups = ["Setting", "Role"]
+    table = aggregate.accuracy_table(source, groups, "Final probability correct", "Final probability correct")
+    expected_rows = []
+    for key, group in source.astype({"Role": object}).groupby(groups, dropna=False):
+        prob = group["Final probability correct"].fillna(0.0)
+        win_rate = np.where(prob > 0.5, 1.0, np.where(prob == 0.5, 0.5, 0.0)).mean()
+        for value, count in group["Final probability correct"].value_counts(dropna=False).items():
+            expected_rows.append((*key, value, count, len(group), win_rate))
+    expected = pd.DataFrame(expected_rows, columns=groups + ["Final probability correct", "count", "total", "mean"])
+    expected["proportion"] = expected["count"] / expected["total"]
+
+    def normalized(frame):
+        frame = frame.astype({"Setting": object, "Role": object}).fillna({"Setting": "(none)"})
+        frame = frame.set_index(groups + ["Final probability correct"]).sort_index()
+        return frame[["count", "total", "mean", "proportion"]]
+
+    pd.testing.assert_frame_equal(normalized(table), normalized(expected), check_dtype=False)
+
+
+def test_mean_with_ci_counts_and_bounds():
+    frame = pd.DataFrame({
+        "group": ["low"] * 30 + ["high"] * 30 + ["constant"] * 5 + ["missing"] * 2,
+        "value": list(np.linspace(0, 1, 30)) + list(np.linspace(100, 101, 30)) + [7.0] * 5 + [np.nan] * 2,
+    })
+    stats = aggregate.mean_with_ci(frame, "value", ["group"]).set_index("group")
+    assert stats.loc["low", "count"] == 30 and np.isclose(stats.loc["low", "mean"], 0.5)
+    assert stats.loc["missing", "count"] == 0
+    assert np.isnan(stats.loc["missing", ["mean", "ci0", "ci1"]].astype(float)).all()
+    assert stats.loc["constant", "ci0"] == stats.loc["constant", "ci1"] == 7.0
+    # each group only draws its own values
+    assert 0 <= stats.loc["low", "ci0"] < 0.5 < stats.loc["low", "ci1"] <= 1
+    assert 100 <= stats.loc["high", "ci0"] < 100.5 < stats.loc["high", "ci1"] <= 101
+
+
+def test_bootstrap_matches_normal_interval():
+    rng = np.random.default_rng(1)
+    values = rng.normal(3.0, 2.0, size=2000)
+    lower, upper = aggregate.bootstrap_mean_ci(values, np.zeros(len(values), dtype=np.int64), 1)
+    margin = 1.96 * values.std() / np.sqrt(len(values))
+    assert np.isclose(lower[0], values.mean() - margin, atol=0.2 * margin)
+    assert np.isclose(upper[0], values.mean() + margin, atol=0.2 * margin)
+
+
+def test_bootstrap_is_deterministic():
+    rng = np.random.default_rng(2)
+    values = rng.random(500)
+    group_ids = rng.integers(3, size=500)
+    first = aggregate.bootstrap_mean_ci(values, group_ids, 4)
+    second = aggregate.bootstrap_mean_ci(values, group_ids, 4)
+    np.testing.assert_array_equal(first, second)
+    assert np.isnan(first[0][3]) and np.isnan(first[1][3])
+    other_seed = aggregate.bootstrap_mean_ci(values, group_ids, 4, seed=1)
+    assert not np.array_equal(first[0][:3], other_seed[0][:3])
+
+    # the same however many resamples are drawn in each batch
+    aggregate_batch = aggregate.bootstrap_batch_values
+    try:
+        aggregate.bootstrap_batch_values = 1000
+        np.testing.assert_array_equal(aggregate.bootstrap_mean_ci(values, group_ids, 4), first)
+    finally:
+        aggregate.bootstrap_batch_values = aggregate_batch
@@ -0,0 +1,80 @@
+"""Checks the per-bin judgment counts against a full recount and against binning each judgment."""
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+import aggregate
+import calibration
+import derived
+
+people = ["Alice", "Bob", "Carol", "GPT-4"]
+roles = ["Judge", "Offline Judge"]
+settings = ["Human Debate", "AI Debate", "Human Consultancy", "AI Consultancy"]
+
+
+def make_turns(rooms, seed=0, per_room=8):
+    rng = np.random.default_rng(seed)
+    size = len(rooms) * per_room
+    # include exact ties, bin edges and missing values
+    probs = rng.choice([0.5, 0.05, 0.95, 0.1, 0.25, 0.75, 1.0, 0.0], size=size)
+    probs = np.where(rng.random(size) < 0.5, rng.random(size), probs)
+    probs = np.where(rng.random(size) < 0.15, np.nan, probs)
+    return pd.DataFrame({
+        "Room name": np.repeat(rooms, per_room),
+        "Participant": rng.choice(people, size=size),
+        "Role": rng.choice(roles, size=size),
+        "Setting": rng.choice(settings, size=size),
+        "Num previous debating rounds": rng.integers(0, 4, size=size),
+        "Probability correct": probs,
+    })
+
+
+def count_turns(turns):
+    return calibration.calibration_counts(turns, "Probability correct", calibration.turn_key_columns)
+
+
+def test_incremental_update_matches_full_recount():
+    rooms = [f"room-{i}" for i in range(40)]
+    old = make_turns(rooms)
+    counts = calibration.sorted_counts(count_turns(old))
+
+    # rewrite some rooms, remove one and add one (with a new participant)
+    changed = {"room-3", "room-17", "room-18", "room-39", "room-new"}
+    updated = make_turns(["room-3", "room-17", "room-18", "room-new"], seed=1)
+    updated.loc[updated["Room name"] == "room-new", "Participant"] = "Dave"
+    new = pd.concat([old[~old["Room name"].isin(changed)], updated], ignore_index=True)
+
+    result = calibration.update_counts(
+        counts,
+        count_turns(old[old["Room name"].isin(changed)]),
+        count_turns(new[new["Room name"].isin(changed)]),
+    )
+    expected = calibration.sorted_counts(count_turns(new))
+    assert (result["count"] > 0).all()
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_update_without_changes_keeps_counts():
+    counts = calibration.sorted_counts(count_turns(make_turns(["room-0", "room-1"])))
+    empty = count_turns(make_turns([]))
+    assert calibration.update_counts(counts, empty, empty) is counts
+
+
+def test_tables_match_per_turn_binning():
+    turns = make_turns([f"room-{i}" for i in range(60)], seed=2)
+    counts = count_turns(turns)
+    judged = turns[turns["Probability correct"].notna()]
+    confidence = derived.prediction_confidence(judged["Probability correct"])
+    for bin_size in calibration.bin_sizes:
+        table = calibration.calibration_table(counts, bin_size, groups=["Role"]).set_index(["Role", "Confidence bin"])
+
+        # as the charts did before: label each judgment with its bin, then count and average per bin
+        binned = judged.assign(**{
+            "Confidence bin": derived.confidence_bins(confidence, bin_size),
+            "correct": aggregate.outcome_value(judged["Probability correct"]),
+        })
+        expected = binned.groupby(["Role", "Confidence bin"])["correct"].agg(["count", "mean"])
+
+        assert table["count"].sum() == len(judged)
+        pd.testing.assert_frame_equal(table[["count", "mean"]].sort_index(), expected, check_names=False)
+        assert (table["ci0"] <= table["mean"]).all() and (table["mean"] <= table["ci1"]).all()
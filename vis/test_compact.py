@@ -0,0 +1,104 @@
+"""Checks that compacted tables hold the same values, missing values and order as the uncompacted ones."""
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+import aggregate
+import compact
+
+people = ["Carol", "alice", "Bob", "Émile", np.nan]
+
+
+def make_tables(seed=0, size=200):
+    rng = np.random.default_rng(seed)
+    sessions = pd.DataFrame({
+        "Room name": [f"room-{i}" for i in rng.integers(40, size=size)],
+        "Participant": rng.choice(np.array(people, dtype=object), size=size),
+        "Role": rng.choice(["Judge", "Debater A", "Debater B"], size=size),
+        # free text, which stays as strings
+        "Comment": [f"comment {i}" for i in range(size)],
+        "Final probability correct": np.where(rng.random(size) < 0.2, np.nan, rng.random(size)),
+        "Number of judge continues": np.where(rng.random(size) < 0.2, np.nan, rng.integers(0, 6, size=size)),
+        "Rounds": rng.integers(0, 6, size=size),
+        "Speech time": rng.integers(1_640_000_000_000, 1_720_000_000_000, size=size),
+        "Is over": rng.random(size) < 0.5,
+    })
+    debates = pd.DataFrame({
+        "Room name": [f"room-{i}" for i in range(45)],
+        "Judge": rng.choice(np.array(people + ["Dave"], dtype=object), size=45),
+    })
+    return {"sessions": sessions, "debates": debates}
+
+
+def by_value(frame):
+    """`frame` as plain strings and 64-bit numbers."""
+    return frame.astype({
+        name: object if isinstance(frame[name].dtype, pd.CategoricalDtype) else
+        np.float64 if pd.api.types.is_float_dtype(frame[name].dtype) else
+        np.int64 if pd.api.types.is_integer_dtype(frame[name].dtype) else frame[name].dtype
+        for name in frame.columns
+    })
+
+
+def test_compacted_tables_keep_values():
+    tables = make_tables()
+    compacted = compact.compact_tables(tables)
+    for name, frame in tables.items():
+        pd.testing.assert_frame_equal(by_value(compacted[name]), frame)
+        pd.testing.assert_frame_equal(compacted[name].isna(), frame.isna())
+
+    sessions = compacted["sessions"]
+    for name in ["Room name", "Participant", "Role"]:
+        assert isinstance(sessions[name].dtype, pd.CategoricalDtype)
+    assert sessions["Comment"].dtype == object
+    # counts stored as floats because of missing values are exact in 32 bits, probabilities aren't
+    assert sessions["Number of judge continues"].dtype == np.float32
+    assert sessions["Final probability correct"].dtype == np.float64
+    assert sessions["Rounds"].dtype == np.int32
+    assert sessions["Speech time"].dtype == np.int64
+    assert sessions["Is over"].dtype == bool
+    # one dictionary per column name, shared by the tables
+    assert sessions["Room name"].dtype == compacted["debates"]["Room name"].dtype
+    assert "Dave" not in sessions["Participant"].cat.categories
+
+
+def test_categories_sort_like_strings():
+    tables = make_tables()
+    sessions, compacted = tables["sessions"], compact.compact_tables(tables)["sessions"]
+    for name in ["Participant", "Role", "Room name"]:
+        # the dictionaries hold the values of all tables, in the order of the strings
+        values = set(sessions[name].dropna()) | set(tables["debates"].get(name, pd.Series(dtype=object)).dropna())
+        assert list(compacted[name].cat.categories) == sorted(values)
+        expected = sessions.sort_values(name, kind="stable", na_position="last")
+        pd.testing.assert_frame_equal(by_value(compacted.sort_values(name, kind="stable", na_position="last")), expected)
+        # groups (including the missing values) come out in the same order, as the charts aggregate them
+        means = aggregate.group_by(sessions, [name])["Rounds"].mean()
+        pd.testing.assert_series_equal(aggregate.group_by(compacted, [name])["Rounds"].mean(), means)
+
+
+def test_conformed_rows_keep_values():
+    tables = make_tables()
+    compacted = compact.compact_tables(tables)
+    like = compacted["sessions"]
+    added = make_tables(seed=1, size=50)["sessions"]
+    added.loc[0, "Participant"] = "Zoe"
+    added.loc[1, "Rounds"] = 2**40
+    added.loc[2, "Number of judge continues"] = 0.1
+
+    conformed = compact.conform(added, like)
+    pd.testing.assert_frame_equal(by_value(conformed), added)
+    pd.testing.assert_frame_equal(conformed.isna(), added.isna())
+    # new values extend the dictionary in order, and numbers are only downcast where they fit
+    assert list(conformed["Participant"].cat.categories) == sorted(set(like["Participant"].cat.categories) | {"Zoe"})
+    assert conformed["Role"].dtype == like["Role"].dtype
+    assert conformed["Rounds"].dtype == np.int64
+    assert conformed["Number of judge continues"].dtype == np.float64
+    assert conformed["Speech time"].dtype == np.int64
+
+    # the other tables' dictionaries are extended to match, without changing their values
+    unified = compact.unify_dictionaries({**compacted, "sessions": pd.concat([like, conformed], ignore_index=True)})
+    assert unified["debates"]["Room name"].dtype == unified["sessions"]["Room name"].dtype
+    pd.testing.assert_frame_equal(by_value(unified["debates"]), tables["debates"])
+    pd.testing.assert_frame_equal(
+        by_value(unified["sessions"]), pd.concat([tables["sessions"], added], ignore_index=True)
+    )
@@ -0,0 +1,42 @@
+"""Checks that chart datasets are still served once evicted from memory or stored by another process."""
+
+import hashlib
+
+import datasets
+from spec_cache import SpecCache
+
+
+def dataset(content):
+    return f"{hashlib.sha256(content.encode()).hexdigest()[:32]}.json", content
+
+
+def test_evicted_datasets_are_read_back(tmp_path, monkeypatch):
+    monkeypatch.setattr(datasets, "store", SpecCache(max_entries=1))
+    monkeypatch.setattr(datasets, "directories", [])
+    datasets.use_directory(str(tmp_path / "v1"))
+    first, second = dataset("[1]"), dataset("[2]")
+    datasets.put(*first)
+    datasets.put(*second)
+    assert datasets.store.get(first[0]) is None
+    assert datasets.get(first[0]) == first[1]
+    assert datasets.get(second[0]) == second[1]
+
+
+def test_datasets_of_other_processes_are_served(tmp_path, monkeypatch):
+    monkeypatch.setattr(datasets, "directories", [])
+    monkeypatch.setattr(datasets, "store", SpecCache(max_entries=100))
+    datasets.use_directory(str(tmp_path / "v1"))
+    old = dataset("[1]")
+    datasets.put(*old)
+    datasets.use_directory(str(tmp_path / "v2"))
+    new = dataset("[2]")
+    datasets.put(*new)
+
+    # another process, which only has the files
+    monkeypatch.setattr(datasets, "store", SpecCache(max_entries=100))
+    assert datasets.get(new[0]) == new[1]
+    # specs of the previous version may still be served
+    assert datasets.get(old[0]) == old[1]
+    assert datasets.use_directory(str(tmp_path / "v3")) == str(tmp_path / "v1")
+    assert datasets.get(dataset("[3]")[0]) is None
+    assert datasets.get("../v1") is None
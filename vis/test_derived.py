@@ -0,0 +1,258 @@
+"""Checks the vectorized derived columns against the per-row logic they replaced."""
+
+import datetime
+import math
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+import derived
+
+people = ["Alice", "Bob", "Carol", "GPT-4", np.nan]
+roles = ["Judge", "Offline Judge", "Debater A", "Debater B"]
+
+
+def make_frames(num_rooms=60, seed=0):
+    rng = np.random.default_rng(seed)
+
+    def choice(options, size):
+        return [options[i] for i in rng.integers(len(options), size=size)]
+
+    def probabilities(size):
+        # include exact ties, bin edges and missing values
+        probs = rng.choice([0.5, 0.05, 0.95, 0.1, 0.25, 0.75, 1.0, 0.0], size=size)
+        probs = np.where(rng.random(size) < 0.5, rng.random(size), probs)
+        return np.where(rng.random(size) < 0.15, np.nan, probs)
+
+    rooms = [f"room-{i}" for i in range(num_rooms)]
+    end_times = pd.to_datetime(
+        rng.integers(1_640_000_000_000, 1_720_000_000_000, size=num_rooms), unit="ms"
+    ).to_series(index=range(num_rooms))
+    end_times[rng.random(num_rooms) < 0.1] = pd.NaT
+    debates = pd.DataFrame({
+        "Room name": rooms,
+        "Is offline": rng.random(num_rooms) < 0.2,
+        "Is single debater": rng.random(num_rooms) < 0.4,
+        "Has honest debater": rng.random(num_rooms) < 0.5,
+        "Honest debater": choice(people, num_rooms),
+        "Dishonest debater": choice(people, num_rooms),
+        "Debater A": choice(people, num_rooms),
+        "Debater B": choice(people, num_rooms),
+        "Judge": choice(people, num_rooms),
+        "Number of debate rounds": rng.choice([1, 2, 3, 4, 5, 6, np.nan], size=num_rooms),
+        "Final probability correct": probabilities(num_rooms),
+        "Average offline probability correct": probabilities(num_rooms),
+        "End time": end_times.values,
+    })
+
+    num_sessions = num_rooms * 4
+    sessions = pd.DataFrame({
+        "Room name": choice(rooms, num_sessions),
+        "Participant": choice(people[:-1], num_sessions),
+        "Role": choice(roles, num_sessions),
+        "Final probability correct": probabilities(num_sessions),
+        "Number of judge continues": rng.integers(0, 6, size=num_sessions),
+        "identity guesses.Debater A": choice(people, num_sessions),
+        "identity guesses.Debater B": choice(people, num_sessions),
+        "identity guesses.Judge": choice(people, num_sessions),
+    })
+
+    num_turns = num_rooms * 10
+    turns = pd.DataFrame({
+        "Room name": choice(rooms, num_turns),
+        "Participant": choice(people[:-1], num_turns),
+        "Role": choice(roles, num_turns),
+        "Probability correct": probabilities(num_turns),
+    })
+    return debates, sessions, turns
+
+
+def merged_sessions(debates, sessions):
+    return sessions.merge(debates, how="left", on="Room name", suffixes=("", " (debate)"))
+
+
+def test_settings_match_row_logic():
+    debates, sessions, turns = make_frames()
+    _, result, _ = derived.add_derived_columns(debates, sessions, turns)
+    source = merged_sessions(debates, sessions)
+
+    def get_judge_setting(row):
+        if row['Is offline']:
+            return row['Role'] + ' (no live judge)'
+        elif row['Is single debater']:
+            if row['Has honest debater']:
+                return row['Role'] + ' (single honest debater)'
+            else:
+                return row['Role'] + ' (single dishonest debater)'
+        else:
+            return row['Role']
+
+    def get_judge_setting_honesty_hidden(row):
+        if row['Is offline']:
+            return row['Role'] + ' (no live judge)'
+        elif row['Is single debater']:
+            return row['Role'] + ' (single debater)'
+        else:
+            return row['Role']
+
+    def get_setting(row):
+        ai_or_human = "Human"
+        consultancy_or_debate = "Debate"
+        if row['Honest debater'] == 'GPT-4' or row['Dishonest debater'] == 'GPT-4':
+            ai_or_human = "AI"
+        if row['Is single debater']:
+            consultancy_or_debate = "Consultancy"
+        return " ".join([ai_or_human, consultancy_or_debate])
+
+    def get_consultancy_setting(row):
+        if row['Honest debater'] == 'GPT-4':
+            return "AI Consultancy (honest)"
+        elif row['Dishonest debater'] == 'GPT-4':
+            return "AI Consultancy (dishonest)"
+        elif str(row['Honest debater']) != 'nan':
+            return "Human Consultancy (honest)"
+        else:
+            return "Human Consultancy (dishonest)"
+
+    def bin_num_rounds(row):
+        num_rounds = row['Number of debate rounds']
+        if num_rounds == 1:
+            return '1'
+        elif num_rounds == 2:
+            return '2'
+        elif num_rounds in [3, 4]:
+            return '3-4'
+        else:
+            return '5+'
+
+    assert list(result['Judge setting']) == list(source.apply(get_judge_setting, axis=1))
+    assert list(result['Judge setting (honesty hidden)']) == list(source.apply(get_judge_setting_honesty_hidden, axis=1))
+    assert list(result['Setting']) == list(source.apply(get_setting, axis=1))
+    single = source['Is single debater']
+    assert list(result['Consultancy setting'][single]) == list(source[single].apply(get_consultancy_setting, axis=1))
+    assert result['Consultancy setting'][~single].isna().all()
+    assert list(result['Number of debate rounds (binned)']) == list(source.apply(bin_num_rounds, axis=1))
+
+
+def test_outcomes_and_guesses_match_row_logic():
+    debates, sessions, turns = make_frames()
+    _, result, _ = derived.add_derived_columns(debates, sessions, turns)
+    source = merged_sessions(debates, sessions)
+
+    expected_outcome = source.apply(
+        lambda row: "incomplete" if math.isnan(row['Final probability correct'])
+        else "tie" if row['Final probability correct'] == 0.5
+        else "correct" if row['Final probability correct'] > 0.5
+        else "incorrect",
+        axis=1
+    )
+    expected_imputed = source.apply(
+        lambda row: 0.5 if math.isnan(row['Final probability correct'])
+        else row['Final probability correct'],
+        axis=1
+    )
+    expected_dist = source.apply(
+        lambda row: 0.0 if math.isnan(row['Final probability correct'])
+        else abs(row['Final probability correct'] - 0.5),
+        axis=1
+    )
+    expected_guesses = source.apply(
+        lambda row: sum(
+            [
+                row[col] == row["identity guesses." + col]
+                for col in ["Debater A", "Debater B", "Judge"]
+            ]
+        ),
+        axis=1,
+    )
+
+    assert list(result['outcome']) == list(expected_outcome)
+    assert np.allclose(result['Final probability correct (with imputation)'], expected_imputed)
+    assert np.allclose(result['Final probability correct (dist from half)'], expected_dist)
+    assert list(result['Guesses']) == list(expected_guesses)
+
+
+def test_confidence_bins_match_row_logic():
+    debates, sessions, turns = make_frames()
+    _, result_sessions, result_turns = derived.add_derived_columns(debates, sessions, turns)
+
+    def get_confidence(x: float):
+        if x < 0.5:
+            return 1 - x
+        else:
+            return x
+
+    for bin_size in derived.confidence_bin_sizes:
+        def make_bin(x: float):
+            bot = math.floor(x / bin_size)
+            top = bot + 1
+            return f'{bot * bin_size:.2f} – {top * bin_size:.2f}'
+
+        for frame, result, field in [
+            (sessions, result_sessions, 'Final probability correct'),
+            (turns, result_turns, 'Probability correct'),
+        ]:
+            judged = frame[field].notna()
+            confidence = frame[judged].apply(lambda row: get_confidence(row[field]), axis=1)
+            bins = confidence.apply(make_bin)
+            assert np.allclose(result['Prediction confidence'][judged], confidence)
+            assert list(result[derived.confidence_bin_column(bin_size)][judged]) == list(bins)
+            assert result[derived.confidence_bin_column(bin_size)][~judged].isna().all()
+
+    def make_percent_bin(x: float):
+        bot = math.floor(x / 0.1)
+        top = bot + 1
+        return f'{bot * 0.1:.0%} – {top * 0.1:.0%}'
+
+    judged = result_sessions['Prediction confidence'].dropna()
+    assert list(derived.confidence_bins(judged, 0.1, percent=True)) == list(judged.apply(make_percent_bin))
+
+
+def test_week_labels_match_row_logic():
+    debates, sessions, turns = make_frames(num_rooms=400)
+    result, _, _ = derived.add_derived_columns(debates, sessions, turns)
+    ended = debates['End time'].notna()
+
+    def convert_time(x):
+        start_date = datetime.datetime.strptime(f"{x.year}-{x.week}-1", "%Y-%W-%w")
+        end_date = start_date + pd.Timedelta(days=6)
+        return f'{start_date.strftime("%b%d")}|{end_date.strftime("%b%d")}'
+
+    assert list(result['End week'][ended]) == list(debates['End time'][ended].apply(lambda x: x.week))
+    assert list(result['End week label'][ended]) == list(debates['End time'][ended].apply(convert_time))
+
+
+def test_debate_probabilities_and_rewards_match_row_logic():
+    debates, sessions, turns = make_frames()
+    result, _, _ = derived.add_derived_columns(debates, sessions, turns)
+    expected = debates.apply(
+        lambda row: row["Final probability correct"]
+        if row["Is offline"] == False
+        else row["Average offline probability correct"],
+        axis=1,
+    )
+    assert np.allclose(
+        result["Final probability correct (live and mean of offline)"], expected, equal_nan=True
+    )
+
+    # including probabilities of exactly 0 and 1, which are clipped to keep the log scores finite
+    judged = sessions[sessions['Final probability correct'].notna()]
+    assert judged['Final probability correct'].isin([0.0, 1.0]).any()
+    low, high = derived.reward_probability_bounds
+
+    def clipped(row):
+        return min(max(row['Final probability correct'], low), high)
+
+    rewards = derived.rewards(judged)
+    assert np.allclose(rewards['Judge reward'], judged.apply(
+        lambda row: math.log(clipped(row)) - (0.05 * row['Number of judge continues']),
+        axis=1
+    ))
+    assert np.allclose(rewards['Honest debater reward'], judged.apply(
+        lambda row: math.log(clipped(row)),
+        axis=1
+    ))
+    assert np.allclose(rewards['Dishonest debater reward'], judged.apply(
+        lambda row: math.log(1 - clipped(row)),
+        axis=1
+    ))
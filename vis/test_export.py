@@ -0,0 +1,92 @@
+"""Checks the streaming exports of the analytics tables."""
+
+import io
+import os
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+import pytest  # type: ignore
+
+import export
+
+
+def read_export(response, format):
+    data = io.BytesIO(response.get_data())
+    return pd.read_csv(data) if format == "csv" else pd.read_json(data, lines=True)
+
+
+def test_turn_text_is_read_on_demand(server):
+    assert "Participant text" not in server.snapshot.turns.columns
+    client = server.app.test_client()
+    room = server.snapshot.turns["Room name"].iloc[0]
+    exported = read_export(client.get(f"/export/turns?window=all&room={room}&text=true&format=csv"), "csv")
+    summary = pd.read_csv(os.path.join(server.data_dir, "official", "summaries", "turns.csv"))
+    expected = summary[summary["Room name"] == room]
+    assert len(exported) == len(expected) > 0
+    assert exported["Participant text"].notna().any()
+    key = server.turn_key_columns
+    merged = exported.merge(expected, on=key, suffixes=("", " (summary)"))
+    assert len(merged) == len(expected)
+    for column in server.turn_text_columns:
+        pd.testing.assert_series_equal(merged[column], merged[f"{column} (summary)"], check_names=False)
+    assert "Participant text" not in read_export(client.get(f"/export/turns?window=all&room={room}&format=csv"), "csv")
+
+
+def plain(frame):
+    """`frame` with the types a CSV or JSON export can tell apart: categories as values and times as datetimes."""
+    return frame.reset_index(drop=True).astype({
+        column: object for column in frame.columns if isinstance(frame[column].dtype, pd.CategoricalDtype)
+    })
+
+
+def assert_exported(exported, expected):
+    expected = plain(expected)
+    assert list(exported.columns) == list(expected.columns)
+    for column in expected.columns:
+        if pd.api.types.is_datetime64_any_dtype(expected[column]):
+            exported[column] = pd.to_datetime(exported[column]).dt.tz_localize(None)
+    pd.testing.assert_frame_equal(exported, expected, check_dtype=False)
+
+
+@pytest.mark.parametrize("format", ["csv", "ndjson"])
+def test_filters_select_matching_rows(server, format):
+    frame = server.window_view(server.snapshot, server.named_time_window("all")).sessions_with_debates
+    participants = list(frame["Participant"].dropna().unique()[:2])
+    client = server.app.test_client()
+    query = [("window", "all"), ("role", "Judge"), ("format", format)] + [("participant", p) for p in participants]
+    exported = read_export(client.get("/export/sessions_with_debates", query_string=query), format)
+    expected = frame[frame["Participant"].isin(participants) & (frame["Role"] == "Judge")]
+    assert len(expected) > 0
+    assert_exported(exported, expected)
+
+
+@pytest.mark.parametrize("format", ["csv", "ndjson"])
+def test_export_round_trips(server, format):
+    data = server.window_view(server.snapshot, server.named_time_window("all"))
+    client = server.app.test_client()
+    for table in ["debates", "turns", "leaderboard"]:
+        exported = read_export(client.get(f"/export/{table}?window=all&format={format}"), format)
+        assert_exported(exported, getattr(data, table))
+
+
+@pytest.mark.parametrize("format", ["csv", "ndjson"])
+def test_chunks_join_into_the_whole_export(server, monkeypatch, format):
+    client = server.app.test_client()
+    frame = server.window_view(server.snapshot, server.named_time_window("all")).sessions
+    # in one chunk, so with a single CSV header
+    whole = client.get(f"/export/sessions?window=all&format={format}").get_data()
+    assert len(frame) < export.chunk_rows
+    # chunks of one row, of a size that doesn't divide the rows, and exactly as many rows as the table
+    for rows in [1, 7, len(frame)]:
+        monkeypatch.setattr(export, "chunk_rows", rows)
+        chunks = list(export.serialize_rows(frame, np.arange(len(frame)), format))
+        assert len(chunks) == -(-len(frame) // rows)
+        assert client.get(f"/export/sessions?window=all&format={format}").get_data() == whole
+
+
+def test_empty_exports():
+    frame = pd.DataFrame({"Room name": ["a", "b"], "Participant": ["Alice", "Bob"]})
+    positions = export.matching_positions(frame, {"Participant": ["Carol"], "Missing column": ["x"]})
+    assert len(positions) == 0
+    assert "".join(export.serialize_rows(frame, positions, "csv")) == "Room name,Participant\n"
+    assert "".join(export.serialize_rows(frame, positions, "ndjson")) == ""
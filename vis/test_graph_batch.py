@@ -0,0 +1,33 @@
+"""Checks the batch graph endpoint."""
+
+import json
+
+import pytest  # type: ignore
+
+
+def test_batch_renders_graphs(server):
+    user = server.snapshot.sessions["Participant"].value_counts().index[0]
+    response = server.app.test_client().post("/graphs", json={
+        "graphs": ["Track:_Judge_pairings"], "personalized": [[user, "Win_rates"]],
+    })
+    assert response.status_code == 200
+    results = json.loads(response.get_data())
+    assert [(result["name"], result.get("user")) for result in results] == [("Track:_Judge_pairings", None), ("Win_rates", user)]
+    assert all("spec" in result for result in results)
+
+
+@pytest.mark.parametrize("body", [
+    ["Track:_Judge_pairings"],
+    {"graphs": "Track:_Judge_pairings"},
+    {"graphs": [["Track:_Judge_pairings"]]},
+    {"personalized": ["Win_rates"]},
+    {"personalized": [["Someone", "Win_rates", "extra"]]},
+    {"personalized": [["Someone", ["Win_rates"]]]},
+    {"personalized": {"Someone": "Win_rates"}},
+])
+def test_malformed_batch_is_rejected(server, body):
+    assert server.app.test_client().post("/graphs", json=body).status_code == 400
+
+
+def test_unknown_graph_is_not_found(server):
+    assert server.app.test_client().post("/graphs", json={"personalized": [["Someone", "Nope"]]}).status_code == 404
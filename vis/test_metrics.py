@@ -0,0 +1,40 @@
+"""Checks the Prometheus exposition of the server's metrics."""
+
+import metrics
+
+
+def family_kinds(text):
+    return dict(line.split()[2:4] for line in text.splitlines() if line.startswith("# TYPE"))
+
+
+def assert_conventional_names(kinds):
+    for name, kind in kinds.items():
+        # suffixes reserved for the series of histograms and summaries
+        assert not name.endswith(("_sum", "_count", "_bucket")), name
+        assert (kind == "counter") == name.endswith("_total"), name
+
+
+def test_counters_use_total_suffix():
+    metrics.record_render("Some graph", 0.5, 0.25, 100)
+    metrics.record_render("Some graph", 0.5, 0.25, 120)
+    text = metrics.exposition()
+    assert_conventional_names(family_kinds(text))
+    lines = text.splitlines()
+    assert 'analytics_graph_render_seconds_total{graph="Some graph"} 1.0' in lines
+    assert 'analytics_graph_serialize_seconds_total{graph="Some graph"} 0.5' in lines
+
+
+def test_server_cache_counts_are_counters(server):
+    client = server.app.test_client()
+    client.get("/graph/Track:_Judge_pairings")
+    client.get("/graph/Track:_Judge_pairings")
+    text = client.get("/metrics").get_data(as_text=True)
+    kinds = family_kinds(text)
+    assert_conventional_names(kinds)
+    for prefix in ["analytics_graph_cache", "analytics_personalized_graph_cache"]:
+        assert kinds[f"{prefix}_hits_total"] == "counter"
+        assert kinds[f"{prefix}_misses_total"] == "counter"
+        assert kinds[f"{prefix}_entries"] == "gauge"
+        assert kinds[f"{prefix}_size_bytes"] == "gauge"
+    hits = next(line for line in text.splitlines() if line.startswith("analytics_graph_cache_hits_total "))
+    assert float(hits.split()[1]) >= 1
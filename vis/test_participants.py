@@ -0,0 +1,31 @@
+"""Checks the participant index against selecting each participant's rows by value."""
+
+import pandas as pd  # type: ignore
+
+
+def assert_indexed_rows_match(server, data):
+    with server.pinned_data(data):
+        for table, columns in server.participant_columns.items():
+            frame = getattr(data, table)
+            for column in columns:
+                participants = list(frame[column].dropna().unique()) + ["Nobody"]
+                for participant in participants:
+                    rows = server.participant_rows(table, participant, column)
+                    expected = frame[frame[column] == participant]
+                    pd.testing.assert_frame_equal(frame.iloc[rows], expected)
+
+
+def test_index_matches_selection(server):
+    assert_indexed_rows_match(server, server.window_view(server.snapshot, server.named_time_window("all")))
+
+
+def test_index_matches_selection_in_window(server):
+    data = server.window_view(server.snapshot, server.named_time_window("official"))
+    assert_indexed_rows_match(server, data)
+
+
+def test_unknown_participant_has_no_rows(server):
+    with server.pinned_data(server.window_view(server.snapshot, server.named_time_window("all"))):
+        rows = server.participant_rows("sessions_with_debates", "Nobody")
+        assert len(rows) == 0
+        assert len(server.current_data().sessions_with_debates.iloc[rows]) == 0
@@ -0,0 +1,97 @@
+"""Checks incremental refreshes of the analytics data against full reloads."""
+
+import contextlib
+import io
+import os
+
+import pandas as pd  # type: ignore
+import pytest  # type: ignore
+
+
+def summary_path(server, name):
+    return os.path.join(server.data_dir, "official", "summaries", f"{name}.csv")
+
+
+def quietly(run):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return run()
+
+
+@pytest.fixture
+def derived_rooms(scratch_server, monkeypatch):
+    """The rooms passed to each call of `derive_tables` during the test."""
+    calls = []
+    derive_tables = scratch_server.derive_tables
+    def recording_derive_tables(debates, sessions, turns):
+        calls.append(set(debates["Room name"]))
+        return derive_tables(debates, sessions, turns)
+    monkeypatch.setattr(scratch_server, "derive_tables", recording_derive_tables)
+    return calls
+
+
+def test_refresh_without_changes_keeps_snapshot(scratch_server, derived_rooms):
+    server = scratch_server
+    previous = server.snapshot
+
+    assert not quietly(lambda: server.read_data(incremental=True))
+    assert server.snapshot is previous
+
+    # summaries rewritten without changes
+    for name in ["debates", "sessions"]:
+        pd.read_csv(summary_path(server, name)).to_csv(summary_path(server, name), index=False)
+    assert not quietly(lambda: server.read_data(incremental=True))
+    assert server.snapshot.version == previous.version
+    assert server.snapshot.sessions is previous.sessions
+    assert derived_rooms == []
+
+
+def test_incremental_refresh_matches_full_reload(scratch_server, derived_rooms):
+    server = scratch_server
+    debates = pd.read_csv(summary_path(server, "debates"))
+    sessions = pd.read_csv(summary_path(server, "sessions"))
+    sample = pd.read_csv(summary_path(server, "sample-rooms"))
+    rooms = list(debates["Room name"])
+    judged = sessions["Final probability correct"].notna()
+    debates.loc[debates["Room name"] == rooms[5], "Last modified time"] += 1000
+    sessions.loc[(sessions["Room name"] == rooms[7]) & judged, "Final probability correct"] = 0.33
+    sessions.loc[(sessions["Room name"] == sample["Room name"][0]) & judged, "Final probability correct"] = 0.61
+    sessions.loc[sessions["Room name"] == rooms[12], "Participant"] = "Someone New"
+    debates = debates[debates["Room name"] != rooms[11]]
+    sessions = sessions[sessions["Room name"] != rooms[11]]
+    debates.to_csv(summary_path(server, "debates"), index=False)
+    sessions.to_csv(summary_path(server, "sessions"), index=False)
+
+    previous_version = server.snapshot.version
+    assert quietly(lambda: server.read_data(incremental=True))
+    incremental = server.snapshot
+    assert incremental.version == previous_version + 1
+    # only the changed rooms are derived again; the removed one is just dropped
+    assert derived_rooms == [{rooms[5], rooms[7], rooms[12], sample["Room name"][0]}]
+    assert rooms[11] not in set(incremental.debates["Room name"])
+    quietly(lambda: server.read_data())
+    full = server.snapshot
+
+    for name in full._fields:
+        if name in server.snapshot_metadata_fields or name == "room_fingerprints":
+            continue
+        expected, actual = getattr(full, name), getattr(incremental, name)
+        for column in expected.columns:
+            # compacted columns stay compact, though their dictionaries may keep values of removed rooms
+            if isinstance(expected[column].dtype, pd.CategoricalDtype):
+                assert isinstance(actual[column].dtype, pd.CategoricalDtype), (name, column)
+        pd.testing.assert_frame_equal(
+            actual.reset_index(drop=True), expected.reset_index(drop=True),
+            check_dtype=False, check_categorical=False, check_exact=False,
+        )
+
+
+def test_window_standings_match_window_leaderboard(server):
+    for window in server.time_windows.values():
+        view = server.window_view(server.snapshot, server.TimeWindow(*window))
+        expected = server.standings.Standings.from_leaderboard(view.leaderboard)
+        for reward, standings in expected.by_reward.items():
+            actual = view.standings.by_reward[reward]
+            assert actual.keys() == standings.keys(), (window, reward)
+            for participant, standing in standings.items():
+                assert actual[participant].count == standing.count
+                assert abs(actual[participant].total - standing.total) < 1e-9
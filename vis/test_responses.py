@@ -0,0 +1,29 @@
+"""Checks the ETags and compression of the server's responses."""
+
+import gzip
+
+graph = "/graph/Results:_Final_probability_correct_by_judge_experience_and_participant?window=all"
+
+
+def test_each_encoding_has_its_own_etag(server):
+    client = server.app.test_client()
+    plain = client.get(graph)
+    compressed = client.get(graph, headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
+    assert plain.headers["ETag"] != compressed.headers["ETag"]
+
+    # revalidating with the other encoding's ETag gets the full body
+    response = client.get(graph, headers={"If-None-Match": compressed.headers["ETag"]})
+    assert response.status_code == 200
+    assert response.get_data() == plain.get_data()
+
+
+def test_not_modified(server):
+    client = server.app.test_client()
+    etag = client.get(graph, headers={"Accept-Encoding": "gzip"}).headers["ETag"]
+    for if_none_match in [etag, "*"]:
+        response = client.get(graph, headers={"Accept-Encoding": "gzip", "If-None-Match": if_none_match})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        assert "Accept-Encoding" in response.headers["Vary"]
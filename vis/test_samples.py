@@ -0,0 +1,61 @@
+"""Checks the indexed sample views against the merges they replaced."""
+
+import pandas as pd  # type: ignore
+
+
+def merged_sample(sample, sessions, turns):
+    """The sessions and turns of the sample's judges, as they were merged before the views were indexed."""
+    sample_sessions = sample.merge(
+        sessions, how="left", left_on=["Room name", "Judge"], right_on=["Room name", "Participant"], suffixes=("", " (debate)")
+    )
+    sample_turns = sample.merge(
+        turns, how="inner", left_on=["Room name"], right_on=["Room name"], suffixes=("", " (debate)")
+    )
+    return sample_sessions, sample_turns[sample_turns["Role"] == "Judge"]
+
+
+def by_value(frame):
+    # merges don't always keep a categorical column's dtype, whereas the views do
+    return frame.reset_index(drop=True).astype({
+        column: object for column in frame.columns if isinstance(frame[column].dtype, pd.CategoricalDtype)
+    })
+
+
+def assert_same_rows(actual, expected):
+    pd.testing.assert_frame_equal(by_value(actual), by_value(expected))
+
+
+def materialize(server, sample):
+    data = server.snapshot
+    return server.materialize_sample(
+        sample, data.debates, data.sessions, data.turns, data.sessions_with_debates, data.turns_with_debates
+    )
+
+
+def test_sample_matches_merges(server):
+    data = server.snapshot
+    sample = server.read_summary(server.data_dir, "sample-rooms")
+    view = materialize(server, sample)
+    sessions, turns = merged_sample(sample, data.sessions, data.turns)
+    sessions_with_debates, turns_with_debates = merged_sample(sample, data.sessions_with_debates, data.turns_with_debates)
+    assert len(view.sessions) == len(sample) and len(view.turns) > 0
+    assert_same_rows(view.sessions, sessions)
+    assert_same_rows(view.turns, turns)
+    assert_same_rows(view.sessions_with_debates, sessions_with_debates)
+    assert_same_rows(view.turns_with_debates, turns_with_debates)
+
+
+def test_unmatched_judges_and_rooms(server):
+    data = server.snapshot
+    rooms = list(data.debates["Room name"].iloc[:3])
+    sample = pd.DataFrame({
+        # a judge without a session in an existing room, a listed judge, and a room that doesn't exist
+        "Room name": [rooms[0], rooms[1], "no-such-room"],
+        "Judge": ["Nobody", data.sessions["Participant"][data.sessions["Room name"] == rooms[1]].iloc[0], "Nobody"],
+    })
+    view = materialize(server, sample)
+    # rooms that don't exist are left out; judges without a session keep a row of missing values
+    sessions, turns = merged_sample(sample.iloc[:2], data.sessions, data.turns)
+    assert_same_rows(view.sessions, sessions)
+    assert_same_rows(view.turns, turns)
+    assert view.sessions["Participant"].isna().tolist() == [True, False]
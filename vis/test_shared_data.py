@@ -0,0 +1,95 @@
+"""Checks publishing tables to a shared directory and loading them, in this and other processes."""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+import pytest  # type: ignore
+
+import shared_data
+
+
+def make_tables(version):
+    return {
+        "sessions": pd.DataFrame({
+            "Room name": [f"room-{i}" for i in range(5)],
+            "Participant": ["Alice", np.nan, "Bob", "Alice", "Carol"],
+            "Role": pd.Categorical(["Judge", "Debater A", "Judge", np.nan, "Debater B"]),
+            "Final probability correct": [0.9, np.nan, 0.5, 0.1, 0.75],
+            "Number of rounds": np.arange(5, dtype=np.int64) + version,
+            "Is over": [True, False, True, True, False],
+            "End time": pd.to_datetime([1_700_000_000_000, None, 1_700_000_100_000, 1_700_000_200_000, None], unit="ms"),
+        }),
+        "empty": pd.DataFrame({"Room name": pd.Series([], dtype=object), "count": pd.Series([], dtype=np.int64)}),
+    }
+
+
+def assert_same_tables(actual, expected):
+    assert actual.keys() == expected.keys()
+    for name, frame in expected.items():
+        pd.testing.assert_frame_equal(actual[name], frame)
+
+
+def load_current(directory):
+    """Load the published tables, as another server process would."""
+    meta = shared_data.current(directory)
+    return meta, shared_data.load(directory, meta)
+
+
+def test_tables_round_trip_across_processes(tmp_path):
+    directory = str(tmp_path / "shared")
+    assert shared_data.current(directory) is None and shared_data.pointer_stamp(directory) is None
+    with shared_data.exclusive(directory):
+        meta = shared_data.publish(directory, 1, make_tables(1), {"debates": {"size": 1}})
+
+    assert_same_tables(shared_data.load(directory, meta), make_tables(1))
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        loaded_meta, tables = pool.submit(load_current, directory).result()
+    assert loaded_meta == meta
+    assert_same_tables(tables, make_tables(1))
+
+
+def test_only_the_current_and_previous_generations_are_kept(tmp_path):
+    directory = str(tmp_path / "shared")
+    published = []
+    stamps = []
+    for version in [1, 2, 3]:
+        with shared_data.exclusive(directory):
+            published.append(shared_data.publish(directory, version, make_tables(version), {}))
+        stamps.append(shared_data.pointer_stamp(directory))
+        if version == 1:
+            # mapped by this process before its generation is removed
+            mapped = shared_data.load(directory, published[0])
+
+    first, second, third = published
+    assert len(set(stamps)) == 3
+    assert shared_data.current(directory) == third
+    assert {meta["instance"] for meta in published} == {first["instance"]}
+    generations = {entry for entry in os.listdir(directory) if os.path.isdir(os.path.join(directory, entry))}
+    assert generations == {second["generation"], third["generation"]}
+
+    # tables already mapped stay readable, but the removed generation can't be loaded anymore
+    assert_same_tables(mapped, make_tables(1))
+    with pytest.raises(FileNotFoundError):
+        shared_data.load(directory, first)
+    assert_same_tables(shared_data.load(directory, second), make_tables(2))
+
+
+def test_server_snapshot_round_trips(server, tmp_path, monkeypatch):
+    original = server.snapshot
+    for name in ["snapshot", "shared_generation", "server_instance"]:
+        monkeypatch.setattr(server, name, getattr(server, name))
+    monkeypatch.setattr(server, "shared_data_dir", str(tmp_path / "shared"))
+    # only imported by the server in shared mode
+    monkeypatch.setattr(server, "shared_data", shared_data, raising=False)
+    server.publish_shared_data()
+    server.map_shared_data(shared_data.current(server.shared_data_dir))
+    try:
+        for name in server.DataSnapshot._fields:
+            if name not in server.snapshot_metadata_fields:
+                pd.testing.assert_frame_equal(getattr(server.snapshot, name), getattr(original, name), obj=name)
+        assert server.snapshot.standings.table().equals(original.standings.table())
+    finally:
+        server.clear_window_views()
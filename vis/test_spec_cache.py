@@ -0,0 +1,35 @@
+"""Checks the spec cache's bounds, including the encodings kept with its specs."""
+
+import gzip
+
+from spec_cache import SpecCache
+
+
+def test_encodings_are_kept_and_counted():
+    cache = SpecCache(max_entries=10)
+    spec = "{" + " " * 5000 + "}"
+    cache.put("a", spec)
+    calls = []
+    def encode(body):
+        calls.append(body)
+        return gzip.compress(body.encode())
+
+    first = cache.encoded("a", "gzip", encode)
+    assert gzip.decompress(first).decode() == spec
+    assert cache.encoded("a", "gzip", encode) is first
+    assert len(calls) == 1
+    assert cache.stats()["size"] == len(spec) + len(first)
+    assert cache.encoded("missing", "gzip", encode) is None
+
+
+def test_encodings_count_towards_max_bytes():
+    cache = SpecCache(max_entries=10, max_bytes=2000)
+    cache.put("a", "x" * 900)
+    cache.put("b", "y" * 900)
+    # encoding "b" takes it over the bound, which evicts the older "a"
+    cache.encoded("b", "raw", lambda body: body.encode())
+    assert cache.get("a") is None
+    assert cache.get("b") == "y" * 900
+    assert cache.stats()["size"] == 1800
+    cache.put("b", "z")
+    assert cache.stats()["size"] == 1
@@ -0,0 +1,54 @@
+"""Checks running standings against standings computed from scratch."""
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+from standings import Standings
+
+people = ["Alice", "Bob", "Carol", "Dave", np.nan]
+
+
+def make_leaderboard(size, seed, participants=people):
+    rng = np.random.default_rng(seed)
+
+    def choice(size):
+        return [participants[i] for i in rng.integers(len(participants), size=size)]
+
+    def rewards(size):
+        return np.where(rng.random(size) < 0.1, np.nan, np.log(rng.uniform(0.01, 0.99, size=size)))
+
+    return pd.DataFrame({
+        "Participant": choice(size),
+        "Honest debater": choice(size),
+        "Dishonest debater": choice(size),
+        "Judge reward": rewards(size),
+        "Honest debater reward": rewards(size),
+        "Dishonest debater reward": rewards(size),
+    })
+
+
+def assert_same_standings(actual, expected):
+    assert actual.by_reward.keys() == expected.by_reward.keys()
+    for reward, standings in expected.by_reward.items():
+        assert actual.by_reward[reward].keys() == standings.keys(), reward
+        for participant, standing in standings.items():
+            assert actual.by_reward[reward][participant].count == standing.count
+            assert np.isclose(actual.by_reward[reward][participant].total, standing.total)
+
+
+def test_updated_matches_from_leaderboard():
+    leaderboard = make_leaderboard(200, seed=0)
+    # "Alice" leaves with the removed rows, while "Erin" joins with the added ones
+    removed = leaderboard[(leaderboard.index < 30) | (leaderboard == "Alice").any(axis=1)]
+    added = make_leaderboard(40, seed=1, participants=["Bob", "Erin", np.nan])
+    new_leaderboard = pd.concat([leaderboard.drop(removed.index), added])
+
+    updated = Standings.from_leaderboard(leaderboard).updated(removed=removed, added=added)
+    assert_same_standings(updated, Standings.from_leaderboard(new_leaderboard))
+    assert "Alice" not in updated.by_reward["Judge reward"]
+    assert updated.standing("Erin", "Judge reward").count > 0
+
+
+def test_table_round_trip():
+    standings = Standings.from_leaderboard(make_leaderboard(100, seed=2))
+    assert_same_standings(Standings.from_table(standings.table()), standings)
@@ -0,0 +1,54 @@
+"""Checks the bounds of time windows."""
+
+import contextlib
+import io
+import os
+
+import pandas as pd  # type: ignore
+
+
+def test_bounds_are_exclusive(server):
+    debates = server.snapshot.debates
+    room, created = debates["Room name"].iloc[10], debates["Creation time"].iloc[10]
+
+    def rooms(since=None, until=None):
+        return set(server.window_view(server.snapshot, server.time_window(since, until)).debates["Room name"])
+
+    assert room not in rooms(since=created)
+    assert room in rooms(since=created - pd.Timedelta(1, "ms"))
+    assert room not in rooms(until=created)
+    assert room in rooms(until=created + pd.Timedelta(1, "ms"))
+
+
+def test_official_window_matches_paper_filter(server):
+    view = server.window_view(server.snapshot, server.named_time_window("official"))
+    debates = server.snapshot.debates
+    expected = debates[debates["Creation time"] > pd.Timestamp("2023-02-10")]
+    assert set(view.debates["Room name"]) == set(expected["Room name"])
+
+
+def test_undated_rooms_are_only_in_unbounded_windows(scratch_server):
+    server = scratch_server
+    path = os.path.join(server.data_dir, "official", "summaries", "debates.csv")
+    debates = pd.read_csv(path)
+    room = debates["Room name"].iloc[20]
+    debates.loc[debates["Room name"] == room, "Creation time"] = None
+    debates.to_csv(path, index=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        server.read_data()
+    debates = server.snapshot.debates
+    assert debates.loc[debates["Room name"] == room, "Creation time"].isna().all()
+
+    def view(since=None, until=None):
+        return server.window_view(server.snapshot, server.time_window(since, until))
+
+    middle = debates["Creation time"].dropna().median()
+    for since, until in [(middle, None), (None, middle), (debates["Creation time"].min(), debates["Creation time"].max())]:
+        data = view(since, until)
+        assert room not in set(data.debates["Room name"])
+        assert room not in set(data.sessions["Room name"])
+        times = debates["Creation time"]
+        expected = (times > since if since is not None else times.notna()) & (times < until if until is not None else True)
+        assert set(data.debates["Room name"]) == set(debates.loc[expected, "Room name"])
+    assert room in set(view().debates["Room name"])
+    assert room in set(view().sessions["Room name"])